@@ -1,24 +1,33 @@
 # -*- coding: utf-8 -*-
-import tkinter as tk
-from infra.logging_setup import setup_logging
-from infra.telemetry import init_telemetry, log_event
-from ui.main_window import build_main_window
-
-# --- Alta DPI (Windows) ---
-try:
-    import ctypes
+# Importar este módulo no debe tener efectos: los procesos "spawn" (pool de
+# miniaturas) lo vuelven a importar como __mp_main__. Logging, alta DPI, Tk,
+# la UI y la cámara se inicializan recién en main().
+
+
+def _enable_dpi_awareness():
+    # --- Alta DPI (Windows) ---
     try:
-        # Per-Monitor v2 (Windows 10+)
-        ctypes.windll.shcore.SetProcessDpiAwareness(2)
+        import ctypes
+        try:
+            # Per-Monitor v2 (Windows 10+)
+            ctypes.windll.shcore.SetProcessDpiAwareness(2)
+        except Exception:
+            # Fallback: system DPI aware
+            ctypes.windll.user32.SetProcessDPIAware()
     except Exception:
-        # Fallback: system DPI aware
-        ctypes.windll.user32.SetProcessDPIAware()
-except Exception:
-    pass
+        pass
 
-LOG_PATH = setup_logging(app_name="Katcam")
 
 def main():
+    import tkinter as tk
+    from infra.logging_setup import setup_logging
+    from infra.telemetry import init_telemetry, log_event
+
+    _enable_dpi_awareness()
+    log_path = setup_logging(app_name="Katcam")
+    # La UI importa video_capture, que crea el CameraManager (hilos de cámara)
+    from ui.main_window import build_main_window
+
     root = tk.Tk()
 
     # --- Escalado de Tk según DPI real ---
@@ -32,7 +41,7 @@ def main():
     # Telemetría básica: base_dir = carpeta de log principal
     try:
         import os
-        base_dir = os.path.dirname(LOG_PATH)
+        base_dir = os.path.dirname(log_path)
         init_telemetry(base_dir)
         log_event("app_started")
     except Exception:
@@ -40,4 +49,7 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Requerido por el pool de procesos de miniaturas en el ejecutable congelado (PyInstaller)
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -2,7 +2,7 @@
 # Envoltorio fino para capturas usando el mismo CameraManager (evita conflictos).
 from video_capture import camera_manager
 
-def take_photo(dest_folder, prefer_sizes=None, jpeg_quality=95, auto_resume_stream=True, block_until_done=True, result_holder=None):
+def take_photo(dest_folder, prefer_sizes=None, jpeg_quality=95, auto_resume_stream=True, block_until_done=True, result_holder=None, preview_size=None):
     try:
         from infra.telemetry import log_event
         log_event("camera_wrapper_call", dest_folder=dest_folder, prefer_count=len(prefer_sizes) if prefer_sizes else 0, block_until_done=bool(block_until_done))
@@ -16,6 +16,7 @@ def take_photo(dest_folder, prefer_sizes=None, jpeg_quality=95, auto_resume_stre
             auto_resume_stream=auto_resume_stream,
             block_until_done=block_until_done,
             result_holder=result_holder,
+            preview_size=preview_size,
         )
     except Exception as e:
         try:
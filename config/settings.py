@@ -110,10 +110,35 @@ HEADER_IMAGE_PATH  = _asset("header-katcam.jpg")   # imagen de cabecera
 APPDATA_DIR = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "KatcamPro")
 # No crear carpeta acá (módulos import-time). La creamos justo al escribir/leer.
 CONFIG_FILE = os.path.join(APPDATA_DIR, "katcam_config.json")
+# Catálogo de fotos (infra/photo_catalog.py): índice SQLite de las carpetas de fotos
+PHOTO_CATALOG_PATH = os.path.join(APPDATA_DIR, "photo_catalog.sqlite3")
+# Organización de la carpeta de fotos (infra/photo_layout.py): "flat" o "daily" (YYYY/MM/DD);
+# con "daily" las fotos planas existentes se migran en segundo plano al arrancar
+PHOTO_LAYOUT = "flat"
+# Manifiesto de sync (infra/sync_manifest.py): qué se subió al Drive, sin listar el destino
+SYNC_MANIFEST_PATH = os.path.join(APPDATA_DIR, "sync_manifest.sqlite3")
+SYNC_INTERVAL_S = 60                 # pasada del hilo de sync
+SYNC_MAX_BYTES_PER_S = 0             # tope de copia al Drive (0 = sin límite)
+SYNC_WORKERS = 3                     # copias simultáneas (el Drive es de alta latencia)
+SYNC_VERIFY_HASH = True              # releer la copia y comparar sha1 antes de renombrarla
+# Caché de miniaturas de la galería (infra/thumb_cache.py)
+THUMB_CACHE_DIR = os.path.join(APPDATA_DIR, "thumbs")
+THUMB_CACHE_MAX_MB = 256             # desalojo LRU por encima de este tamaño
+THUMB_SIZE = (240, 180)
+THUMB_WORKERS = None                 # None = núcleos - 1
+THUMB_USE_PROCESSES = True           # pool de procesos (PIL no suelta el GIL); False = hilos
 
 # --- Otros flags ---
 USE_SCROLL_CONTAINER = False
 
+# --- Fuente de frames ---
+# "opencv" = cámara real. Para pruebas/benchmarks sin hardware:
+#   "synthetic:4056x3040@15"  -> frames sintéticos (ver hardware/frame_sources.py)
+#   "replay:C:/ruta/fotos@5"  -> reproduce carpeta de imágenes o video
+FRAME_SOURCE = os.environ.get("KATCAM_FRAME_SOURCE", "opencv")
+# Buffers del anillo de frames del hilo lector (mínimo 2)
+FRAME_RING_SLOTS = 4
+
 # --- Timelapse / Captura avanzada ---
 # Intervalo mínimo duro (en segundos) para timelapse. El usuario indicó que nunca usa < 5s.
 TIME_LAPSE_MIN_INTERVAL_S = 5
@@ -127,6 +152,16 @@ HIGHRES_RECONFIG_COOLDOWN_S = 2.0
 FAST_INTERVAL_STRATEGY = "delay"
 # Factor multiplicador para cálculo dinámico (no implementado aún) de intervalo mínimo adaptativo
 DYNAMIC_MIN_FACTOR = 1.35
+# Exportación a video (services/timelapse.py: export_timelapse)
+TIMELAPSE_EXPORT_FPS = 24
+TIMELAPSE_EXPORT_SIZE = (1920, 1080)
+TIMELAPSE_EXPORT_FOURCC = "mp4v"
+TIMELAPSE_EXPORT_WORKERS = None      # hilos de decodificación; None = núcleos - 1
+TIMELAPSE_EXPORT_PREFETCH = 8        # frames decodificados en memoria como máximo
+TIMELAPSE_DEFLICKER = False          # normalizar el brillo entre frames (curva objetivo móvil)
+TIMELAPSE_DEFLICKER_WINDOW = 15      # frames de la media móvil
+TIMELAPSE_DEFLICKER_MAX_GAIN = 2.0   # ganancia máxima (y 1/x mínima) por frame
+TIMELAPSE_FFMPEG = "ffmpeg"           # para unir segmentos sin recodificar; si no está se recodifica con OpenCV
 
 # --- Captura / Reanudación avanzada ---
 CAPTURE_RES_TOLERANCE_PIX = 16   # tolerancia para considerar que la resolución efectiva coincide
@@ -135,6 +170,22 @@ POST_CAPTURE_RESUME_TIMEOUT_S = 1.2  # tiempo para esperar primer frame post-cap
 POST_CAPTURE_REOPEN_WINDOW_S = 1.5   # ventana adicional tras reopen
 CAPTURE_MAX_DURATION_S = 8.0         # timeout duro para una captura de foto
 CAPTURE_CANCEL_POLL_MS = 50          # cadencia de chequeo de cancel cooperativo dentro del bucle de captura
+# Etapa asíncrona de codificación/escritura de fotos (infra/photo_writer.py)
+PHOTO_WRITER_WORKERS = 1             # 1 preserva el orden de escritura en el pendrive
+PHOTO_WRITER_MAX_PENDING = 4         # fotos en cola antes de frenar a la cámara
+PHOTO_FSYNC_POLICY = "batch"         # "none" | "file" (fsync por foto) | "batch"
+PHOTO_FSYNC_BATCH = 8                # batch: fsync cada N fotos...
+PHOTO_FSYNC_BATCH_S = 5.0            # ...o cuando la más vieja sin fsync supera estos segundos
+
+# Telemetría (infra/telemetry.py): escritura asíncrona por lotes
+TELEMETRY_ASYNC = True               # False = escribir en el hilo que llama (como antes)
+TELEMETRY_QUEUE_MAX = 2000           # eventos encolados como máximo
+TELEMETRY_QUEUE_SOFT_RATIO = 0.75    # desde este llenado se muestrean eventos no críticos
+TELEMETRY_SAMPLE_EVERY = 10          # bajo presión: 1 de cada N eventos por tipo
+TELEMETRY_BATCH_MAX = 100            # eventos por escritura
+TELEMETRY_FLUSH_INTERVAL_S = 1.0     # escritura al menos cada N segundos si hay eventos
+TELEMETRY_MEMORY_SIZE = 500          # eventos en el anillo en memoria (get_recent)
+TELEMETRY_MEMORY_PER_TYPE = 50       # y en el anillo de cada tipo de evento
 # --- Downgrade automático tras mismatches ---
 # Número de mismatches consecutivos necesarios para degradar a la siguiente resolución más baja
 RES_MISMATCH_DOWNGRADE_THRESHOLD = 2
@@ -142,5 +193,20 @@ RES_MISMATCH_DOWNGRADE_THRESHOLD = 2
 # --- Detección de foto negra (umbral de brillo medio 0-255) ---
 # Si la media en escala de grises de la imagen cae por debajo de este
 # valor se considerará una "foto negra" y se registrará en la carpeta de la
-# foto (logs/YYYY-MM-DD.log) además de emitir telemetría.
+# foto (logs/YYYY-MM-DD.log) además de emitir telemetría. La media se mide en
+# la etapa de escritura sobre la copia reducida de infra/frame_quality.py
+# (error < 2 niveles contra la del frame completo).
 CAPTURE_BLACK_MEAN_THRESHOLD = 10
+
+# --- Calidad de frame (infra/frame_quality.py) ---
+# Métricas sobre una copia reducida; las fotos rechazadas quedan en disco pero
+# no se sincronizan ni se exportan al video (cada salteo queda en la telemetría).
+# Desactivado por defecto: activar después de ajustar los umbrales a la cámara.
+CAPTURE_QUALITY_ENABLED = False
+CAPTURE_QUALITY_MAX_SIDE = 640       # lado mayor de la copia en grises que se mide
+CAPTURE_BLUR_MIN_VAR = 20.0          # varianza del Laplaciano mínima (menos = desenfocada)
+CAPTURE_CLIP_MAX_FRAC = 0.35         # fracción máxima de píxeles casi negros / casi blancos
+CAPTURE_CONTRAST_MIN_STD = 6.0       # desvío de grises mínimo (menos = niebla / lluvia)
+# Reintentar la foto del timelapse dentro del mismo tick si sale rechazada
+CAPTURE_RETAKE_ON_BAD = False
+CAPTURE_RETAKE_MAX = 1
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Anillo de frames para el hilo lector de CameraManager.
+
+El hilo lector escribe cada frame en uno de N buffers preasignados (se
+reutilizan entre lecturas: ``cap.read(buffer)`` decodifica sobre la misma
+memoria) y publica ``(secuencia, slot, ts)`` con una sola asignación, que en
+CPython es atómica. Los consumidores nunca toman el lock del dispositivo:
+
+ - ``latest_seq`` permite saber si hay frame nuevo sin tocar la imagen.
+ - ``acquire_latest`` no copia: devuelve un ``FrameView`` de solo lectura que
+   fija (pin) el slot; el escritor salta los slots fijados hasta ``release()``.
+   Si todos están fijados el anillo crece un slot en vez de bloquear.
+
+Las cuentas de pin y la elección de slot usan un lock propio mínimo (solo
+aritmética, nunca I/O), distinto del lock del dispositivo.
+
+Escritores: uno a la vez. En CameraManager publican solo el hilo lector y
+las lecturas de warmup al activar el live, ambos con el lock del dispositivo
+tomado, así que nunca hay dos escritores simultáneos. La captura no publica:
+lee del anillo (``acquire_latest``) o directo del dispositivo.
+"""
+import threading
+import time
+from typing import Optional
+
+import cv2
+
+
+class FrameView:
+    """
+    Vista de solo lectura (sin copia) a un frame del anillo, con su secuencia.
+
+    Mantiene el slot fijado hasta ``release()`` (o al salir del ``with``).
+    ``array`` no es escribible; para obtener otra representación sin asignar
+    memoria por frame usar ``convert(code, out=buffer_reutilizable)``.
+    """
+    __slots__ = ("seq", "ts", "array", "_ring", "_idx")
+
+    def __init__(self, ring: "FrameRing", idx: int, seq: int, ts: float, buf):
+        self._ring = ring
+        self._idx = idx
+        self.seq = seq
+        self.ts = ts
+        arr = buf.view()
+        arr.flags.writeable = False
+        self.array = arr
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def convert(self, code=cv2.COLOR_BGR2RGB, out=None):
+        """cvtColor hacia ``out`` (buffer del llamador) si es compatible; si no, asigna uno nuevo."""
+        return cv2.cvtColor(self.array, code, dst=out)
+
+    def release(self):
+        ring, self._ring = self._ring, None
+        if ring is not None:
+            ring._unpin(self._idx)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+
+class FrameRing:
+    def __init__(self, slots: int = 4):
+        self._n = max(2, int(slots))
+        self._bufs = [None] * self._n
+        self._pins = [0] * self._n       # vistas vivas por slot
+        self._pin_lock = threading.Lock()
+        self._seq = 0
+        self._latest = (0, -1, 0.0)      # (seq, slot, ts) del último frame publicado
+        self._next = 0
+
+    # ---------- Escritor ----------
+    def begin_write(self):
+        """Reserva el próximo slot (nunca el último publicado).
+
+        Devuelve (slot, buffer_previo_o_None) para leer sobre esa memoria.
+        Salta slots fijados por vistas vivas; si no queda ninguno, crece.
+        """
+        with self._pin_lock:
+            latest_idx = self._latest[1]
+            idx = -1
+            for k in range(self._n):
+                cand = (self._next + k) % self._n
+                if cand != latest_idx and self._pins[cand] == 0:
+                    idx = cand
+                    break
+            if idx < 0:
+                self._bufs.append(None)
+                self._pins.append(0)
+                idx = self._n
+                self._n += 1
+        return idx, self._bufs[idx]
+
+    def commit(self, idx: int, frame, ts: Optional[float] = None) -> int:
+        """Publica frame en el slot reservado y devuelve su número de secuencia."""
+        self._bufs[idx] = frame
+        self._seq += 1
+        seq = self._seq
+        self._latest = (seq, idx, ts if ts is not None else time.time())
+        self._next = (idx + 1) % self._n
+        return seq
+
+    def publish(self, frame, ts: Optional[float] = None) -> int:
+        """Atajo para frames que ya vienen leídos (warmup, captura)."""
+        idx, _ = self.begin_write()
+        return self.commit(idx, frame, ts)
+
+    # ---------- Lectores ----------
+    @property
+    def latest_seq(self) -> int:
+        return self._latest[0]
+
+    @property
+    def latest_ts(self) -> float:
+        return self._latest[2]
+
+    @property
+    def slots(self) -> int:
+        return self._n
+
+    def acquire_latest(self, min_seq: int = 0) -> Optional[FrameView]:
+        """Vista fijada del último frame si su secuencia es > min_seq; si no, None."""
+        with self._pin_lock:
+            seq, idx, ts = self._latest
+            if idx < 0 or seq <= min_seq or self._bufs[idx] is None:
+                return None
+            self._pins[idx] += 1
+            buf = self._bufs[idx]
+        return FrameView(self, idx, seq, ts, buf)
+
+    def _unpin(self, idx: int):
+        with self._pin_lock:
+            if self._pins[idx] > 0:
+                self._pins[idx] -= 1
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""Fuentes de frames intercambiables para CameraManager.
+
+CameraManager no llama a ``cv2.VideoCapture`` directamente: usa una
+*fábrica de fuentes* ``factory(index, backend) -> fuente``. Toda fuente
+expone el mismo subconjunto de la API de ``cv2.VideoCapture`` que usa el
+manager (``isOpened``, ``read``, ``set``, ``get``, ``release``), así que la
+cámara real y las simuladas son intercambiables.
+
+Fuentes disponibles:
+ - ``opencv_source``: cámara real vía OpenCV (comportamiento de siempre).
+ - ``SyntheticSource``: genera frames sintéticos a la resolución pedida
+   (incluye 12MP/48MP) con fps, latencia y fallos inyectables.
+ - ``ReplaySource``: reproduce una carpeta de imágenes o un archivo de
+   video a N fps, también con latencia y fallos inyectables.
+
+``make_source_factory(spec)`` traduce un texto de configuración
+(p.ej. ``"synthetic:4056x3040@15"`` o ``"replay:E:/FOTOS@5"``) a una fábrica.
+"""
+import os
+import random
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def opencv_source(index: int, backend=None):
+    """Fábrica por defecto: abre la cámara real con OpenCV."""
+    return cv2.VideoCapture(index) if backend is None else cv2.VideoCapture(index, backend)
+
+
+class FrameSource:
+    """
+    Base para fuentes simuladas con la misma interfaz que cv2.VideoCapture.
+
+    Centraliza lo común a todas: propiedades (set/get), ritmo de fps,
+    latencia por lectura y fallos inyectados.
+      - read_latency_s / latency_jitter_s: retardo extra por lectura.
+      - fail_rate: probabilidad (0-1) de que read() devuelva (False, None).
+      - disconnect_after: tras N lecturas la fuente queda cerrada (simula
+        desconexión del USB); None = nunca.
+      - open_latency_s: retardo al abrir (drivers lentos).
+      - supported_sizes: si se indica, set(WIDTH/HEIGHT) se ajusta al tamaño
+        soportado más cercano (simula drivers que no aceptan cualquier modo).
+    """
+    def __init__(self, width=1280, height=720, fps=30.0,
+                 supported_sizes: Optional[Sequence[Tuple[int, int]]] = None,
+                 read_latency_s=0.0, latency_jitter_s=0.0, fail_rate=0.0,
+                 disconnect_after: Optional[int] = None, open_latency_s=0.0, seed=None):
+        self._supported = [(int(w), int(h)) for (w, h) in supported_sizes] if supported_sizes else None
+        self._req_w, self._req_h = int(width), int(height)
+        self._w, self._h = self._snap_size(self._req_w, self._req_h)
+        self._fps = float(fps or 0.0)
+        self._props = {}
+        self.read_latency_s = float(read_latency_s)
+        self.latency_jitter_s = float(latency_jitter_s)
+        self.fail_rate = float(fail_rate)
+        self.disconnect_after = disconnect_after
+        self._rng = random.Random(seed)
+        self._opened = True
+        self._next_due = 0.0
+        # Métricas propias de la fuente (útiles en benchmarks)
+        self.reads = 0
+        self.failed_reads = 0
+        if open_latency_s > 0:
+            time.sleep(open_latency_s)
+
+    # ---------- API tipo cv2.VideoCapture ----------
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+    def set(self, prop_id, value):
+        try:
+            if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+                self._req_w = int(value)
+                self._w, self._h = self._snap_size(self._req_w, self._req_h)
+            elif prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+                self._req_h = int(value)
+                self._w, self._h = self._snap_size(self._req_w, self._req_h)
+            elif prop_id == cv2.CAP_PROP_FPS:
+                self._fps = float(value)
+            else:
+                self._props[prop_id] = value
+            return True
+        except Exception:
+            return False
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._w)
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._h)
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self._fps)
+        return float(self._props.get(prop_id, 0.0) or 0.0)
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        self._pace()
+        self.reads += 1
+        if self.disconnect_after is not None and self.reads > int(self.disconnect_after):
+            self._opened = False
+            self.failed_reads += 1
+            return False, None
+        if self.fail_rate > 0 and self._rng.random() < self.fail_rate:
+            self.failed_reads += 1
+            return False, None
+        frame = self._next_frame(image)
+        if frame is None:
+            self.failed_reads += 1
+            return False, None
+        return True, frame
+
+    def grab(self):
+        ok, _ = self.read()
+        return ok
+
+    # ---------- Internos ----------
+    def _next_frame(self, image):
+        raise NotImplementedError
+
+    def _snap_size(self, w, h):
+        if not self._supported:
+            return (max(1, w), max(1, h))
+        return min(self._supported, key=lambda s: (abs(s[0] - w) + abs(s[1] - h), -s[0]))
+
+    def _pace(self):
+        """Respeta fps (como un driver que entrega a ritmo fijo) + latencia inyectada."""
+        delay = self.read_latency_s
+        if self.latency_jitter_s > 0:
+            delay += self._rng.uniform(0.0, self.latency_jitter_s)
+        now = time.perf_counter()
+        if self._fps > 0:
+            period = 1.0 / self._fps
+            if self._next_due <= 0 or now - self._next_due > period:
+                # Primer frame o veníamos atrasados: no acumular deuda
+                self._next_due = now
+            delay = max(delay, self._next_due - now)
+            self._next_due += period
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def _into(image, frame):
+        """Copia frame en el buffer del llamador si es compatible (como hace OpenCV)."""
+        if image is not None and getattr(image, "shape", None) == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return image
+        return frame.copy()
+
+
+class SyntheticSource(FrameSource):
+    """
+    Genera frames BGR sintéticos del tamaño configurado.
+
+    El patrón base (gradiente) se calcula una sola vez por resolución; cada
+    lectura copia ese patrón a memoria nueva (o al buffer recibido) y dibuja
+    una barra móvil, de modo que frames consecutivos difieren como en una
+    cámara real sin pagar el costo de generar la imagen completa.
+    """
+    def __init__(self, width=1280, height=720, fps=30.0, **kwargs):
+        super().__init__(width=width, height=height, fps=fps, **kwargs)
+        self._base = None
+        self._base_size = (0, 0)
+        self._frame_no = 0
+
+    def _pattern(self):
+        size = (self._w, self._h)
+        if self._base is None or self._base_size != size:
+            w, h = size
+            xs = np.linspace(0, 255, w, dtype=np.float32)
+            ys = np.linspace(0, 255, h, dtype=np.float32)
+            base = np.empty((h, w, 3), dtype=np.uint8)
+            base[:, :, 0] = xs[None, :].astype(np.uint8)
+            base[:, :, 1] = ys[:, None].astype(np.uint8)
+            base[:, :, 2] = ((xs[None, :] + ys[:, None]) * 0.5).astype(np.uint8)
+            self._base = base
+            self._base_size = size
+        return self._base
+
+    def _next_frame(self, image):
+        frame = self._into(image, self._pattern())
+        w = frame.shape[1]
+        bar = max(4, w // 64)
+        x = (self._frame_no * bar) % max(1, w - bar)
+        frame[:, x:x + bar] = 255
+        self._frame_no += 1
+        return frame
+
+
+class ReplaySource(FrameSource):
+    """
+    Reproduce una carpeta de imágenes (orden alfabético) o un archivo de
+    video a ``fps`` frames por segundo, en bucle si ``loop=True``.
+
+    Si el tamaño pedido con set(WIDTH/HEIGHT) difiere del original, el frame
+    se redimensiona para simular el modo del sensor. Con ``preload=True`` las
+    imágenes de la carpeta se decodifican una vez al abrir (más memoria, pero
+    el costo de decodificar no contamina las mediciones).
+    """
+    def __init__(self, path: str, fps=10.0, loop=True, preload=False, **kwargs):
+        self.path = path
+        self.loop = bool(loop)
+        self._files: List[str] = []
+        self._cache = {}
+        self._video = None
+        self._pos = 0
+        if os.path.isdir(path):
+            self._files = sorted(
+                os.path.join(path, f) for f in os.listdir(path)
+                if f.lower().endswith(_IMAGE_EXTS)
+            )
+            first = cv2.imread(self._files[0]) if self._files else None
+        else:
+            self._video = cv2.VideoCapture(path)
+            ok, first = self._video.read() if self._video.isOpened() else (False, None)
+            if ok:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            else:
+                first = None
+        h, w = first.shape[:2] if first is not None else (720, 1280)
+        super().__init__(width=w, height=h, fps=fps, **kwargs)
+        if first is None:
+            self._opened = False
+        elif preload and self._files:
+            for p in self._files:
+                img = cv2.imread(p)
+                if img is not None:
+                    self._cache[p] = img
+
+    def release(self):
+        super().release()
+        if self._video is not None:
+            try:
+                self._video.release()
+            except Exception:
+                pass
+
+    def _decode_next(self):
+        if self._files:
+            if self._pos >= len(self._files):
+                if not self.loop:
+                    return None
+                self._pos = 0
+            p = self._files[self._pos]
+            self._pos += 1
+            img = self._cache.get(p)
+            return img if img is not None else cv2.imread(p)
+        if self._video is None:
+            return None
+        ok, frame = self._video.read()
+        if not ok and self.loop:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+        return frame if ok else None
+
+    def _next_frame(self, image):
+        frame = self._decode_next()
+        if frame is None:
+            return None
+        if frame.shape[1] != self._w or frame.shape[0] != self._h:
+            frame = cv2.resize(frame, (self._w, self._h), interpolation=cv2.INTER_LINEAR)
+            if image is not None and image.shape == frame.shape:
+                np.copyto(image, frame)
+                return image
+            return frame
+        return self._into(image, frame)
+
+
+def _parse_size_fps(text: str):
+    """'4056x3040@15' -> ((4056, 3040), 15.0); partes opcionales."""
+    size, fps = None, None
+    text = (text or "").strip()
+    if "@" in text:
+        text, fps_txt = text.rsplit("@", 1)
+        try:
+            fps = float(fps_txt)
+        except Exception:
+            fps = None
+    if "x" in text.lower():
+        try:
+            w, h = text.lower().split("x", 1)
+            size = (int(w), int(h))
+        except Exception:
+            size = None
+    return size, fps
+
+
+def make_source_factory(spec: Optional[str] = None, **kwargs) -> Callable:
+    """
+    Construye una fábrica ``factory(index, backend)`` a partir de un texto:
+      - "opencv" / "" / None       -> cámara real
+      - "synthetic[:WxH][@fps]"    -> SyntheticSource
+      - "replay:<ruta>[@fps]"      -> ReplaySource
+    kwargs extra se pasan al constructor de la fuente simulada
+    (read_latency_s, fail_rate, supported_sizes, ...).
+    """
+    spec = (spec or "opencv").strip()
+    kind, _, rest = spec.partition(":")
+    kind = kind.lower()
+    if kind in ("", "opencv", "camera"):
+        return opencv_source
+    if kind == "synthetic":
+        size, fps = _parse_size_fps(rest)
+        opts = dict(kwargs)
+        if size:
+            opts.setdefault("width", size[0])
+            opts.setdefault("height", size[1])
+        if fps is not None:
+            opts.setdefault("fps", fps)
+
+        def _synthetic(index, backend=None):
+            return SyntheticSource(**opts)
+        return _synthetic
+    if kind == "replay":
+        path, fps = rest, None
+        if "@" in rest:
+            path, fps_txt = rest.rsplit("@", 1)
+            try:
+                fps = float(fps_txt)
+            except Exception:
+                path, fps = rest, None
+        opts = dict(kwargs)
+        if fps is not None:
+            opts.setdefault("fps", fps)
+
+        def _replay(index, backend=None):
+            return ReplaySource(path, **opts)
+        return _replay
+    raise ValueError(f"Fuente de frames desconocida: {spec}")
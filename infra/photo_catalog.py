@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""Catálogo persistente de fotos (SQLite en APPDATA).
+
+Reemplaza los ``os.listdir`` + ``getmtime`` por archivo que hacían la foto
+principal, la galería y la sincronización: con decenas de miles de fotos de
+timelapse en un pendrive eso tardaba segundos en cada captura.
+
+ - Cada foto confirmada por ``infra.photo_writer`` se agrega al catálogo
+   (oyente de commit), sin tocar el directorio.
+ - ``ensure_folder`` reconcilia una carpeta contra el disco una sola vez por
+   proceso (al arrancar o al cambiar de carpeta): agrega lo que falte (solo
+   hace stat de los nombres nuevos) y borra lo que ya no existe.
+ - "Última foto", filtros por fecha y diferencias para sync son consultas
+   indexadas por (carpeta, instante de captura).
+
+Las consultas van por carpeta raíz (la que elige el usuario): con la
+organización por día (``infra.photo_layout``) las fotos viven en
+``raíz/YYYY/MM/DD`` y la columna ``root`` las agrupa igual que a las planas.
+La reconciliación se hace por subcarpeta, así un filtro de fechas solo
+escanea los días que pide.
+
+Las fotos rechazadas por calidad (``infra.frame_quality``) siguen en el
+catálogo, con sus motivos en ``reject``; sync y exportación las saltean.
+
+El instante de captura sale del nombre ``YYYYmmdd_HHMMSS[_mmm]*.jpg``; si el nombre
+no tiene ese formato se usa el mtime del archivo.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from infra.photo_layout import iter_shards, relpath_in_root, root_of
+from infra.photo_writer import add_commit_listener, is_temp_name
+
+PHOTO_EXTS = (".jpg", ".jpeg", ".png")
+
+# Columnas de la tabla photos; las agregadas en versiones nuevas se crean con ALTER TABLE
+_COLUMNS = (
+    ("path", "TEXT PRIMARY KEY"),
+    ("folder", "TEXT NOT NULL"),
+    ("name", "TEXT NOT NULL"),
+    ("taken_ts", "REAL NOT NULL"),
+    ("size", "INTEGER"),
+    ("mtime", "REAL"),
+    ("root", "TEXT"),       # carpeta raíz de fotos (= folder si es plana)
+    ("luma", "REAL"),       # brillo medio 0-255 medido al capturar (deflicker del timelapse)
+    ("quality", "REAL"),    # puntaje 0-1 de infra.frame_quality
+    ("reject", "TEXT"),     # motivos de rechazo separados por coma; NULL = foto usable
+)
+
+
+def folder_key(folder: str) -> str:
+    """Clave normalizada de carpeta (mismas rutas escritas distinto -> misma clave)."""
+    return os.path.normcase(os.path.abspath(folder))
+
+
+def taken_ts_from_name(name: str) -> Optional[float]:
+    """Epoch local de un nombre YYYYmmdd_HHMMSS[_mmm][...].ext, o None."""
+    base = os.path.basename(name)
+    try:
+        ts = datetime.strptime(base[:15], "%Y%m%d_%H%M%S").timestamp()
+    except Exception:
+        return None
+    ms = base[16:19]
+    if base[15:16] == "_" and len(ms) == 3 and ms.isdigit():
+        ts += int(ms) / 1000.0
+    return ts
+
+
+def is_photo_name(name: str) -> bool:
+    return name.lower().endswith(PHOTO_EXTS) and not is_temp_name(name)
+
+
+class PhotoCatalog:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        self._reconciled: Set[str] = set()     # directorios (raíz o día) ya escaneados
+        self._full: Set[str] = set()           # raíces escaneadas completas
+        self._reconcile_lock = threading.Lock()
+        self._init_schema()
+
+    # ---------- Esquema ----------
+    def _init_schema(self):
+        with self._lock:
+            cols = ", ".join(f"{n} {t}" for n, t in _COLUMNS)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS photos ({cols})")
+            have = {r[1] for r in self._db.execute("PRAGMA table_info(photos)")}
+            for n, t in _COLUMNS:
+                if n not in have:
+                    self._db.execute(f"ALTER TABLE photos ADD COLUMN {n} {t}")
+            self._db.execute("UPDATE photos SET root=folder WHERE root IS NULL")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_photos_folder_ts ON photos(folder, taken_ts)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_photos_root_ts ON photos(root, taken_ts)")
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.close()
+            except Exception:
+                pass
+
+    # ---------- Altas / bajas ----------
+    def add(self, path: str, taken_ts: Optional[float] = None, size: Optional[int] = None,
+            mtime: Optional[float] = None, luma: Optional[float] = None,
+            quality: Optional[float] = None, reject: Optional[Iterable[str]] = None):
+        """Agrega (o actualiza) una foto ya escrita con su nombre final."""
+        path = os.path.abspath(path)
+        folder, name = os.path.split(path)
+        if size is None or mtime is None:
+            try:
+                st = os.stat(path)
+                size = st.st_size if size is None else size
+                mtime = st.st_mtime if mtime is None else mtime
+            except Exception:
+                pass
+        if taken_ts is None:
+            taken_ts = taken_ts_from_name(name) or mtime or time.time()
+        reject = ",".join(reject) if reject else None
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO photos(path, folder, name, taken_ts, size, mtime, root, luma, quality, reject) "
+                "VALUES (?,?,?,?,?,?,?,?,?,?) "
+                "ON CONFLICT(path) DO UPDATE SET taken_ts=excluded.taken_ts, size=excluded.size, "
+                "mtime=excluded.mtime, luma=COALESCE(excluded.luma, luma), "
+                "quality=COALESCE(excluded.quality, quality), reject=COALESCE(excluded.reject, reject)",
+                (path, folder_key(folder), name, float(taken_ts), size, mtime, folder_key(root_of(folder)),
+                 None if luma is None else float(luma), None if quality is None else float(quality), reject))
+
+    def move(self, old: str, new: str):
+        """La foto cambió de ruta (migración de organización); conserva sus datos."""
+        new = os.path.abspath(new)
+        folder, name = os.path.split(new)
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE photos SET path=?, folder=?, name=?, root=? WHERE path=?",
+                (new, folder_key(folder), name, folder_key(root_of(folder)), os.path.abspath(old)))
+            moved = cur.rowcount
+        if not moved:
+            self.add(new)
+
+    def set_lumas(self, rows: Iterable[Tuple[str, float]]):
+        """Guarda el brillo medio de fotos que no lo tenían (medido después, p.ej. al exportar)."""
+        with self._lock:
+            self._db.executemany("UPDATE photos SET luma=? WHERE path=?",
+                                 [(float(l), os.path.abspath(p)) for p, l in rows])
+
+    def lumas(self, paths: List[str]) -> dict:
+        """{ruta: brillo medio o None} para ``paths``."""
+        out = {}
+        with self._lock:
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                q = ",".join("?" * len(chunk))
+                for p, l in self._db.execute(f"SELECT path, luma FROM photos WHERE path IN ({q})", chunk):
+                    out[p] = l
+        return out
+
+    def remove(self, path: str):
+        with self._lock:
+            self._db.execute("DELETE FROM photos WHERE path=?", (os.path.abspath(path),))
+
+    # ---------- Reconciliación ----------
+    def reconcile(self, folder: str) -> Tuple[int, int]:
+        """Sincroniza el catálogo de ``folder`` (un directorio) con el disco. Devuelve (agregadas, borradas)."""
+        key = folder_key(folder)
+        base = os.path.abspath(folder)
+        root = folder_key(root_of(base))
+        try:
+            on_disk = {f for f in os.listdir(base) if is_photo_name(f)}
+        except Exception:
+            return 0, 0
+        with self._lock:
+            known = {r[0] for r in self._db.execute("SELECT name FROM photos WHERE folder=?", (key,))}
+        new = on_disk - known
+        gone = known - on_disk
+        rows = []
+        for name in new:
+            p = os.path.join(base, name)
+            try:
+                st = os.stat(p)
+            except Exception:
+                continue
+            rows.append((p, key, name, taken_ts_from_name(name) or st.st_mtime, st.st_size, st.st_mtime, root))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO photos(path, folder, name, taken_ts, size, mtime, root) "
+                    "VALUES (?,?,?,?,?,?,?)",
+                    rows)
+                self._db.executemany("DELETE FROM photos WHERE folder=? AND name=?",
+                                     [(key, n) for n in gone])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(rows), len(gone)
+
+    def _ensure_dir(self, folder: str):
+        key = folder_key(folder)
+        if key not in self._reconciled:
+            self.reconcile(folder)
+            self._reconciled.add(key)
+
+    def ensure_folder(self, folder: str, since: Optional[float] = None,
+                      until: Optional[float] = None) -> bool:
+        """Reconcilia la raíz ``folder`` la primera vez que se usa en este proceso.
+
+        Con ``since``/``until`` solo se reconcilian las subcarpetas de día que
+        caen en el rango (además de las fotos planas de la raíz).
+        """
+        if not folder:
+            return False
+        full = since is None and until is None
+        key = folder_key(folder)
+        if key in self._full:
+            return True
+        # Un solo escaneo aunque lo pidan a la vez el arranque y la galería
+        with self._reconcile_lock:
+            if key in self._full:
+                return True
+            if not os.path.isdir(folder):
+                return False
+            self._ensure_dir(folder)
+            for _day, shard in iter_shards(folder, since, until):
+                self._ensure_dir(shard)
+            if full:
+                self._full.add(key)
+        return True
+
+    def ensure_latest(self, folder: str) -> bool:
+        """Reconcilia solo lo necesario para ``latest``: la raíz y el día más reciente.
+
+        Lo usa la reconciliación de fondo antes de ``ensure_folder`` para que
+        la última foto aparezca sin esperar el escaneo completo.
+        """
+        if not folder:
+            return False
+        if folder_key(folder) in self._full:
+            return True
+        with self._reconcile_lock:
+            if not os.path.isdir(folder):
+                return False
+            self._ensure_dir(folder)
+            for _day, shard in iter_shards(folder, newest_first=True):
+                self._ensure_dir(shard)
+                break
+            return True
+
+    def is_reconciled(self, folder: str) -> bool:
+        return bool(folder) and folder_key(folder) in self._full
+
+    # ---------- Consultas ----------
+    def latest(self, folder: str) -> Optional[str]:
+        """Ruta de la foto más reciente bajo la raíz ``folder`` que aún existe."""
+        if not os.path.isdir(folder):
+            # Pendrive desconectado: no borrar el catálogo por archivos "faltantes"
+            return None
+        key = folder_key(folder)
+        while True:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT path FROM photos WHERE root=? ORDER BY taken_ts DESC, name DESC LIMIT 1",
+                    (key,)).fetchone()
+            if row is None:
+                return None
+            if os.path.exists(row[0]):
+                return row[0]
+            # Borrada por fuera desde la reconciliación
+            self.remove(row[0])
+
+    def _range_sql(self, folder, since, until, usable_only=False):
+        sql = " FROM photos WHERE root=?"
+        args = [folder_key(folder)]
+        if usable_only:
+            sql += " AND reject IS NULL"
+        if since is not None:
+            sql += " AND taken_ts>=?"
+            args.append(float(since))
+        if until is not None:
+            sql += " AND taken_ts<?"
+            args.append(float(until))
+        return sql, args
+
+    def list(self, folder: str, since: Optional[float] = None, until: Optional[float] = None,
+             limit: Optional[int] = None, newest_first: bool = True) -> List[str]:
+        """Rutas bajo la raíz ``folder`` con since <= captura < until, ordenadas por instante de captura."""
+        sql, args = self._range_sql(folder, since, until)
+        order = "DESC" if newest_first else "ASC"
+        sql = f"SELECT path{sql} ORDER BY taken_ts {order}, name {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(max(0, int(limit)))
+        with self._lock:
+            return [r[0] for r in self._db.execute(sql, args)]
+
+    def entries(self, folder: str, since: Optional[float] = None, until: Optional[float] = None,
+                newest_first: bool = False, usable_only: bool = False) -> List[Tuple[str, float]]:
+        """(ruta, instante de captura) bajo la raíz ``folder``, como ``list``.
+
+        ``usable_only`` deja afuera las fotos rechazadas por calidad.
+        """
+        sql, args = self._range_sql(folder, since, until, usable_only)
+        order = "DESC" if newest_first else "ASC"
+        with self._lock:
+            return [(r[0], float(r[1])) for r in self._db.execute(
+                f"SELECT path, taken_ts{sql} ORDER BY taken_ts {order}, name {order}", args)]
+
+    def days(self, folder: str) -> List[str]:
+        """Días (``YYYY-MM-DD``, hora local) con fotos bajo la raíz ``folder``, en orden."""
+        with self._lock:
+            return [r[0] for r in self._db.execute(
+                "SELECT DISTINCT date(taken_ts, 'unixepoch', 'localtime') AS d FROM photos "
+                "WHERE root=? ORDER BY d", (folder_key(folder),))]
+
+    def count(self, folder: str, since: Optional[float] = None, until: Optional[float] = None) -> int:
+        sql, args = self._range_sql(folder, since, until)
+        with self._lock:
+            return int(self._db.execute(f"SELECT COUNT(*){sql}", args).fetchone()[0])
+
+    def names(self, folder: str) -> List[str]:
+        """Rutas relativas a la raíz ``folder`` (``YYYY/MM/DD/nombre`` o ``nombre``) en orden
+        de captura (para diferencias de sync). No incluye las rechazadas por calidad."""
+        with self._lock:
+            paths = [r[0] for r in self._db.execute(
+                "SELECT path FROM photos WHERE root=? AND reject IS NULL ORDER BY taken_ts, name",
+                (folder_key(folder),))]
+        return [relpath_in_root(p) for p in paths]
+
+    def rejected(self, folder: str) -> List[Tuple[str, str]]:
+        """(ruta relativa, motivos) de las fotos rechazadas por calidad bajo la raíz ``folder``."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, reject FROM photos WHERE root=? AND reject IS NOT NULL ORDER BY taken_ts, name",
+                (folder_key(folder),)).fetchall()
+        return [(relpath_in_root(p), r) for p, r in rows]
+
+
+_CATALOG: Optional[PhotoCatalog] = None
+_CATALOG_LOCK = threading.Lock()
+
+
+def default_db_path() -> str:
+    try:
+        from config import settings as _cfg
+        p = getattr(_cfg, "PHOTO_CATALOG_PATH", None)
+        if p:
+            return p
+        return os.path.join(_cfg.APPDATA_DIR, "photo_catalog.sqlite3")
+    except Exception:
+        return os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "KatcamPro",
+                            "photo_catalog.sqlite3")
+
+
+def get_catalog() -> PhotoCatalog:
+    """Catálogo compartido del proceso; la primera llamada lo abre y lo suscribe a los commits."""
+    global _CATALOG
+    if _CATALOG is not None:
+        return _CATALOG
+    with _CATALOG_LOCK:
+        if _CATALOG is None:
+            cat = PhotoCatalog(default_db_path())
+
+            def _on_commit(path, info):
+                try:
+                    q = info.get("quality") or {}
+                    # mtime del archivo (None: lo lee add), igual que en reconcile
+                    cat.add(path, size=info.get("bytes"), mtime=None,
+                            luma=info.get("mean_brightness"), quality=q.get("score"),
+                            reject=q.get("reject"))
+                except Exception:
+                    pass
+            add_commit_listener(_on_commit)
+            _CATALOG = cat
+    return _CATALOG
+
+
+def catalog_names_or_listdir(folder: str) -> Iterable[str]:
+    """Rutas relativas de fotos de ``folder`` desde el catálogo; si no está disponible, listdir."""
+    try:
+        cat = get_catalog()
+        if cat.ensure_folder(folder):
+            return cat.names(folder)
+    except Exception:
+        pass
+    return sorted(f for f in os.listdir(folder) if is_photo_name(f))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Organización de la carpeta de fotos: plana o por día (``YYYY/MM/DD``).
+
+Con ``PHOTO_LAYOUT = "daily"`` cada captura va a ``photo_dir/YYYY/MM/DD/``:
+ningún directorio crece con el total de fotos (en FAT32/exFAT un directorio
+con decenas de miles de entradas hace lento cada listado y cada alta) y los
+filtros por fecha solo tocan los días pedidos.
+
+La carpeta raíz sigue siendo la que elige el usuario; todo lo demás
+(catálogo, galería, última foto, sync) trabaja con la raíz y con rutas
+relativas a ella, así que una carpeta a medio migrar (fotos planas y por día)
+funciona igual. ``migrate_to_daily`` mueve las fotos planas existentes.
+"""
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+LAYOUTS = ("flat", "daily")
+
+_YEAR = re.compile(r"^\d{4}$")
+_TWO = re.compile(r"^\d{2}$")
+
+
+def layout_mode() -> str:
+    try:
+        from config import settings as _cfg
+        mode = str(getattr(_cfg, "PHOTO_LAYOUT", "flat")).lower()
+    except Exception:
+        mode = "flat"
+    return mode if mode in LAYOUTS else "flat"
+
+
+def shard_for(ts: Optional[float] = None) -> str:
+    """Subcarpeta relativa ``YYYY/MM/DD`` (hora local) para el instante ``ts``."""
+    t = time.localtime(time.time() if ts is None else float(ts))
+    return os.path.join(f"{t.tm_year:04d}", f"{t.tm_mon:02d}", f"{t.tm_mday:02d}")
+
+
+def photo_folder_for(root: str, ts: Optional[float] = None, mode: Optional[str] = None) -> str:
+    """Carpeta donde va una captura tomada en ``ts`` bajo ``root``."""
+    if (mode or layout_mode()) == "daily":
+        return os.path.join(root, shard_for(ts))
+    return root
+
+
+def split_shard(folder: str) -> Tuple[str, Optional[date]]:
+    """(raíz, día) si ``folder`` termina en ``YYYY/MM/DD``; si no (``folder``, None)."""
+    folder = os.path.abspath(folder)
+    d2, dd = os.path.split(folder)
+    d1, mm = os.path.split(d2)
+    root, yyyy = os.path.split(d1)
+    if _YEAR.match(yyyy) and _TWO.match(mm) and _TWO.match(dd):
+        try:
+            return root, date(int(yyyy), int(mm), int(dd))
+        except ValueError:
+            pass
+    return folder, None
+
+
+def root_of(folder: str) -> str:
+    return split_shard(folder)[0]
+
+
+def relpath_in_root(path: str) -> str:
+    """Ruta de una foto relativa a su raíz, con ``/`` (igual en Windows y en el manifiesto)."""
+    folder, name = os.path.split(os.path.abspath(path))
+    root, day = split_shard(folder)
+    if day is None:
+        return name
+    return f"{day.year:04d}/{day.month:02d}/{day.day:02d}/{name}"
+
+
+def _subdirs(path: str, pattern) -> List[str]:
+    try:
+        return sorted(d for d in os.listdir(path) if pattern.match(d) and os.path.isdir(os.path.join(path, d)))
+    except Exception:
+        return []
+
+
+def iter_shards(root: str, since: Optional[float] = None, until: Optional[float] = None,
+                newest_first: bool = False) -> Iterator[Tuple[date, str]]:
+    """(día, carpeta) de los días existentes bajo ``root`` que se solapan con [since, until).
+
+    Solo lista los años/meses que pueden caer en el rango: un filtro de una
+    semana no recorre el resto de la carpeta.
+    """
+    d_lo = datetime.fromtimestamp(since).date() if since is not None else None
+    # until es exclusivo: el último día posible es el del instante anterior
+    d_hi = datetime.fromtimestamp(until - 1e-6).date() if until is not None else None
+    for y in _subdirs(root, _YEAR)[::-1 if newest_first else 1]:
+        yi = int(y)
+        if (d_lo and yi < d_lo.year) or (d_hi and yi > d_hi.year):
+            continue
+        ydir = os.path.join(root, y)
+        for m in _subdirs(ydir, _TWO)[::-1 if newest_first else 1]:
+            mi = int(m)
+            if (d_lo and (yi, mi) < (d_lo.year, d_lo.month)) or (d_hi and (yi, mi) > (d_hi.year, d_hi.month)):
+                continue
+            mdir = os.path.join(ydir, m)
+            for d in _subdirs(mdir, _TWO)[::-1 if newest_first else 1]:
+                try:
+                    day = date(yi, mi, int(d))
+                except ValueError:
+                    continue
+                if (d_lo and day < d_lo) or (d_hi and day > d_hi):
+                    continue
+                yield day, os.path.join(mdir, d)
+
+
+def migrate_to_daily(root: str, on_moved: Optional[Callable[[str, str], None]] = None,
+                     should_stop: Optional[Callable[[], bool]] = None,
+                     is_photo: Optional[Callable[[str], bool]] = None) -> dict:
+    """Mueve las fotos planas de ``root`` a ``root/YYYY/MM/DD`` (una pasada, reanudable).
+
+    El día sale del nombre ``YYYYmmdd_HHMMSS*`` o, si no tiene ese formato,
+    del mtime. Se usa ``os.replace`` dentro del mismo volumen (no copia datos)
+    y nunca se pisa un archivo existente en el destino. ``on_moved(viejo, nuevo)``
+    se llama por cada foto movida (catálogo, cola de sync).
+    """
+    from infra.photo_catalog import is_photo_name, taken_ts_from_name
+    is_photo = is_photo or is_photo_name
+    moved = skipped = failed = 0
+    try:
+        names = [n for n in os.listdir(root) if is_photo(n)]
+    except Exception:
+        return {"moved": 0, "skipped": 0, "failed": 0}
+    for name in sorted(names):
+        if should_stop is not None and should_stop():
+            break
+        src = os.path.join(root, name)
+        try:
+            ts = taken_ts_from_name(name) or os.path.getmtime(src)
+            dst_dir = photo_folder_for(root, ts, mode="daily")
+            dst = os.path.join(dst_dir, name)
+            if os.path.exists(dst):
+                skipped += 1
+                continue
+            os.makedirs(dst_dir, exist_ok=True)
+            os.replace(src, dst)
+        except Exception:
+            failed += 1
+            continue
+        moved += 1
+        if on_moved is not None:
+            try:
+                on_moved(src, dst)
+            except Exception:
+                pass
+    return {"moved": moved, "skipped": skipped, "failed": failed}
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""Etapa asíncrona de codificación JPEG + escritura a disco para capturas.
+
+CameraManager entrega el frame crudo y recupera la cámara de inmediato; los
+hilos de esta etapa codifican (cv2.imencode libera el GIL), escriben a un
+archivo temporal oculto (``.NOMBRE.jpg.tmp``) y lo renombran al nombre final,
+así nunca queda un JPEG a medio escribir con el nombre definitivo.
+
+Durabilidad (``fsync``) configurable:
+ - ``"none"``: solo rename; lo más rápido, el SO decide cuándo bajar a disco.
+ - ``"file"``: fsync del archivo antes del rename (y del directorio después,
+   donde el SO lo permite). Cada foto queda en disco al confirmarse.
+ - ``"batch"``: fsync agrupado cada ``fsync_batch`` fotos o ``fsync_batch_s``
+   segundos (y al cerrar); acota la pérdida ante un corte sin pagar un fsync
+   por foto en pendrives lentos.
+
+Los nombres se reservan con ``reserve_photo_path`` (``YYYYmmdd_HHMMSS_mmm``
+con milisegundos y, si aun así choca, un contador ``_N``): dos capturas en el
+mismo segundo ya no se pisan, porque el rename final reemplazaría en silencio
+al archivo existente.
+
+Cuando una foto queda con su nombre final se avisa a los oyentes registrados
+con ``add_commit_listener`` (sync, UI) en lugar de que estos adivinen por mtime.
+
+Se usan hilos y no procesos: tanto la codificación como la escritura sueltan
+el GIL, y un pool de procesos obligaría a serializar frames de hasta 144 MB
+(48MP BGR) por cada foto.
+
+La cola es acotada (``max_pending``): si el disco no da abasto, ``submit``
+bloquea al productor en vez de acumular frames en memoria sin límite.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+
+FSYNC_POLICIES = ("none", "file", "batch")
+
+_listeners: List[Callable[[str, dict], None]] = []
+_listeners_lock = threading.Lock()
+
+
+def add_commit_listener(fn: Callable[[str, dict], None]):
+    """Registra ``fn(path, info)``; se llama desde el hilo escritor al confirmar cada foto."""
+    with _listeners_lock:
+        if fn not in _listeners:
+            _listeners.append(fn)
+
+
+def remove_commit_listener(fn: Callable[[str, dict], None]):
+    with _listeners_lock:
+        try:
+            _listeners.remove(fn)
+        except ValueError:
+            pass
+
+
+def _notify_committed(path: str, info: dict):
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for fn in listeners:
+        try:
+            fn(path, info)
+        except Exception:
+            pass
+
+
+def temp_path_for(path: str) -> str:
+    """Nombre temporal oculto junto al destino final."""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, "." + name + ".tmp")
+
+
+def is_temp_name(name: str) -> bool:
+    """True para archivos temporales de escritura en curso (no son fotos)."""
+    base = os.path.basename(name)
+    return base.startswith(".") and base.endswith(".tmp")
+
+
+_reserved = set()
+_reserved_lock = threading.Lock()
+
+
+def photo_stem(ts: Optional[float] = None) -> str:
+    """``YYYYmmdd_HHMMSS_mmm`` (hora local, milisegundos)."""
+    ts = time.time() if ts is None else float(ts)
+    return time.strftime("%Y%m%d_%H%M%S", time.localtime(ts)) + "_%03d" % (int(ts * 1000) % 1000)
+
+
+def reserve_photo_path(folder: str, ts: Optional[float] = None, ext: str = ".jpg") -> str:
+    """Ruta nueva en ``folder`` que no existe ni está reservada por otra captura en curso.
+
+    La reserva se suelta cuando el escritor termina con esa ruta (o con
+    ``release_photo_path``); si nunca llega a escribirse solo queda un nombre sin usar.
+    """
+    stem = photo_stem(ts)
+    with _reserved_lock:
+        n = 0
+        while True:
+            name = stem + (f"_{n}" if n else "") + ext
+            path = os.path.join(folder, name)
+            if path not in _reserved and not os.path.exists(path) and not os.path.exists(temp_path_for(path)):
+                _reserved.add(path)
+                return path
+            n += 1
+
+
+def release_photo_path(path: str):
+    with _reserved_lock:
+        _reserved.discard(path)
+
+
+def make_preview(frame, size: Tuple[int, int]):
+    """Copia RGB de ``frame`` (BGR) que entra en ``size`` manteniendo aspecto, sin agrandar."""
+    h, w = frame.shape[:2]
+    scale = min(1.0, size[0] / float(w), size[1] / float(h))
+    dw, dh = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    if (dw, dh) != (w, h):
+        frame = cv2.resize(frame, (dw, dh), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def _fsync_dir(folder: str):
+    # En Windows no se puede abrir un directorio para fsync; el rename ya es atómico
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(folder or ".", os.O_RDONLY)
+    except Exception:
+        return
+    try:
+        os.fsync(fd)
+    except Exception:
+        pass
+    finally:
+        os.close(fd)
+
+
+class PhotoWriter:
+    def __init__(self, workers: int = 1, max_pending: int = 4, fsync_policy: str = "batch",
+                 fsync_batch: int = 8, fsync_batch_s: float = 5.0):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                        thread_name_prefix="photo_writer")
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        policy = str(fsync_policy or "none").lower()
+        self.fsync_policy = policy if policy in FSYNC_POLICIES else "none"
+        self.fsync_batch = max(1, int(fsync_batch))
+        self.fsync_batch_s = float(fsync_batch_s)
+        # Fotos confirmadas aún sin fsync (modo batch)
+        self._unsynced: List[str] = []
+        self._unsynced_since = 0.0
+        self._sync_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Fotos encoladas o en proceso."""
+        return self._pending
+
+    def submit(self, frame, path: str, jpeg_quality: int = 95,
+               release: Optional[Callable[[], None]] = None,
+               preview_size: Optional[Tuple[int, int]] = None, meta: Optional[dict] = None,
+               analyze: Optional[Callable[[object], Optional[dict]]] = None) -> Future:
+        """Encola frame para guardarlo en ``path``.
+
+        ``release`` se invoca en cuanto el frame deja de necesitarse (tras
+        codificar), p.ej. para liberar una vista fijada del anillo de frames.
+        Con ``preview_size=(w, h)`` se genera además una copia RGB que entra
+        en ese tamaño (sin agrandar), para mostrarla sin releer el JPEG.
+        ``meta`` (p.ej. {"mean_brightness": ...}) se agrega al dict que reciben
+        los oyentes de commit. ``analyze(frame)`` corre en esta etapa, antes de
+        codificar (el frame sigue fijado), y su dict también se agrega: así
+        las estadísticas del frame no ocupan el hilo de la cámara.
+        El Future resuelve a un dict con path, bytes, tiempos
+        (queue_ms, analyze_ms, encode_ms, write_ms), "preview" (o None) y ``meta``, o propaga la excepción.
+        """
+        self._slots.acquire()
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            fut = self._pool.submit(self._job, frame, path, int(jpeg_quality), release,
+                                    preview_size, time.perf_counter(), meta, analyze)
+        except Exception:
+            release_photo_path(path)
+            self._job_done()
+            if release is not None:
+                release()
+            raise
+        fut.add_done_callback(lambda _f: self._job_done())
+        return fut
+
+    def flush(self):
+        """Fuerza a disco las fotos confirmadas pendientes de fsync (modo batch)."""
+        with self._sync_lock:
+            paths, self._unsynced = self._unsynced, []
+        if not paths:
+            return
+        folders = set()
+        for p in paths:
+            try:
+                # En Windows os.fsync exige el archivo abierto con escritura
+                with open(p, "rb+") as f:
+                    os.fsync(f.fileno())
+                folders.add(os.path.dirname(p))
+            except Exception:
+                pass
+        for d in folders:
+            _fsync_dir(d)
+
+    def shutdown(self, wait: bool = True):
+        """Deja de aceptar fotos; con wait=True espera a que se escriban las pendientes."""
+        self._pool.shutdown(wait=wait)
+        if wait:
+            self.flush()
+
+    # ---------- Internos ----------
+    def _job_done(self):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _job(self, frame, path, jpeg_quality, release, preview_size, t_submit, meta=None, analyze=None):
+        try:
+            return self._write(frame, path, jpeg_quality, release, preview_size, t_submit, meta, analyze)
+        finally:
+            # Ya está en disco (o falló): la reserva del nombre no hace falta más
+            release_photo_path(path)
+
+    def _write(self, frame, path, jpeg_quality, release, preview_size, t_submit, meta=None, analyze=None):
+        t_start = time.perf_counter()
+        preview = None
+        analysis = None
+        try:
+            if analyze is not None:
+                try:
+                    analysis = analyze(frame)
+                except Exception:
+                    analysis = None
+            t_analyzed = time.perf_counter()
+            if preview_size:
+                try:
+                    preview = make_preview(frame, preview_size)
+                except Exception:
+                    preview = None
+            ext = os.path.splitext(path)[1] or ".jpg"
+            ok, buf = cv2.imencode(ext, frame, [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality])
+        finally:
+            if release is not None:
+                try:
+                    release()
+                except Exception:
+                    pass
+        if not ok:
+            raise RuntimeError(f"No se pudo codificar {os.path.basename(path)}")
+        t_encoded = time.perf_counter()
+
+        tmp = temp_path_for(path)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(memoryview(buf))
+                if self.fsync_policy == "file":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            raise
+        if self.fsync_policy == "file":
+            _fsync_dir(os.path.dirname(path))
+        elif self.fsync_policy == "batch":
+            self._queue_fsync(path)
+        t_written = time.perf_counter()
+        info = {
+            "path": path,
+            "bytes": int(buf.size),
+            "queue_ms": (t_start - t_submit) * 1000.0,
+            "analyze_ms": (t_analyzed - t_start) * 1000.0,
+            "encode_ms": (t_encoded - t_analyzed) * 1000.0,
+            "write_ms": (t_written - t_encoded) * 1000.0,
+            "preview": preview,
+        }
+        if meta:
+            info.update(meta)
+        if analysis:
+            info.update(analysis)
+        _notify_committed(path, info)
+        return info
+
+    def _queue_fsync(self, path):
+        now = time.monotonic()
+        arm = False
+        with self._sync_lock:
+            if not self._unsynced:
+                self._unsynced_since = now
+                arm = True
+            self._unsynced.append(path)
+            due = (len(self._unsynced) >= self.fsync_batch
+                   or now - self._unsynced_since >= self.fsync_batch_s)
+        if due:
+            self.flush()
+        elif arm:
+            # Sin más fotos (p.ej. timelapse lento) el lote se baja igual por tiempo
+            t = threading.Timer(self.fsync_batch_s, self.flush)
+            t.daemon = True
+            t.start()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Manifiesto persistente de sincronización (SQLite en APPDATA).
+
+Guarda qué fotos ya se subieron a cada destino (nombre, tamaño, mtime y hash
+del origen al momento de copiar). Con esto la sincronización no necesita
+listar la carpeta del Drive (en un montaje de Google Drive un ``listdir``
+puede tardar 10+ s) y retoma donde quedó después de reiniciar.
+
+Una foto cuenta como subida si su tamaño y mtime actuales coinciden con los
+registrados; si cambió en el origen se vuelve a subir.
+
+Los nombres son rutas relativas a la raíz de fotos (``YYYY/MM/DD/nombre``
+o ``nombre``); cuando una foto se migra a su carpeta de día, ``rename`` mueve
+su registro para que no se vuelva a subir. La copia del Drive se mueve
+aparte (``SyncEngine.relocate``): mientras no se pudo mover, ``dest_name``
+guarda dónde está realmente.
+
+El hash sirve además de índice de contenido: una foto renombrada o
+re-exportada con los mismos bytes se registra como duplicado (``dup_of``)
+en vez de copiarse otra vez.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from infra.photo_catalog import folder_key
+
+_COLUMNS = (
+    ("dest", "TEXT NOT NULL"),
+    ("name", "TEXT NOT NULL"),
+    ("size", "INTEGER"),
+    ("mtime", "REAL"),
+    ("sha1", "TEXT"),
+    ("uploaded_ts", "REAL"),
+    # Si no se copió por tener el mismo contenido que otra ya subida: su nombre
+    ("dup_of", "TEXT"),
+    # Ruta de la copia en el destino si todavía no coincide con name (falta moverla)
+    ("dest_name", "TEXT"),
+)
+
+
+class SyncManifest:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock:
+            cols = ", ".join(f"{n} {t}" for n, t in _COLUMNS)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS uploaded ({cols}, PRIMARY KEY(dest, name))")
+            have = {r[1] for r in self._db.execute("PRAGMA table_info(uploaded)")}
+            for n, t in _COLUMNS:
+                if n not in have:
+                    self._db.execute(f"ALTER TABLE uploaded ADD COLUMN {n} {t}")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_hash ON uploaded(dest, sha1)")
+            # rename() busca por nombre en todos los destinos
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_name ON uploaded(name)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_dup ON uploaded(dup_of)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_misplaced ON uploaded(dest_name) "
+                             "WHERE dest_name IS NOT NULL")
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.close()
+            except Exception:
+                pass
+
+    # ---------- API ----------
+    def is_uploaded(self, dest: str, name: str, size: Optional[int] = None,
+                    mtime: Optional[float] = None) -> bool:
+        """True si ``name`` ya está en ``dest`` (y, si se pasan, con el mismo tamaño/mtime)."""
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime FROM uploaded WHERE dest=? AND name=?",
+                                   (folder_key(dest), name)).fetchone()
+        if row is None:
+            return False
+        if size is not None and row[0] is not None and int(row[0]) != int(size):
+            return False
+        if mtime is not None and row[1] is not None and abs(float(row[1]) - float(mtime)) > 1.0:
+            return False
+        return True
+
+    def mark_uploaded(self, dest: str, name: str, size: Optional[int], mtime: Optional[float],
+                      sha1: Optional[str] = None, dup_of: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploaded(dest, name, size, mtime, sha1, uploaded_ts, dup_of) "
+                "VALUES (?,?,?,?,?,?,?)",
+                (folder_key(dest), name, size, mtime, sha1, time.time(), dup_of))
+
+    def find_by_hash(self, dest: str, sha1: str, size: Optional[int] = None) -> List[str]:
+        """Nombres de las fotos ya copiadas a ``dest`` con ese contenido."""
+        sql = "SELECT name FROM uploaded WHERE dest=? AND sha1=? AND dup_of IS NULL"
+        args = [folder_key(dest), sha1]
+        if size is not None:
+            sql += " AND size=?"
+            args.append(int(size))
+        with self._lock:
+            return [r[0] for r in self._db.execute(sql, args)]
+
+    def mark_many(self, dest: str, rows: Iterable[tuple]):
+        """Alta en bloque de (name, size, mtime, sha1)."""
+        key, now = folder_key(dest), time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO uploaded(dest, name, size, mtime, sha1, uploaded_ts) VALUES (?,?,?,?,?,?)",
+                    [(key, n, s, m, h, now) for (n, s, m, h) in rows])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def rename(self, old: str, new: str) -> int:
+        """La foto de origen ``old`` (ruta relativa) pasó a llamarse ``new``, en todos los destinos.
+
+        La migración a carpetas por día no cambia el contenido ni el mtime: lo
+        ya subido sigue contando como subido con la ruta nueva y no se copia
+        otra vez. La copia del destino sigue en la ruta vieja hasta que se
+        mueva: queda en ``dest_name`` (ver ``misplaced`` / ``placed``).
+        Devuelve cuántas filas se renombraron.
+        """
+        if old == new:
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                n = self._db.execute(
+                    "UPDATE OR REPLACE uploaded SET name=?, dest_name=CASE WHEN dup_of IS NULL "
+                    "THEN NULLIF(COALESCE(dest_name, ?), ?) END WHERE name=?",
+                    (new, old, new, old)).rowcount
+                self._db.execute("UPDATE uploaded SET dup_of=? WHERE dup_of=?", (new, old))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return n
+
+    def misplaced(self, dest: Optional[str] = None, name: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """(destino, name, dest_name) de las copias que quedaron en otra ruta del destino."""
+        sql, args = "SELECT dest, name, dest_name FROM uploaded WHERE dest_name IS NOT NULL", []
+        if dest is not None:
+            sql += " AND dest=?"
+            args.append(folder_key(dest))
+        if name is not None:
+            sql += " AND name=?"
+            args.append(name)
+        with self._lock:
+            return [tuple(r) for r in self._db.execute(sql, args)]
+
+    def placed(self, dest: str, name: str):
+        """La copia de ``name`` ya está en su ruta del destino."""
+        with self._lock:
+            self._db.execute("UPDATE uploaded SET dest_name=NULL WHERE dest=? AND name=?",
+                             (folder_key(dest), name))
+
+    def forget(self, dest: str, name: str):
+        with self._lock:
+            self._db.execute("DELETE FROM uploaded WHERE dest=? AND name=?", (folder_key(dest), name))
+
+    def names(self, dest: str) -> Set[str]:
+        with self._lock:
+            return {r[0] for r in self._db.execute("SELECT name FROM uploaded WHERE dest=?", (folder_key(dest),))}
+
+    def count(self, dest: str) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM uploaded WHERE dest=?",
+                                        (folder_key(dest),)).fetchone()[0])
+
+
+_MANIFEST: Optional[SyncManifest] = None
+_MANIFEST_LOCK = threading.Lock()
+
+
+def default_db_path() -> str:
+    try:
+        from config import settings as _cfg
+        p = getattr(_cfg, "SYNC_MANIFEST_PATH", None)
+        if p:
+            return p
+        return os.path.join(_cfg.APPDATA_DIR, "sync_manifest.sqlite3")
+    except Exception:
+        return os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "KatcamPro",
+                            "sync_manifest.sqlite3")
+
+
+def get_sync_manifest() -> SyncManifest:
+    global _MANIFEST
+    if _MANIFEST is not None:
+        return _MANIFEST
+    with _MANIFEST_LOCK:
+        if _MANIFEST is None:
+            _MANIFEST = SyncManifest(default_db_path())
+    return _MANIFEST
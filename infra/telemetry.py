@@ -2,22 +2,63 @@
 Registro ligero de eventos y métricas (similar a un Sentry minimalista offline).
 
 Características:
- - Cola en memoria con snapshot circular.
- - Escritura en JSONL (append) para análisis posterior.
+ - Snapshot en memoria en anillos de capacidad fija (deque con maxlen, O(1)
+   por evento): uno general y uno por tipo de evento, para que los tipos
+   poco frecuentes no sean desplazados por los heartbeats. get_recent permite
+   filtrar por tipo y por instante sin copiar el anillo completo.
+ - Escritura en JSONL (append) para análisis posterior, en un hilo propio:
+   log_event solo encola; el hilo serializa y escribe por lotes (por tamaño
+   o por tiempo), así la telemetría no agrega I/O al hilo de la cámara.
+ - Cola acotada con política bajo presión: pasado el umbral suave se
+   muestrean los eventos comunes (1 de cada N por tipo); con la cola llena
+   se descartan, salvo los críticos (errores, fin de captura), que desplazan
+   al más viejo. Los descartes se cuentan (get_stats) y se informan con un
+   evento "telemetry_dropped".
  - API simple: log_event(tipo, **campos), log_error(exc, context=...).
  - Función dump_state(state) para capturar banderas clave.
 """
 from __future__ import annotations
-import json, os, threading, time, traceback, datetime as _dt, logging, gzip, shutil
+import json, os, threading, time, traceback, datetime as _dt, logging, gzip, shutil, atexit
+from collections import deque
 from typing import Any, Dict, Optional
 
+try:
+    from config import settings as _cfg
+except Exception:
+    _cfg = None
+
 _LOCK = threading.Lock()
-_BUFFER = []  # circular (mantener últimos N en memoria)
-_MAX_IN_MEMORY = 500
+_MAX_IN_MEMORY = max(1, int(getattr(_cfg, "TELEMETRY_MEMORY_SIZE", 500)))
+_MAX_PER_TYPE = max(1, int(getattr(_cfg, "TELEMETRY_MEMORY_PER_TYPE", 50)))
+# Entradas (epoch, evento): el epoch permite filtrar por "since" sin parsear ts
+_RING: deque = deque(maxlen=_MAX_IN_MEMORY)
+_TYPE_RINGS: Dict[str, deque] = {}
 _LOG_PATH: Optional[str] = None
 _TELEMETRY_LOGGER: Optional[logging.Logger] = None
 _USE_LOGGER = False
 
+# Escritor asíncrono por lotes
+_ASYNC = bool(getattr(_cfg, "TELEMETRY_ASYNC", True))
+_QUEUE_MAX = max(1, int(getattr(_cfg, "TELEMETRY_QUEUE_MAX", 2000)))
+_QUEUE_SOFT = int(_QUEUE_MAX * float(getattr(_cfg, "TELEMETRY_QUEUE_SOFT_RATIO", 0.75)))
+_SAMPLE_EVERY = max(1, int(getattr(_cfg, "TELEMETRY_SAMPLE_EVERY", 10)))
+_BATCH_MAX = max(1, int(getattr(_cfg, "TELEMETRY_BATCH_MAX", 100)))
+_FLUSH_INTERVAL_S = float(getattr(_cfg, "TELEMETRY_FLUSH_INTERVAL_S", 1.0))
+# Nunca se muestrean; con la cola llena desplazan al evento más viejo
+_CRITICAL_TYPES = frozenset(getattr(_cfg, "TELEMETRY_CRITICAL_TYPES", (
+    "error", "capture_end", "capture_timeout", "telemetry_init", "telemetry_dropped",
+)))
+
+_Q = deque()
+_Q_COND = threading.Condition(threading.Lock())
+_SINK_THREAD: Optional[threading.Thread] = None
+_SINK_STOP = False
+_SAMPLE_COUNTS: Dict[str, int] = {}
+_STATS = {"queued": 0, "written": 0, "batches": 0, "sampled_out": 0,
+          "dropped": 0, "evicted": 0, "max_queue": 0}
+_REPORTED_LOSS = 0
+_INFLIGHT = 0  # eventos tomados por el hilo escritor y aún no escritos
+
 def init_telemetry(base_dir: str):
     """Inicializa archivo JSONL en base_dir/telemetry/telemetry.log"""
     global _LOG_PATH, _TELEMETRY_LOGGER, _USE_LOGGER
@@ -113,13 +154,22 @@ def init_telemetry(base_dir: str):
                 pass
             return
 
-def _write_line(obj: Dict[str, Any]):
-    # If we configured a logger, use it (logger expects a single message string)
+def _serialize(obj: Dict[str, Any]) -> str:
+    try:
+        return json.dumps(obj, ensure_ascii=False)
+    except Exception:
+        # Campos no serializables: degradar a texto antes que perder el evento
+        return json.dumps(obj, ensure_ascii=False, default=str)
+
+def _write_lines(lines):
+    """Escribe un lote de líneas JSON ya serializadas (una sola operación de I/O)."""
+    if not lines:
+        return
+    # If we configured a logger, use it (one message per batch; the handler adds the final newline)
     try:
         if _USE_LOGGER and _TELEMETRY_LOGGER is not None:
             try:
-                # write pre-serialized JSON string as the log message
-                _TELEMETRY_LOGGER.info(json.dumps(obj, ensure_ascii=False))
+                _TELEMETRY_LOGGER.info("\n".join(lines))
                 return
             except Exception:
                 # fallback to direct file write below
@@ -138,24 +188,150 @@ def _write_line(obj: Dict[str, Any]):
             except Exception:
                 pass
         with open(_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            f.write("\n".join(lines) + "\n")
     except Exception:
         try:
             logging.getLogger().exception("Failed to write telemetry to %s", _LOG_PATH)
         except Exception:
             pass
 
+def _write_line(obj: Dict[str, Any]):
+    _write_lines([_serialize(obj)])
+
+def _sink_enabled() -> bool:
+    return (_USE_LOGGER and _TELEMETRY_LOGGER is not None) or _LOG_PATH is not None
+
+def _ensure_sink_thread():
+    global _SINK_THREAD
+    if _SINK_THREAD is not None and _SINK_THREAD.is_alive():
+        return
+    with _Q_COND:
+        if _SINK_THREAD is not None and _SINK_THREAD.is_alive():
+            return
+        _SINK_THREAD = threading.Thread(target=_sink_loop, name="telemetry_sink", daemon=True)
+        _SINK_THREAD.start()
+
+def _enqueue(rec: Dict[str, Any]):
+    """Encola sin bloquear aplicando la política de muestreo/descarte."""
+    etype = rec.get("type")
+    critical = etype in _CRITICAL_TYPES
+    with _Q_COND:
+        n = len(_Q)
+        if n >= _QUEUE_MAX:
+            if not critical:
+                _STATS["dropped"] += 1
+                return
+            _Q.popleft()
+            _STATS["evicted"] += 1
+        elif n >= _QUEUE_SOFT and not critical:
+            c = _SAMPLE_COUNTS.get(etype, 0)
+            _SAMPLE_COUNTS[etype] = c + 1
+            if c % _SAMPLE_EVERY:
+                _STATS["sampled_out"] += 1
+                return
+        _Q.append(rec)
+        _STATS["queued"] += 1
+        if len(_Q) > _STATS["max_queue"]:
+            _STATS["max_queue"] = len(_Q)
+        if len(_Q) >= _BATCH_MAX:
+            _Q_COND.notify()
+    _ensure_sink_thread()
+
+def _take_batch():
+    batch = []
+    while _Q and len(batch) < _BATCH_MAX:
+        batch.append(_Q.popleft())
+    if not _Q:
+        _SAMPLE_COUNTS.clear()
+    return batch
+
+def _loss_report() -> Optional[Dict[str, Any]]:
+    """Evento con los descartes acumulados desde el último reporte (o None)."""
+    global _REPORTED_LOSS
+    lost = _STATS["dropped"] + _STATS["sampled_out"] + _STATS["evicted"]
+    if lost == _REPORTED_LOSS:
+        return None
+    delta = lost - _REPORTED_LOSS
+    _REPORTED_LOSS = lost
+    return {"ts": _dt.datetime.utcnow().isoformat() + "Z", "type": "telemetry_dropped",
+            "lost": delta, "dropped": _STATS["dropped"], "sampled_out": _STATS["sampled_out"],
+            "evicted": _STATS["evicted"]}
+
+def _sink_loop():
+    global _INFLIGHT
+    while True:
+        with _Q_COND:
+            if len(_Q) < _BATCH_MAX and not _SINK_STOP:
+                _Q_COND.wait(_FLUSH_INTERVAL_S)
+            batch = _take_batch()
+            loss = _loss_report()
+            stop = _SINK_STOP and not _Q
+            _INFLIGHT = len(batch)
+        if loss is not None:
+            batch.append(loss)
+        if batch:
+            _write_lines([_serialize(r) for r in batch])
+        with _Q_COND:
+            if batch:
+                _STATS["written"] += len(batch)
+                _STATS["batches"] += 1
+            _INFLIGHT = 0
+            _Q_COND.notify_all()
+        if stop:
+            return
+
+def flush(timeout: float = 2.0) -> bool:
+    """Espera a que se escriba lo encolado hasta ahora. True si la cola quedó vacía."""
+    if _SINK_THREAD is None or not _SINK_THREAD.is_alive():
+        return not _Q
+    deadline = time.time() + max(0.0, timeout)
+    with _Q_COND:
+        while _Q or _INFLIGHT:
+            _Q_COND.notify_all()
+            left = deadline - time.time()
+            if left <= 0:
+                return False
+            _Q_COND.wait(min(left, 0.05))
+    return True
+
+def shutdown(timeout: float = 2.0):
+    """Vacía la cola y detiene el hilo escritor (se registra en atexit)."""
+    global _SINK_STOP
+    t = _SINK_THREAD
+    if t is None or not t.is_alive():
+        return
+    with _Q_COND:
+        _SINK_STOP = True
+        _Q_COND.notify_all()
+    t.join(timeout)
+
+atexit.register(shutdown)
+
+def get_stats() -> Dict[str, int]:
+    """Contadores del escritor: encolados, escritos, lotes, muestreados, descartados."""
+    with _Q_COND:
+        return {**_STATS, "pending": len(_Q)}
+
 def log_event(event_type: str, **fields: Any):
+    now = time.time()
     rec = {
-        "ts": _dt.datetime.utcnow().isoformat() + "Z",
+        "ts": _dt.datetime.utcfromtimestamp(now).isoformat() + "Z",
         "type": event_type,
         **fields
     }
+    entry = (now, rec)
     with _LOCK:
-        _BUFFER.append(rec)
-        if len(_BUFFER) > _MAX_IN_MEMORY:
-            _BUFFER.pop(0)
-    _write_line(rec)
+        _RING.append(entry)
+        ring = _TYPE_RINGS.get(event_type)
+        if ring is None:
+            ring = _TYPE_RINGS[event_type] = deque(maxlen=_MAX_PER_TYPE)
+        ring.append(entry)
+    if not _sink_enabled():
+        return
+    if _ASYNC and not _SINK_STOP:
+        _enqueue(rec)
+    else:
+        _write_line(rec)
 
 def log_error(exc: BaseException, context: Optional[Dict[str, Any]] = None):
     tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
@@ -173,9 +349,52 @@ def dump_state(state_obj: Any):
     except Exception as e:
         log_error(e, {"phase": "dump_state"})
 
-def get_recent(max_items=100):
+def _since_epoch(since) -> Optional[float]:
+    if since is None:
+        return None
+    if isinstance(since, _dt.datetime):
+        if since.tzinfo is None:
+            return since.timestamp()
+        return since.astimezone(_dt.timezone.utc).timestamp()
+    if isinstance(since, str):
+        # Mismo formato que "ts" (ISO UTC con sufijo Z)
+        txt = since[:-1] if since.endswith("Z") else since
+        return _dt.datetime.fromisoformat(txt).replace(tzinfo=_dt.timezone.utc).timestamp()
+    return float(since)
+
+def get_recent(max_items=100, type=None, since=None):
+    """Últimos eventos en memoria, del más viejo al más nuevo.
+
+    - type: un tipo o un iterable de tipos; usa los anillos por tipo, que
+      conservan eventos que el anillo general ya descartó.
+    - since: epoch (float), datetime o texto ISO como el campo "ts"; solo
+      eventos posteriores.
+    Recorre desde el más nuevo y corta al llegar a max_items o a since, así
+    que una consulta acotada no copia el anillo entero.
+    """
+    t_min = _since_epoch(since)
+    limit = max(0, int(max_items))
     with _LOCK:
-        return list(_BUFFER[-max_items:])
+        if type is None:
+            sources = [_RING]
+        elif isinstance(type, str):
+            sources = [_TYPE_RINGS.get(type, ())]
+        else:
+            sources = [_TYPE_RINGS.get(t, ()) for t in type]
+        picked = []
+        for src in sources:
+            n = 0
+            for entry in reversed(src):
+                if n >= limit or (t_min is not None and entry[0] <= t_min):
+                    break
+                picked.append(entry)
+                n += 1
+    if len(sources) > 1:
+        picked.sort(key=lambda e: e[0])
+        picked = picked[-limit:] if limit else []
+    else:
+        picked.reverse()
+    return [rec for _, rec in picked]
 
 
 def write_folder_log(target_folder: str, obj: Dict[str, Any]):
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Caché en disco de miniaturas para la galería.
+
+Cada miniatura se guarda como JPEG chico en ``THUMB_CACHE_DIR`` con nombre
+derivado de (ruta, tamaño y mtime del archivo, tamaño de miniatura): si la
+foto cambia, cambia la clave y la entrada vieja termina desalojada.
+
+ - Desalojo LRU por tamaño total (``THUMB_CACHE_MAX_MB``). El "último uso"
+   es el mtime del archivo de caché (se toca en cada acierto), así el orden
+   sobrevive entre sesiones sin otro índice en disco.
+ - Población anticipada: al confirmarse cada foto (oyente de commit de
+   ``infra.photo_writer``) se genera su miniatura en un hilo aparte, a partir
+   de la vista previa de la captura si vino, o decodificando el JPEG en modo
+   draft. Abrir la galería sobre fotos nuevas no decodifica nada.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from infra.photo_writer import add_commit_listener
+from infra.thumb_worker import make_thumb as _make_thumb
+
+DEFAULT_THUMB_SIZE = (240, 180)
+
+
+def make_thumb(path: str, size: Tuple[int, int] = DEFAULT_THUMB_SIZE) -> Image.Image:
+    """Miniatura recortada a ``size`` (ver ``infra.thumb_worker.make_thumb``)."""
+    return _make_thumb(path, size)
+
+
+class ThumbCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024, quality: int = 85):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.quality = int(quality)
+        self._lock = threading.Lock()
+        self._index = None      # nombre -> [bytes, último uso]; se carga al primer uso
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- Claves ----------
+    @staticmethod
+    def key_for(path: str, size: Tuple[int, int], st: Optional[os.stat_result] = None) -> Optional[str]:
+        try:
+            st = st or os.stat(path)
+        except Exception:
+            return None
+        raw = f"{os.path.normcase(os.path.abspath(path))}|{st.st_size}|{int(st.st_mtime)}|{size[0]}x{size[1]}"
+        return hashlib.sha1(raw.encode("utf-8", "surrogatepass")).hexdigest() + ".jpg"
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name[:2], name)
+
+    # ---------- Índice / LRU ----------
+    def _load_index(self):
+        if self._index is not None:
+            return
+        index, total = {}, 0
+        try:
+            for sub in os.listdir(self.cache_dir):
+                d = os.path.join(self.cache_dir, sub)
+                if not os.path.isdir(d):
+                    continue
+                for name in os.listdir(d):
+                    if not name.endswith(".jpg"):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(d, name))
+                    except Exception:
+                        continue
+                    index[name] = [st.st_size, st.st_mtime]
+                    total += st.st_size
+        except Exception:
+            pass
+        self._index, self._total = index, total
+
+    def _evict_locked(self):
+        if self._total <= self.max_bytes:
+            return
+        # Baja hasta el 90% para no desalojar en cada alta
+        target = int(self.max_bytes * 0.9)
+        for name, (nbytes, _used) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= target:
+                break
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+            except Exception:
+                continue
+            self._total -= nbytes
+            del self._index[name]
+
+    # ---------- API ----------
+    def get(self, path: str, size: Tuple[int, int] = DEFAULT_THUMB_SIZE) -> Optional[Image.Image]:
+        """Miniatura cacheada o None (no genera)."""
+        name = self.key_for(path, size)
+        if name is None:
+            return None
+        with self._lock:
+            self._load_index()
+            entry = self._index.get(name)
+        if entry is None:
+            self.misses += 1
+            return None
+        f = self._file(name)
+        try:
+            im = Image.open(f)
+            im.load()
+        except Exception:
+            with self._lock:
+                if self._index.pop(name, None) is not None:
+                    self._total -= entry[0]
+            self.misses += 1
+            return None
+        now = time.time()
+        entry[1] = now
+        try:
+            os.utime(f, (now, now))
+        except Exception:
+            pass
+        self.hits += 1
+        return im
+
+    def put(self, path: str, thumb: Image.Image, size: Tuple[int, int] = DEFAULT_THUMB_SIZE):
+        name = self.key_for(path, size)
+        if name is None:
+            return
+        f = self._file(name)
+        tmp = f + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(f), exist_ok=True)
+            thumb.convert("RGB").save(tmp, "JPEG", quality=self.quality)
+            os.replace(tmp, f)
+            nbytes = os.path.getsize(f)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            return
+        with self._lock:
+            self._load_index()
+            old = self._index.get(name)
+            if old is not None:
+                self._total -= old[0]
+            self._index[name] = [nbytes, time.time()]
+            self._total += nbytes
+            self._evict_locked()
+
+    def get_or_create(self, path: str, size: Tuple[int, int] = DEFAULT_THUMB_SIZE) -> Image.Image:
+        im = self.get(path, size)
+        if im is None:
+            im = make_thumb(path, size)
+            self.put(path, im, size)
+        return im
+
+    def populate(self, path: str, preview=None, size: Tuple[int, int] = DEFAULT_THUMB_SIZE):
+        """Genera la miniatura de una foto recién escrita (desde su vista previa RGB si hay)."""
+        if preview is not None and min(preview.shape[0], preview.shape[1]) >= min(size):
+            thumb = ImageOps.fit(Image.fromarray(preview), size, Image.LANCZOS)
+        else:
+            thumb = make_thumb(path, size)
+        self.put(path, thumb, size)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._load_index()
+            return self._total
+
+
+_CACHE: Optional[ThumbCache] = None
+_CACHE_LOCK = threading.Lock()
+_EAGER = None
+
+
+def thumb_size() -> Tuple[int, int]:
+    try:
+        from config import settings as _cfg
+        return tuple(getattr(_cfg, "THUMB_SIZE", DEFAULT_THUMB_SIZE))
+    except Exception:
+        return DEFAULT_THUMB_SIZE
+
+
+def get_thumb_cache() -> ThumbCache:
+    """Caché compartida del proceso; la primera llamada la suscribe a los commits de fotos."""
+    global _CACHE, _EAGER
+    if _CACHE is not None:
+        return _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                from config import settings as _cfg
+                cache_dir = getattr(_cfg, "THUMB_CACHE_DIR", None) or os.path.join(_cfg.APPDATA_DIR, "thumbs")
+                max_mb = getattr(_cfg, "THUMB_CACHE_MAX_MB", 256)
+            except Exception:
+                cache_dir = os.path.join(os.path.expanduser("~"), "KatcamPro", "thumbs")
+                max_mb = 256
+            cache = ThumbCache(cache_dir, max_bytes=int(max_mb) * 1024 * 1024)
+            # Un hilo basta: una miniatura por foto, fuera del hilo escritor
+            _EAGER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumb_eager")
+            size = thumb_size()
+
+            def _job(path, preview):
+                try:
+                    cache.populate(path, preview, size)
+                except Exception:
+                    pass
+
+            def _on_commit(path, info):
+                try:
+                    _EAGER.submit(_job, path, info.get("preview"))
+                except Exception:
+                    pass
+            add_commit_listener(_on_commit)
+            _CACHE = cache
+    return _CACHE
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Generación paralela de miniaturas con prioridad por visibilidad.
+
+``ThumbLoader`` reparte el trabajo de miniaturas entre un pool de procesos
+(decodificar y redimensionar con PIL no suelta el GIL; con hilos un PC de
+4 núcleos usaría uno solo). Si el pool de procesos no puede arrancar se usa
+uno de hilos. Los procesos se crean con "spawn" (igual en todas las
+plataformas) y solo ejecutan ``infra.thumb_worker``, que no importa la
+cámara ni la UI.
+
+La UI llama ``want(paths)`` con las rutas que necesita **en orden de
+prioridad** (primero las filas visibles); cada llamada reemplaza a la
+anterior:
+ - lo pendiente que ya no está en la lista se descarta;
+ - lo enviado al pool que ya no se quiere se cancela si todavía no empezó,
+   y si ya empezó su resultado se guarda en la caché pero no se entrega.
+
+Un hilo despachador mantiene en el pool solo ``max_inflight`` trabajos a la
+vez, así un cambio de prioridad (scroll) se aplica enseguida en lugar de
+esperar a que se vacíe una cola larga. Los aciertos de caché se resuelven en
+el despachador sin usar el pool. Los resultados se leen sin bloquear con
+``results()`` desde el hilo de Tk.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from infra.thumb_cache import ThumbCache
+from infra.thumb_worker import init_worker, thumb_job
+
+
+def default_workers() -> int:
+    try:
+        from config import settings as _cfg
+        n = getattr(_cfg, "THUMB_WORKERS", None)
+        if n:
+            return max(1, int(n))
+    except Exception:
+        pass
+    # Dejar un núcleo para Tk y la cámara
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class ThumbLoader:
+    def __init__(self, cache: ThumbCache, size: Tuple[int, int], workers: Optional[int] = None,
+                 use_processes: bool = True, max_inflight: Optional[int] = None):
+        self.cache = cache
+        self.size = tuple(size)
+        self.workers = workers or default_workers()
+        self.max_inflight = max_inflight or self.workers * 2
+        self._pool = None
+        if use_processes:
+            try:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=init_worker)
+            except Exception:
+                self._pool = None
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumb")
+        self._cond = threading.Condition()
+        self._pending = deque()         # por despachar, en orden de prioridad
+        self._wanted = set()
+        self._inflight = {}             # ruta -> future
+        self._current = None            # ruta que el despachador está resolviendo
+        self._out = queue.Queue()
+        self._closed = False
+        self.cancelled = 0
+        self._thread = threading.Thread(target=self._dispatch_loop, name="thumb_dispatch", daemon=True)
+        self._thread.start()
+
+    # ---------- API ----------
+    def want(self, paths: Iterable[str]):
+        """Reemplaza la lista de rutas pedidas (en orden de prioridad)."""
+        paths = list(dict.fromkeys(paths))
+        with self._cond:
+            self._wanted = set(paths)
+            self._pending = deque(p for p in paths if p not in self._inflight)
+            for p, fut in list(self._inflight.items()):
+                # cancel() corre el callback ya mismo (mismo hilo, el lock es reentrante)
+                if p not in self._wanted and fut.cancel():
+                    self._inflight.pop(p, None)
+                    self.cancelled += 1
+            self._cond.notify_all()
+
+    def results(self, max_items: int = 32) -> List[Tuple[str, Image.Image]]:
+        """Miniaturas listas (ruta, imagen PIL), sin bloquear."""
+        out = []
+        while len(out) < max_items:
+            try:
+                out.append(self._out.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    @property
+    def busy(self) -> bool:
+        with self._cond:
+            return bool(self._pending or self._inflight or self._current) or not self._out.empty()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = deque()
+            self._wanted = set()
+            self._cond.notify_all()
+        try:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        except TypeError:
+            self._pool.shutdown(wait=False)
+        except Exception:
+            pass
+
+    # ---------- Internos ----------
+    def _deliver(self, path, im):
+        with self._cond:
+            keep = path in self._wanted
+            if keep:
+                self._wanted.discard(path)
+        if keep:
+            self._out.put((path, im))
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._pending or len(self._inflight) >= self.max_inflight):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path = self._pending.popleft()
+                self._current = path
+            try:
+                self._dispatch_one(path)
+            finally:
+                with self._cond:
+                    self._current = None
+
+    def _dispatch_one(self, path):
+        try:
+            im = self.cache.get(path, self.size)
+        except Exception:
+            im = None
+        if im is not None:
+            self._deliver(path, im)
+            return
+        with self._cond:
+            if self._closed or path not in self._wanted or path in self._inflight:
+                return
+            try:
+                fut = self._pool.submit(thumb_job, path, self.size)
+            except Exception:
+                self._wanted.discard(path)
+                return
+            self._inflight[path] = fut
+        fut.add_done_callback(lambda f, p=path: self._on_done(p, f))
+
+    def _on_done(self, path, fut):
+        im = None
+        if not fut.cancelled():
+            try:
+                size, data = fut.result()
+                im = Image.frombytes("RGB", size, data)
+            except Exception:
+                im = None
+        if im is not None:
+            try:
+                self.cache.put(path, im, self.size)
+            except Exception:
+                pass
+        with self._cond:
+            if self._inflight.get(path) is fut:
+                del self._inflight[path]
+            if im is None:
+                # Archivo ilegible: no queda pendiente para siempre
+                self._wanted.discard(path)
+            self._cond.notify_all()
+        if im is not None:
+            self._deliver(path, im)
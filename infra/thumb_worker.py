@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Código que corre en los procesos del pool de miniaturas (``infra.thumb_pool``).
+
+Este módulo solo depende de PIL: es lo único que un proceso worker importa
+para generar miniaturas. No debe importar la cámara (``video_capture``), la
+UI ni nada que arranque hilos o abra archivos al importarse.
+"""
+import os
+import sys
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+
+def make_thumb(path: str, size: Tuple[int, int]) -> Image.Image:
+    """Miniatura recortada a ``size``: orientación EXIF, decodificación draft y LANCZOS."""
+    im = Image.open(path)
+    try:
+        im = ImageOps.exif_transpose(im)
+    except Exception:
+        pass
+    im.draft("RGB", (size[0] * 2, size[1] * 2))
+    im = im.convert("RGB")
+    return ImageOps.fit(im, size, Image.LANCZOS)
+
+
+def init_worker():
+    """Inicializador del proceso: prioridad baja, para no quitarle CPU a la cámara ni a Tk."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            k32 = ctypes.windll.kernel32
+            k32.SetPriorityClass(k32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(5)
+    except Exception:
+        pass
+
+
+def thumb_job(path: str, size: Tuple[int, int]):
+    """Devuelve la miniatura como (tamaño, bytes RGB): barato de serializar entre procesos."""
+    im = make_thumb(path, size)
+    return im.size, im.tobytes()
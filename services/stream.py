@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from typing import Optional, Tuple, Callable
 from config.settings import RESOLUTIONS
+import cv2
 from PIL import Image
 
 try:
@@ -39,10 +40,14 @@ def stop_stream():
 def get_frame_image():
     if not camera_manager:
         return None
-    frame_rgb = camera_manager.get_frame_rgb()
-    if frame_rgb is None:
+    # Vista sin copia del anillo: la conversión a RGB es la única copia, y es de la imagen
+    view = camera_manager.acquire_frame()
+    if view is None:
         return None
-    return Image.fromarray(frame_rgb)
+    try:
+        return Image.fromarray(view.convert(cv2.COLOR_BGR2RGB))
+    finally:
+        view.release()
 
 def shutdown():
     if camera_manager:
@@ -1,7 +1,491 @@
-
 # -*- coding: utf-8 -*-
-import os, shutil, time
-from typing import Callable
+"""Sincronización incremental de fotos al Drive.
+
+``SyncEngine`` no recalcula listados completos en cada pasada:
+ - las fotos nuevas llegan por el oyente de commit de ``infra.photo_writer``
+   (ya con su nombre final: el escritor renombra al terminar);
+ - la primera pasada de cada (origen, destino) en el proceso compara el
+   catálogo de fotos contra el manifiesto (``infra.sync_manifest``) para
+   retomar lo que quedó pendiente, sin listar el destino;
+ - lo subido se registra en el manifiesto con tamaño, mtime y hash; una foto
+   con el mismo contenido que otra ya subida (renombrada, re-exportada) se
+   registra como duplicado y no se copia (si la otra sigue en disco son dos
+   fotos y se copian las dos).
+
+Solo si el manifiesto no tiene nada de ese destino (primer uso tras
+actualizar) se lista el Drive una vez (raíz y carpetas de día) para adoptar
+lo que ya estaba copiado.
+
+Cuando una foto se migra a su carpeta de día (``notify_moved``) su copia del
+Drive se mueve igual; si el Drive no está montado queda pendiente en el
+manifiesto y ``relocate`` la mueve en la próxima pasada.
+
+``SyncWorker`` corre las pasadas en un hilo propio (copiar decenas de JPEG
+de 5-20 MB en el hilo de Tk congelaba la UI y atrasaba los ticks de
+timelapse), con tope de bytes/s, pausa mientras hay una captura en curso y
+progreso informado por una cola que la UI lee sin bloquear.
+
+Cada pasada copia varios archivos a la vez (``SYNC_WORKERS``), por bloques a
+``NOMBRE.partial``: si el Drive se desmonta a mitad de archivo, el reintento
+continúa desde lo ya copiado. Solo se renombra al nombre final después de
+verificar tamaño y hash.
+"""
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from infra.photo_catalog import catalog_names_or_listdir, folder_key, get_catalog, is_photo_name
+from infra.photo_layout import iter_shards, relpath_in_root, root_of
+from infra.photo_writer import add_commit_listener
+from infra.sync_manifest import SyncManifest, get_sync_manifest
+
+COPY_CHUNK = 1024 * 1024
+
+
+def _log_event(event, **fields):
+    try:
+        from infra.telemetry import log_event
+        log_event(event, **fields)
+    except Exception:
+        pass
+
+
+class RateLimiter:
+    """Token bucket de bytes/s compartido entre hilos (0 o None = sin límite); ráfaga de un segundo."""
+
+    def __init__(self, bytes_per_s: Optional[float] = None):
+        self.rate = float(bytes_per_s or 0)
+        self._tokens = self.rate
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._t) * self.rate)
+            self._t = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def partial_path_for(dst: str) -> str:
+    return dst + ".partial"
+
+
+def _sha1_file(path: str, chunk: int = COPY_CHUNK) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(chunk)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
+
+
+class VerifyError(IOError):
+    pass
+
+
+def copy_resumable(src: str, dst: str, chunk: int = COPY_CHUNK,
+                   on_chunk: Optional[Callable[[int], None]] = None, verify_hash: bool = True) -> str:
+    """Copia ``src`` a ``dst`` por bloques vía ``dst.partial`` y devuelve el sha1 del origen.
+
+    Si quedó un ``.partial`` de un intento anterior (Drive desmontado a mitad
+    de archivo) se continúa desde su tamaño. Antes de renombrar se verifica el
+    tamaño y, con ``verify_hash``, el sha1 releído de la copia; si no
+    coincide se borra el ``.partial`` y se lanza ``VerifyError``.
+    ``on_chunk(n)`` se llama antes de escribir cada bloque (throttling / pausa).
+    """
+    part = partial_path_for(dst)
+    size = os.path.getsize(src)
+    try:
+        offset = os.path.getsize(part)
+    except OSError:
+        offset = 0
+    if offset > size:
+        offset = 0
+    h = hashlib.sha1()
+    with open(src, "rb") as fi, open(part, "r+b" if offset else "wb") as fo:
+        # El prefijo ya copiado se hashea desde el origen (local, rápido)
+        done = 0
+        while done < offset:
+            buf = fi.read(min(chunk, offset - done))
+            if not buf:
+                break
+            h.update(buf)
+            done += len(buf)
+        fo.seek(offset)
+        fo.truncate()
+        while True:
+            buf = fi.read(chunk)
+            if not buf:
+                break
+            if on_chunk is not None:
+                on_chunk(len(buf))
+            h.update(buf)
+            fo.write(buf)
+    sha1 = h.hexdigest()
+    if os.path.getsize(part) != size or (verify_hash and _sha1_file(part, chunk) != sha1):
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        raise VerifyError(f"copia inválida de {os.path.basename(src)}")
+    shutil.copystat(src, part)
+    os.replace(part, dst)
+    return sha1
+
+
+class SyncEngine:
+    def __init__(self, manifest: Optional[SyncManifest] = None, workers: int = 1,
+                 verify_hash: bool = True):
+        self.manifest = manifest or get_sync_manifest()
+        self.workers = max(1, int(workers))
+        self.verify_hash = bool(verify_hash)
+        self._lock = threading.Lock()
+        self._queue = OrderedDict()     # ruta de origen -> None, en orden de llegada
+        self._caught_up = set()         # (origen, destino) ya comparados en este proceso
+        self._active = set()            # raíces con pasadas en curso: solo sus commits se encolan
+        self._hash_locks = {}           # sha1 -> Lock, para no subir dos veces el mismo contenido
+
+    def notify_committed(self, path: str, info=None):
+        """Oyente de commit: encola la foto (se copia en la próxima pasada).
+
+        Las fotos rechazadas por calidad al capturar no se suben (queda
+        registrado en la telemetría). Si todavía no hubo pasadas para su
+        carpeta (sin Drive configurado) no se encola: la primera pasada la
+        levanta del catálogo (``_catch_up``).
+        """
+        reject = ((info or {}).get("quality") or {}).get("reject")
+        if reject:
+            _log_event("sync_skip_rejected", path=path, reasons=list(reject))
+            return
+        path = os.path.abspath(path)
+        key = folder_key(root_of(os.path.dirname(path)))
+        with self._lock:
+            if key in self._active:
+                self._queue[path] = None
+
+    # ---------- Internos ----------
+    def _adopt_existing(self, drive_dir: str):
+        """Primer uso de un destino: registra lo que ya estaba copiado (un solo listado).
+
+        Recorre la raíz (organización plana) y las carpetas YYYY/MM/DD.
+        """
+        rows = []
+        folders = [("", drive_dir)]
+        folders += [(day.strftime("%Y/%m/%d/"), path) for day, path in iter_shards(drive_dir)]
+        for prefix, folder in folders:
+            try:
+                names = os.listdir(folder)
+            except Exception:
+                continue
+            for name in names:
+                if not is_photo_name(name):
+                    continue
+                try:
+                    st = os.stat(os.path.join(folder, name))
+                except Exception:
+                    continue
+                rows.append((prefix + name, st.st_size, st.st_mtime, None))
+        if rows:
+            self.manifest.mark_many(drive_dir, rows)
+
+    def _catch_up(self, photo_dir: str, drive_dir: str):
+        pair = (folder_key(photo_dir), folder_key(drive_dir))
+        if pair in self._caught_up:
+            return
+        with self._lock:
+            # Antes de leer el catálogo: lo que se guarde desde ahora llega por notify_committed
+            self._active.add(pair[0])
+        if self.manifest.count(drive_dir) == 0:
+            self._adopt_existing(drive_dir)
+        done = self.manifest.names(drive_dir)
+        pending = [n for n in catalog_names_or_listdir(photo_dir) if n not in done]
+        try:
+            rejected = get_catalog().rejected(photo_dir)
+        except Exception:
+            rejected = []
+        if rejected:
+            _log_event("sync_skip_rejected", folder=photo_dir, count=len(rejected),
+                       sample=[rel for rel, _ in rejected[:20]])
+        with self._lock:
+            for rel in pending:
+                self._queue[os.path.abspath(os.path.join(photo_dir, *rel.split("/")))] = None
+        self._caught_up.add(pair)
+
+    def _take(self, photo_dir: str):
+        key = folder_key(photo_dir)
+        with self._lock:
+            # Fotos planas o en subcarpetas de día de esa raíz
+            paths = [p for p in self._queue if folder_key(root_of(os.path.dirname(p))) == key]
+            for p in paths:
+                del self._queue[p]
+            if self._queue or len(self._active) > 1:
+                # Cambió la carpeta de fotos: lo de la anterior se descarta y, si se
+                # vuelve a elegir, se retoma desde el catálogo (_catch_up)
+                self._queue.clear()
+                self._active = {key}
+                self._caught_up = {pair for pair in self._caught_up if pair[0] == key}
+        return paths
+
+    def notify_moved(self, old: str, new: str):
+        """Una foto cambió de ruta (migración a carpetas por día).
+
+        Si estaba encolada se encola con la ruta nueva, y lo que ya se había
+        subido queda registrado con la ruta relativa nueva (no se copia otra
+        vez) y se mueve a la misma ruta en cada Drive donde esté.
+        """
+        old, new = os.path.abspath(old), os.path.abspath(new)
+        with self._lock:
+            if old in self._queue:
+                del self._queue[old]
+                self._queue[new] = None
+        rel = relpath_in_root(new)
+        if self.manifest.rename(relpath_in_root(old), rel):
+            self.relocate(name=rel)
+
+    def relocate(self, drive_dir: Optional[str] = None, name: Optional[str] = None) -> int:
+        """Mueve en el Drive las copias que quedaron en la ruta vieja tras una migración.
+
+        Si la copia no está en ninguna de las dos rutas se reintenta más tarde
+        (Drive desmontado); si el Drive está pero la copia no, se olvida el
+        registro para volver a subirla. Devuelve cuántas se movieron.
+        """
+        moved = 0
+        for dest, rel, at in self.manifest.misplaced(drive_dir, name):
+            src = os.path.join(dest, *at.split("/"))
+            dst = os.path.join(dest, *rel.split("/"))
+            try:
+                if not os.path.exists(dst):
+                    if not os.path.exists(src):
+                        if os.path.isdir(dest):
+                            self.manifest.forget(dest, rel)
+                        continue
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    os.replace(src, dst)
+                    moved += 1
+                self.manifest.placed(dest, rel)
+            except Exception as e:
+                _log_event("sync_relocate_failed", dest=dest, name=rel, error=str(e))
+        return moved
+
+    def _hash_lock(self, sha1: str) -> threading.Lock:
+        with self._lock:
+            lk = self._hash_locks.get(sha1)
+            if lk is None:
+                if len(self._hash_locks) > 1024:
+                    self._hash_locks.clear()
+                lk = self._hash_locks[sha1] = threading.Lock()
+            return lk
+
+    def _requeue(self, paths):
+        with self._lock:
+            for p in paths:
+                self._queue[p] = None
+
+    def sync_file(self, src: str, drive_dir: str,
+                  on_chunk: Optional[Callable[[int], None]] = None) -> str:
+        """Sube una foto si hace falta. Devuelve "copied", "skipped" o "duplicate".
+
+        "duplicate": el mismo contenido ya está en el destino con otro nombre
+        y ese origen ya no existe (se renombró o re-exportó); se registra en
+        el manifiesto sin copiarlo. Si el otro origen sigue en disco son dos
+        fotos distintas con los mismos bytes (dos capturas rápidas del mismo
+        frame, cuadros de timelapse) y se copia igual.
+        """
+        # En el destino se replica la organización del origen (plana o YYYY/MM/DD)
+        name = relpath_in_root(src)
+        st = os.stat(src)
+        if self.manifest.is_uploaded(drive_dir, name, st.st_size, st.st_mtime):
+            return "skipped"
+        # Leer el origen local es barato frente a subir la foto otra vez
+        sha1 = _sha1_file(src)
+        # Mismo contenido en la misma pasada: la segunda espera a que se registre la primera
+        with self._hash_lock(sha1):
+            root = root_of(os.path.dirname(os.path.abspath(src)))
+            for dup in self.manifest.find_by_hash(drive_dir, sha1, st.st_size):
+                if dup != name and not os.path.exists(os.path.join(root, *dup.split("/"))):
+                    self.manifest.mark_uploaded(drive_dir, name, st.st_size, st.st_mtime, sha1, dup_of=dup)
+                    _log_event("sync_duplicate", path=src, dup_of=dup, bytes=st.st_size)
+                    return "duplicate"
+            dst = os.path.join(drive_dir, *name.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            sha1 = copy_resumable(src, dst, on_chunk=on_chunk, verify_hash=self.verify_hash)
+            self.manifest.mark_uploaded(drive_dir, name, st.st_size, st.st_mtime, sha1)
+        return "copied"
+
+    # ---------- API ----------
+    def run_once(self, photo_dir: str, drive_dir: str,
+                 on_error: Optional[Callable[[str, Exception], None]] = None,
+                 on_progress: Optional[Callable[[int, int, str], None]] = None,
+                 on_chunk: Optional[Callable[[int], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None) -> dict:
+        """Una pasada: copia lo encolado para ``photo_dir`` con ``workers`` copias a la vez.
+
+        ``on_progress(hechas, total, nombre)`` se llama al terminar cada archivo
+        (desde los hilos de copia); si ``should_stop()`` da True lo que no
+        empezó queda encolado. Devuelve contadores.
+        """
+        self.relocate(drive_dir)
+        self._catch_up(photo_dir, drive_dir)
+        todo = self._take(photo_dir)
+        res = {"copied": 0, "skipped": 0, "duplicate": 0, "failed": 0, "done": 0}
+        failed = []
+        lock = threading.Lock()
+
+        def _one(src):
+            if should_stop is not None and should_stop():
+                with lock:
+                    failed.append(src)
+                return
+            outcome = "skipped"     # borrada antes de subirla
+            try:
+                if os.path.exists(src):
+                    outcome = self.sync_file(src, drive_dir, on_chunk=on_chunk)
+            except Exception as e:
+                outcome = "failed"
+                if on_error is not None:
+                    on_error(os.path.basename(src), e)
+            with lock:
+                if outcome == "failed":
+                    failed.append(src)
+                else:
+                    res[outcome] += 1
+                res["done"] += 1
+                done = res["done"]
+            if on_progress is not None:
+                on_progress(done, len(todo), os.path.basename(src))
+
+        if todo:
+            if self.workers == 1 or len(todo) == 1:
+                for src in todo:
+                    _one(src)
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(todo)),
+                                        thread_name_prefix="sync_copy") as ex:
+                    list(ex.map(_one, todo))
+        # Reintentar en la próxima pasada (Drive desmontado, archivo bloqueado, ...);
+        # el .partial que haya quedado se continúa
+        self._requeue(failed)
+        return {"copied": res["copied"], "skipped": res["skipped"], "duplicates": res["duplicate"],
+                "failed": len(failed)}
+
+
+class SyncWorker:
+    """Hilo de sincronización periódica.
+
+    ``get_dirs()`` devuelve (carpeta de fotos, carpeta del Drive) vigentes en
+    cada pasada; ``is_paused()`` True detiene la copia entre bloques (captura
+    en curso). Los eventos se leen con ``events()`` desde el hilo de Tk:
+     - ("progress", (hechas, total, nombre))
+     - ("error", (nombre, mensaje))
+     - ("done", contadores)
+     - ("skipped", motivo)   carpeta inválida / Drive no encontrado
+    """
+
+    def __init__(self, get_dirs: Callable[[], tuple], is_paused: Optional[Callable[[], bool]] = None,
+                 interval_s: float = 60.0, max_bytes_per_s: Optional[float] = None,
+                 engine: Optional[SyncEngine] = None):
+        self.get_dirs = get_dirs
+        self.is_paused = is_paused or (lambda: False)
+        self.interval_s = float(interval_s)
+        self.limiter = RateLimiter(max_bytes_per_s)
+        self.engine = engine or get_sync_engine()
+        self._events = queue.Queue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="sync_worker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Adelanta la próxima pasada."""
+        self._wake.set()
+
+    def events(self, max_items: int = 50):
+        out = []
+        while len(out) < max_items:
+            try:
+                out.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def _on_chunk(self, n: int):
+        # Pausa entre bloques: una captura no compite por disco/USB con la copia
+        while self.is_paused() and not self._stop.is_set():
+            time.sleep(0.2)
+        self.limiter.consume(n)
+
+    def _run_pass(self):
+        photo_dir, drive_dir = self.get_dirs()
+        if not (photo_dir and os.path.exists(photo_dir)):
+            self._events.put(("skipped", "Carpeta de fotos inválida."))
+            return
+        if not (drive_dir and os.path.exists(drive_dir)):
+            self._events.put(("skipped", "No se encontró Google Drive para sincronizar."))
+            return
+        stats = self.engine.run_once(
+            photo_dir, drive_dir,
+            on_error=lambda f, e: self._events.put(("error", (f, str(e)))),
+            on_progress=lambda i, n, f: self._events.put(("progress", (i, n, f))),
+            on_chunk=self._on_chunk,
+            should_stop=self._stop.is_set)
+        self._events.put(("done", stats))
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self._run_pass()
+            except Exception as e:
+                self._events.put(("error", ("", str(e))))
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+
+_ENGINE: Optional[SyncEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_sync_engine() -> SyncEngine:
+    """Motor compartido del proceso; la primera llamada lo suscribe a los commits de fotos."""
+    global _ENGINE
+    if _ENGINE is not None:
+        return _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            try:
+                from config import settings as _cfg
+                workers = int(getattr(_cfg, "SYNC_WORKERS", 3))
+                verify = bool(getattr(_cfg, "SYNC_VERIFY_HASH", True))
+            except Exception:
+                workers, verify = 3, True
+            eng = SyncEngine(workers=workers, verify_hash=verify)
+            add_commit_listener(eng.notify_committed)
+            _ENGINE = eng
+    return _ENGINE
+
 
 def sync_photos(photo_dir: str, drive_dir: str, on_status: Callable[[str], None]):
     if not drive_dir or not os.path.exists(drive_dir):
@@ -10,23 +494,10 @@ def sync_photos(photo_dir: str, drive_dir: str, on_status: Callable[[str], None]
     if not photo_dir or not os.path.exists(photo_dir):
         on_status("Carpeta de fotos inválida.")
         return
-    fotos_pendrive = sorted([f for f in os.listdir(photo_dir) if f.lower().endswith((".jpg",".jpeg",".png"))])
-    fotos_drive = set(os.listdir(drive_dir))
-    nuevas = [f for f in fotos_pendrive if f not in fotos_drive]
-    copied = 0
-    now = time.time()
-    for f in nuevas:
-        src = os.path.join(photo_dir, f)
-        try:
-            # margen de 2s para evitar copiar en mitad de escritura
-            if now - os.path.getmtime(src) < 2.0:
-                continue
-            shutil.copy2(src, os.path.join(drive_dir, f))
-            copied += 1
-        except Exception as e:
-            on_status(f"Error copiando {f}: {e}")
-    if copied:
-        on_status(f"Sincronizadas {copied} fotos al Drive.")
+    stats = get_sync_engine().run_once(
+        photo_dir, drive_dir, on_error=lambda f, e: on_status(f"Error copiando {f}: {e}"))
+    if stats["copied"]:
+        on_status(f"Sincronizadas {stats['copied']} fotos al Drive.")
     else:
         on_status("No hay fotos nuevas para sincronizar.")
 
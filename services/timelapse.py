@@ -1,7 +1,51 @@
 
 # -*- coding: utf-8 -*-
-from datetime import datetime, timedelta
-from typing import Callable, List, Optional
+"""Timelapse: disparo periódico (``TimelapseController``) y exportación a video.
+
+``export_timelapse`` arma el video en streaming: las fotos se recorren en
+orden de captura (catálogo), se decodifican y redimensionan en paralelo y se
+escriben con ``cv2.VideoWriter``. Como mucho ``prefetch`` frames decodificados
+están en memoria a la vez, sin importar la duración del proyecto. Los
+filtros de días/horario son los mismos que usa el controlador para disparar.
+
+``SegmentedTimelapse`` mantiene un segmento de video por día: cada día
+cerrado se codifica una sola vez y el video completo se arma concatenando
+segmentos a nivel contenedor (ffmpeg ``-c copy``). Un manifiesto guarda la
+firma de las fotos de cada día y los parámetros de codificación, así se
+sabe qué segmentos quedaron viejos cuando se agregan o borran fotos.
+
+Deflicker: el brillo medio de cada foto se guarda en el catálogo al
+capturar. Antes de codificar se calcula de una vez, vectorizado, una curva
+objetivo (media móvil en escala logarítmica) y la ganancia de cada frame;
+la ganancia se aplica con una LUT de 256 entradas en los mismos hilos que
+decodifican, así que cuesta poco más que codificar sin deflicker.
+"""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DIAS_SEMANA = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+
+def in_window(dt: datetime, days_selected: Optional[List[str]] = None,
+              hour_start: Optional[str] = None, hour_end: Optional[str] = None) -> bool:
+    """True si ``dt`` cae en los días ("lunes", ...) y el horario "HH:MM" configurados."""
+    if days_selected and DIAS_SEMANA[dt.weekday()] not in days_selected:
+        return False
+    if hour_start and hour_end:
+        if not (hour_start <= dt.strftime("%H:%M") <= hour_end):
+            return False
+    return True
 
 class TimelapseController:
     def __init__(self, root_after, label_update: Callable[[str], None]):
@@ -77,21 +121,13 @@ class TimelapseController:
             return
         now = datetime.now()
         # filtro días
-        dia_actual = now.strftime("%A").lower()
-        dias_es = {
-            "monday": "lunes", "tuesday": "martes", "wednesday": "miércoles",
-            "thursday": "jueves", "friday": "viernes", "saturday": "sábado", "sunday": "domingo"
-        }
-        dia_actual_es = dias_es.get(dia_actual, dia_actual)
-        if self.days_selected and dia_actual_es not in self.days_selected:
+        if not in_window(now, self.days_selected):
             self._label("Esperando día válido para timelapse...")
             return
         # filtro horario
-        if self.hour_start and self.hour_end:
-            hora_actual = now.strftime("%H:%M")
-            if not (self.hour_start <= hora_actual <= self.hour_end):
-                self._label("Fuera de horario. Esperando para timelapse...")
-                return
+        if not in_window(now, None, self.hour_start, self.hour_end):
+            self._label("Fuera de horario. Esperando para timelapse...")
+            return
         # disparo
         self._label("Capturando foto para timelapse...")
         if self.on_capture is not None:
@@ -103,3 +139,447 @@ class TimelapseController:
 
     # callback para que el host ejecute la captura real
     on_capture: Callable[[], None] = None
+
+
+# =========================
+# Exportación a video
+# =========================
+def _export_setting(name, default):
+    try:
+        from config import settings as _cfg
+        v = getattr(_cfg, name, default)
+        return default if v is None else v
+    except Exception:
+        return default
+
+
+def select_frames(photo_dir: str, since: Optional[float] = None, until: Optional[float] = None,
+                  days_selected: Optional[List[str]] = None, hour_start: Optional[str] = None,
+                  hour_end: Optional[str] = None) -> List[str]:
+    """Fotos de ``photo_dir`` en orden de captura, filtradas por rango y ventana día/horario.
+
+    Las fotos rechazadas por calidad al capturar no entran.
+    """
+    from infra.photo_catalog import get_catalog
+    cat = get_catalog()
+    cat.ensure_folder(photo_dir, since, until)
+    return [p for p, ts in cat.entries(photo_dir, since, until, usable_only=True)
+            if in_window(datetime.fromtimestamp(ts), days_selected, hour_start, hour_end)]
+
+
+def fit_frame(img, size: Tuple[int, int]):
+    """Redimensiona ``img`` a ``size`` (w, h) manteniendo aspecto, con bandas negras."""
+    w, h = size
+    ih, iw = img.shape[:2]
+    if (iw, ih) == (w, h):
+        return img
+    scale = min(w / iw, h / ih)
+    nw, nh = max(1, int(round(iw * scale))), max(1, int(round(ih * scale)))
+    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    resized = cv2.resize(img, (nw, nh), interpolation=interp)
+    if (nw, nh) == (w, h):
+        return resized
+    out = np.zeros((h, w, 3), dtype=np.uint8)
+    x0, y0 = (w - nw) // 2, (h - nh) // 2
+    out[y0:y0 + nh, x0:x0 + nw] = resized
+    return out
+
+
+def _reduced_flag(path: str, size: Tuple[int, int]) -> int:
+    """Flag de imread que decodifica el JPEG ya reducido 1/2, 1/4 u 1/8 sin quedar por debajo de ``size``."""
+    try:
+        from PIL import Image
+        with Image.open(path) as im:
+            iw, ih = im.size
+    except Exception:
+        return cv2.IMREAD_COLOR
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if iw // factor >= size[0] and ih // factor >= size[1]:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+@lru_cache(maxsize=512)
+def _gain_lut(gain_q: int):
+    """LUT uint8 para una ganancia cuantizada en milésimas."""
+    return np.clip(np.arange(256, dtype=np.float32) * (gain_q / 1000.0) + 0.5, 0, 255).astype(np.uint8)
+
+
+def _decode(path: str, size: Tuple[int, int], flag: int, gain: Optional[float] = None):
+    img = cv2.imread(path, flag)
+    if img is None:
+        return None
+    img = fit_frame(img, size)
+    if gain is not None:
+        gq = int(round(gain * 1000))
+        if gq != 1000:
+            img = cv2.LUT(img, _gain_lut(gq))
+    return img
+
+
+def _workers(workers: Optional[int]) -> int:
+    return int(workers or _export_setting("TIMELAPSE_EXPORT_WORKERS", 0) or max(1, (os.cpu_count() or 2) - 1))
+
+
+def measure_luma(path: str) -> Optional[float]:
+    """Brillo medio 0-255 de una foto, decodificada a 1/8 en grises (para fotos sin dato guardado)."""
+    img = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    return None if img is None else float(img.mean())
+
+
+def frame_lumas(paths: List[str], workers: Optional[int] = None) -> np.ndarray:
+    """Brillo medio por foto (NaN si no se pudo leer), del catálogo o medido y guardado."""
+    from infra.photo_catalog import get_catalog
+    cat = get_catalog()
+    known = cat.lumas(paths)
+    missing = [p for p in paths if known.get(p) is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=_workers(workers), thread_name_prefix="tl_luma") as ex:
+            measured = dict(zip(missing, ex.map(measure_luma, missing)))
+        cat.set_lumas([(p, l) for p, l in measured.items() if l is not None])
+        known.update(measured)
+    return np.array([np.nan if known.get(p) is None else known[p] for p in paths], dtype=np.float64)
+
+
+def _window_sums(x: np.ndarray, window: int) -> np.ndarray:
+    """Suma de una ventana centrada de ``window`` elementos por posición (mismo largo que ``x``).
+
+    Con sumas acumuladas: secuencias más cortas que la ventana suman lo que hay.
+    """
+    n = len(x)
+    c = np.concatenate(([0.0], np.cumsum(x)))
+    start = np.arange(n) - window // 2
+    return c[np.clip(start + window, 0, n)] - c[np.clip(start, 0, n)]
+
+
+def deflicker_gains(lumas, window: Optional[int] = None, max_gain: Optional[float] = None) -> np.ndarray:
+    """Ganancia por frame que lleva su brillo a una media móvil centrada de ``window`` frames.
+
+    Todo vectorizado en una pasada: la media es geométrica (en log), los
+    frames sin dato no cuentan para la curva y quedan con ganancia 1.
+    """
+    window = max(1, int(window or _export_setting("TIMELAPSE_DEFLICKER_WINDOW", 15)))
+    max_gain = max(1.0, float(max_gain or _export_setting("TIMELAPSE_DEFLICKER_MAX_GAIN", 2.0)))
+    lum = np.asarray(lumas, dtype=np.float64)
+    valid = np.isfinite(lum) & (lum > 1.0)    # fotos negras: no tienen brillo que corregir
+    if not valid.any():
+        return np.ones(lum.shape)
+    log_l = np.where(valid, np.log(np.where(valid, lum, 1.0)), 0.0)
+    num = _window_sums(log_l, window)
+    den = _window_sums(valid.astype(np.float64), window)
+    target = np.divide(num, den, out=log_l.copy(), where=den > 0)
+    gains = np.exp(np.clip(target - log_l, -np.log(max_gain), np.log(max_gain)))
+    return np.where(valid, gains, 1.0)
+
+
+def iter_frames(paths: Iterable[str], size: Tuple[int, int], workers: Optional[int] = None,
+                prefetch: Optional[int] = None, should_stop: Optional[Callable[[], bool]] = None,
+                gains: Optional[Iterable[float]] = None):
+    """Genera (ruta, frame BGR de ``size``) en orden, decodificando en paralelo.
+
+    Hay como mucho ``prefetch`` decodificaciones en curso o listas; la
+    siguiente se encola recién cuando se consume una. Las fotos ilegibles
+    salen con frame None. ``gains`` (alineado con ``paths``) aplica una
+    ganancia de brillo por frame en los hilos de decodificación.
+    """
+    workers = _workers(workers)
+    prefetch = max(1, int(prefetch or _export_setting("TIMELAPSE_EXPORT_PREFETCH", 8)))
+    size = (int(size[0]), int(size[1]))
+    it = iter(paths)
+    git = iter(gains) if gains is not None else None
+    flag = None
+    window = deque()
+    # imread y resize sueltan el GIL: con hilos alcanza
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tl_decode") as ex:
+        def _fill():
+            nonlocal flag
+            while len(window) < prefetch:
+                p = next(it, None)
+                if p is None:
+                    return
+                if flag is None:
+                    # Las fotos de un proyecto comparten resolución: se decide con la primera
+                    flag = _reduced_flag(p, size)
+                g = float(next(git, 1.0)) if git is not None else None
+                window.append((p, ex.submit(_decode, p, size, flag, g)))
+
+        _fill()
+        while window:
+            if should_stop is not None and should_stop():
+                for _p, fut in window:
+                    fut.cancel()
+                return
+            p, fut = window.popleft()
+            try:
+                frame = fut.result()
+            except Exception:
+                frame = None
+            _fill()
+            yield p, frame
+
+
+def export_timelapse(paths: Iterable[str], out_path: str, fps: Optional[float] = None,
+                     size: Optional[Tuple[int, int]] = None, fourcc: Optional[str] = None,
+                     workers: Optional[int] = None, prefetch: Optional[int] = None,
+                     on_progress: Optional[Callable[[int, int], None]] = None,
+                     should_stop: Optional[Callable[[], bool]] = None,
+                     deflicker: Optional[bool] = None) -> dict:
+    """Escribe ``paths`` (en ese orden) como video en ``out_path``.
+
+    Con ``deflicker`` (por defecto ``TIMELAPSE_DEFLICKER``) se normaliza el
+    brillo entre frames con ``deflicker_gains`` sobre toda la secuencia.
+    Se escribe a ``out_path + ".tmp"`` y se renombra al terminar; si se
+    cancela con ``should_stop`` no queda un video a medias con el nombre final.
+    Devuelve {"frames", "skipped", "cancelled", "path"}.
+    """
+    fps = float(fps or _export_setting("TIMELAPSE_EXPORT_FPS", 24))
+    size = tuple(size or _export_setting("TIMELAPSE_EXPORT_SIZE", (1920, 1080)))
+    fourcc = str(fourcc or _export_setting("TIMELAPSE_EXPORT_FOURCC", "mp4v"))
+    if deflicker is None:
+        deflicker = bool(_export_setting("TIMELAPSE_DEFLICKER", False))
+    paths = list(paths)
+    total = len(paths)
+    gains = deflicker_gains(frame_lumas(paths, workers)) if (deflicker and paths) else None
+    d = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(d, exist_ok=True)
+    root, ext = os.path.splitext(out_path)
+    tmp = f"{root}.tmp{ext}"    # OpenCV elige el contenedor por la extensión
+    writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo abrir el video {out_path} ({fourcc})")
+    frames = skipped = done = 0
+    cancelled = False
+    try:
+        for _p, frame in iter_frames(paths, size, workers, prefetch, should_stop, gains):
+            done += 1
+            if frame is None:
+                skipped += 1
+            else:
+                writer.write(frame)
+                frames += 1
+            if on_progress is not None and (done % 25 == 0 or done == total):
+                on_progress(done, total)
+        cancelled = bool(should_stop is not None and should_stop()) and done < total
+    finally:
+        writer.release()
+    if cancelled or frames == 0:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return {"frames": frames, "skipped": skipped, "cancelled": cancelled, "path": None}
+    os.replace(tmp, out_path)
+    return {"frames": frames, "skipped": skipped, "cancelled": False, "path": out_path}
+
+
+# =========================
+# Video incremental por segmentos diarios
+# =========================
+def find_ffmpeg() -> Optional[str]:
+    return shutil.which(str(_export_setting("TIMELAPSE_FFMPEG", "ffmpeg")))
+
+
+def concat_segments(segments: List[str], out_path: str, fps: float, size: Tuple[int, int],
+                    fourcc: str, ffmpeg: Optional[str] = None) -> str:
+    """Une ``segments`` en ``out_path``. Devuelve el método usado ("copy" o "reencode").
+
+    Con ffmpeg se usa el demuxer concat con ``-c copy`` (sin recodificar).
+    Sin ffmpeg se leen los segmentos con OpenCV y se vuelven a escribir:
+    sigue siendo mucho más barato que decodificar y escalar los JPEG.
+    """
+    root, ext = os.path.splitext(out_path)
+    tmp = f"{root}.tmp{ext}"
+    ffmpeg = ffmpeg if ffmpeg is not None else find_ffmpeg()
+    if ffmpeg:
+        lst = f"{root}.concat.txt"
+        with open(lst, "w", encoding="utf-8") as f:
+            for seg in segments:
+                # Formato del demuxer concat: comillas simples escapadas
+                f.write("file '" + os.path.abspath(seg).replace("'", "'\\''") + "'\n")
+        try:
+            subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-f", "concat",
+                            "-safe", "0", "-i", lst, "-c", "copy", tmp],
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            os.replace(tmp, out_path)
+            return "copy"
+        except Exception:
+            pass    # ffmpeg roto o segmentos incompatibles: recodificar
+        finally:
+            try:
+                os.remove(lst)
+            except OSError:
+                pass
+    writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*fourcc), fps, tuple(size))
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo abrir el video {out_path} ({fourcc})")
+    try:
+        for seg in segments:
+            cap = cv2.VideoCapture(seg)
+            try:
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    writer.write(frame)
+            finally:
+                cap.release()
+    finally:
+        writer.release()
+    os.replace(tmp, out_path)
+    return "reencode"
+
+
+class SegmentedTimelapse:
+    """Video de un proyecto armado con un segmento por día.
+
+    ``work_dir`` guarda ``segments/YYYY-MM-DD<ext>`` y ``manifest.json``.
+    Un segmento está vigente si la firma (lista de fotos del día que pasan
+    el filtro) y los parámetros de codificación coinciden con el manifiesto.
+    El día de hoy no se guarda como segmento (sigue cambiando): ``build`` lo
+    codifica aparte cada vez.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, photo_dir: str, work_dir: str, fps: Optional[float] = None,
+                 size: Optional[Tuple[int, int]] = None, fourcc: Optional[str] = None,
+                 days_selected: Optional[List[str]] = None, hour_start: Optional[str] = None,
+                 hour_end: Optional[str] = None, ext: str = ".mp4", deflicker: Optional[bool] = None):
+        self.photo_dir = photo_dir
+        self.work_dir = work_dir
+        self.seg_dir = os.path.join(work_dir, "segments")
+        self.fps = float(fps or _export_setting("TIMELAPSE_EXPORT_FPS", 24))
+        self.size = tuple(size or _export_setting("TIMELAPSE_EXPORT_SIZE", (1920, 1080)))
+        self.fourcc = str(fourcc or _export_setting("TIMELAPSE_EXPORT_FOURCC", "mp4v"))
+        self.days_selected = list(days_selected or [])
+        self.hour_start, self.hour_end = hour_start, hour_end
+        self.ext = ext
+        # Por día: la curva objetivo de cada segmento sale de las fotos de ese día
+        self.deflicker = bool(_export_setting("TIMELAPSE_DEFLICKER", False) if deflicker is None else deflicker)
+        self._manifest = None
+
+    # ---------- Manifiesto ----------
+    def _params(self) -> dict:
+        return {"fps": self.fps, "size": list(self.size), "fourcc": self.fourcc,
+                "days": self.days_selected, "hours": [self.hour_start, self.hour_end], "ext": self.ext,
+                "deflicker": self.deflicker}
+
+    def _load_manifest(self) -> dict:
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self.work_dir, self.MANIFEST), "r", encoding="utf-8") as f:
+                    m = json.load(f)
+            except Exception:
+                m = {}
+            if m.get("params") != self._params():
+                # Otros parámetros de codificación/filtro: todos los segmentos quedan viejos
+                m = {"params": self._params(), "segments": {}}
+            self._manifest = m
+        return self._manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.work_dir, exist_ok=True)
+        path = os.path.join(self.work_dir, self.MANIFEST)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmp, path)
+
+    # ---------- Días ----------
+    def _day_frames(self, day: str) -> List[str]:
+        d0 = datetime.strptime(day, "%Y-%m-%d")
+        return select_frames(self.photo_dir, d0.timestamp(), (d0 + timedelta(days=1)).timestamp(),
+                             self.days_selected, self.hour_start, self.hour_end)
+
+    @staticmethod
+    def _signature(paths: List[str]) -> str:
+        return hashlib.sha1("\n".join(paths).encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _segment_path(self, day: str) -> str:
+        return os.path.join(self.seg_dir, day + self.ext)
+
+    def _closed_days(self) -> List[str]:
+        from infra.photo_catalog import get_catalog
+        cat = get_catalog()
+        cat.ensure_folder(self.photo_dir)
+        today = date.today().isoformat()
+        return [d for d in cat.days(self.photo_dir) if d < today]
+
+    def stale_days(self) -> List[str]:
+        """Días cerrados cuyo segmento falta o no coincide con las fotos actuales."""
+        segs = self._load_manifest()["segments"]
+        out = []
+        for day in self._closed_days():
+            entry = segs.get(day)
+            if (entry is None or not os.path.exists(self._segment_path(day))
+                    or entry.get("sig") != self._signature(self._day_frames(day))):
+                out.append(day)
+        return out
+
+    # ---------- API ----------
+    def update(self, on_progress: Optional[Callable[[str, int, int], None]] = None,
+               should_stop: Optional[Callable[[], bool]] = None) -> dict:
+        """Codifica los segmentos viejos de días cerrados y descarta los de días sin fotos."""
+        m = self._load_manifest()
+        segs = m["segments"]
+        os.makedirs(self.seg_dir, exist_ok=True)
+        closed = self._closed_days()
+        built = 0
+        for day in list(segs):
+            if day not in closed:
+                segs.pop(day, None)
+                try:
+                    os.remove(self._segment_path(day))
+                except OSError:
+                    pass
+        for day in closed:
+            if should_stop is not None and should_stop():
+                break
+            frames = self._day_frames(day)
+            sig = self._signature(frames)
+            entry = segs.get(day)
+            if entry is not None and entry.get("sig") == sig and os.path.exists(self._segment_path(day)):
+                continue
+            if not frames:
+                # Todas las fotos del día quedaron fuera del filtro
+                segs[day] = {"sig": sig, "frames": 0}
+                self._save_manifest()
+                continue
+            res = export_timelapse(frames, self._segment_path(day), self.fps, self.size, self.fourcc,
+                                   on_progress=(lambda d, t, day=day: on_progress(day, d, t)) if on_progress else None,
+                                   should_stop=should_stop, deflicker=self.deflicker)
+            if res["path"] is None:
+                if res["cancelled"]:
+                    break
+                segs[day] = {"sig": sig, "frames": 0}
+            else:
+                segs[day] = {"sig": sig, "frames": res["frames"], "built_ts": datetime.now().timestamp()}
+                built += 1
+            # Guardar tras cada día: si se corta, lo hecho no se repite
+            self._save_manifest()
+        self._save_manifest()
+        return {"built": built, "segments": sum(1 for e in segs.values() if e.get("frames"))}
+
+    def build(self, out_path: str, include_today: bool = True,
+              on_progress: Optional[Callable[[str, int, int], None]] = None,
+              should_stop: Optional[Callable[[], bool]] = None) -> dict:
+        """Actualiza los segmentos y arma el video completo en ``out_path`` sin recodificarlos."""
+        res = self.update(on_progress, should_stop)
+        if should_stop is not None and should_stop():
+            return {**res, "path": None, "cancelled": True}
+        segs = self._manifest["segments"]
+        parts = [self._segment_path(d) for d in sorted(segs) if segs[d].get("frames")]
+        if include_today:
+            today = date.today().isoformat()
+            frames = self._day_frames(today)
+            if frames:
+                tail = os.path.join(self.work_dir, "today" + self.ext)
+                r = export_timelapse(frames, tail, self.fps, self.size, self.fourcc, should_stop=should_stop,
+                                     deflicker=self.deflicker)
+                if r["path"]:
+                    parts.append(tail)
+        if not parts:
+            return {**res, "path": None, "cancelled": False}
+        method = concat_segments(parts, out_path, self.fps, self.size, self.fourcc)
+        return {**res, "path": out_path, "cancelled": False, "concat": method}
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Hardware-free capture benchmark for CameraManager.
+
+Drives the real CameraManager (grab thread, capture path, photo writer)
+against a SyntheticSource at each entry of config.settings.RESOLUTIONS and
+prints a JSON report:
+
+  - stream:     start_stream -> first frame (ms) and sustained preview fps.
+  - stop:       stop_stream -> stop applied by the camera worker, and
+                stop_stream -> last preview frame read (device idle), over
+                --stop-cycles start/stop cycles.
+  - manual:     take_photo while streaming (the UI "Foto" button), blocking
+                until the file is on disk. Captures at the preview size use
+                the fast path; the rest reconfigure the sensor.
+  - stream_off: take_photo with the stream off and auto_resume_stream=True.
+
+stream_off only approximates a timelapse tick with the live view closed:
+the real tick (ui.main_window._timelapse_tick) runs on Tk's after() and
+adds queueing behind manual captures and quality retakes, which this tool
+does not drive. With the live view open a tick costs the same as manual.
+
+For manual/stream_off it reports p50/p95/p99 of end-to-end capture latency,
+camera busy time, JPEG encode time, disk write time, resume-to-first-frame
+time and throughput (photos/s back to back).
+
+Usage (from the repo root):
+  python tools/capture_benchmark.py --captures 10 --out bench.json
+  python tools/capture_benchmark.py --resolutions "1920 x 1080 (FHD)" "1280 x 720 (HD)"
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# The module-level camera_manager singleton must never touch a real device here
+os.environ.setdefault("KATCAM_FRAME_SOURCE", "synthetic")
+
+import cv2
+import numpy as np
+
+from config.settings import RESOLUTIONS, DEFAULT_RES_LABEL
+from hardware.frame_sources import make_source_factory
+from video_capture import CameraManager
+
+
+def percentiles(values):
+    vals = [float(v) for v in values if v is not None]
+    if not vals:
+        return None
+    arr = np.asarray(vals)
+    return {
+        'n': len(vals),
+        'p50': round(float(np.percentile(arr, 50)), 2),
+        'p95': round(float(np.percentile(arr, 95)), 2),
+        'p99': round(float(np.percentile(arr, 99)), 2),
+        'mean': round(float(arr.mean()), 2),
+        'max': round(float(arr.max()), 2),
+    }
+
+
+def wait_for(cond, timeout_s, poll_s=0.002):
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        if cond():
+            return True
+        time.sleep(poll_s)
+    return False
+
+
+def bench_stream(cm, seconds):
+    seq0 = cm.frame_seq
+    t0 = time.perf_counter()
+    cm.start_stream()
+    if not wait_for(lambda: cm.frame_seq > seq0, 10.0):
+        return {'first_frame_ms': None, 'fps': 0.0}
+    first_ms = (time.perf_counter() - t0) * 1000.0
+    seq1, t1 = cm.frame_seq, time.perf_counter()
+    time.sleep(seconds)
+    fps = (cm.frame_seq - seq1) / max(1e-6, time.perf_counter() - t1)
+    return {'first_frame_ms': round(first_ms, 2), 'fps': round(fps, 2)}
+
+
+def bench_stop(cm, cycles, fps):
+    """Times stop_stream over ``cycles`` start/stop cycles; leaves the stream stopped."""
+    applied, idle = [], []
+    # No new frame for a few frame periods = the grab thread stopped reading
+    quiet_s = max(0.1, 3.0 / max(1e-6, fps))
+    for _ in range(max(1, cycles)):
+        seq0 = cm.frame_seq
+        cm.start_stream()
+        if not wait_for(lambda: cm.frame_seq > seq0, 10.0):
+            break
+        time.sleep(quiet_s)
+        seq, t0 = cm.frame_seq, time.perf_counter()
+        cm.stop_stream()
+        if wait_for(lambda: not getattr(cm, '_stream_enabled', False), 5.0):
+            applied.append((time.perf_counter() - t0) * 1000.0)
+        last = t0
+        while time.perf_counter() - last < quiet_s and time.perf_counter() - t0 < 10.0:
+            if cm.frame_seq != seq:
+                seq, last = cm.frame_seq, time.perf_counter()
+            time.sleep(0.001)
+        idle.append((last - t0) * 1000.0)
+    return {'applied_ms': percentiles(applied), 'last_frame_ms': percentiles(idle)}
+
+
+def bench_captures(cm, folder, size, count, quality, streaming, interval_s, timeout_s):
+    lat, busy, enc, wr, resume = [], [], [], [], []
+    failures = 0
+    t_start = time.perf_counter()
+    for _ in range(count):
+        resumes0 = cm.resumes
+        rh = {}
+        t0 = time.perf_counter()
+        ok = cm.take_photo(folder, prefer_sizes=[size], jpeg_quality=quality,
+                           auto_resume_stream=True, block_until_done=True,
+                           timeout=timeout_s, result_holder=rh)
+        t1 = time.perf_counter()
+        if not ok or not rh.get('saved'):
+            failures += 1
+            continue
+        lat.append((t1 - t0) * 1000.0)
+        busy.append((cm.last_capture_ended_ts - cm.last_capture_started_ts) * 1000.0)
+        stats = rh.get('write_stats') or {}
+        enc.append(stats.get('encode_ms'))
+        wr.append(stats.get('write_ms'))
+        # Only captures that stopped the preview have a resume to measure
+        if streaming and wait_for(lambda: cm.resumes > resumes0, 0.05 if rh.get('fastpath') else 5.0):
+            resume.append(cm.last_resume_ms)
+        if interval_s > 0:
+            time.sleep(interval_s)
+    elapsed = time.perf_counter() - t_start
+    done = count - failures
+    return {
+        'captures': count,
+        'failures': failures,
+        'latency_ms': percentiles(lat),
+        'camera_busy_ms': percentiles(busy),
+        'encode_ms': percentiles(enc),
+        'write_ms': percentiles(wr),
+        'resume_first_frame_ms': percentiles(resume),
+        'throughput_photos_s': round(done / elapsed, 3) if elapsed > 0 else None,
+    }
+
+
+def run_resolution(label, w, h, args, preview):
+    folder = tempfile.mkdtemp(prefix='katcam_bench_')
+    factory = make_source_factory('synthetic', fps=args.fps,
+                                  read_latency_s=args.read_latency,
+                                  latency_jitter_s=args.jitter, seed=1)
+    cm = CameraManager(source_factory=factory)
+    cm.set_resolution(*preview)
+    result = {'label': label, 'width': w, 'height': h}
+    try:
+        result['stream'] = bench_stream(cm, args.stream_seconds)
+        result['manual'] = bench_captures(cm, folder, (w, h), args.captures, args.quality,
+                                          streaming=True, interval_s=0.0, timeout_s=args.timeout)
+        result['stop'] = bench_stop(cm, args.stop_cycles, args.fps)
+        result['stream_off'] = bench_captures(cm, folder, (w, h), args.captures, args.quality,
+                                              streaming=False, interval_s=args.interval,
+                                              timeout_s=args.timeout)
+    finally:
+        cm.shutdown()
+        if not args.keep:
+            shutil.rmtree(folder, ignore_errors=True)
+        else:
+            result['folder'] = folder
+    return result
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('--resolutions', nargs='*', help='labels from RESOLUTIONS (default: all)')
+    p.add_argument('--preview', default=DEFAULT_RES_LABEL, help='preview resolution label')
+    p.add_argument('--captures', type=int, default=10, help='captures per scenario')
+    p.add_argument('--stream-seconds', type=float, default=2.0)
+    p.add_argument('--stop-cycles', type=int, default=5, help='start/stop cycles for the stop scenario')
+    p.add_argument('--interval', type=float, default=0.0, help='pause between stream_off captures (s)')
+    p.add_argument('--quality', type=int, default=95)
+    p.add_argument('--fps', type=float, default=30.0, help='synthetic source fps')
+    p.add_argument('--read-latency', type=float, default=0.0, help='extra latency per read (s)')
+    p.add_argument('--jitter', type=float, default=0.0, help='random extra latency per read (s)')
+    p.add_argument('--timeout', type=float, default=60.0, help='take_photo timeout (s)')
+    p.add_argument('--keep', action='store_true', help='keep the captured photos')
+    p.add_argument('--out', help='write the JSON report here (default: stdout)')
+    args = p.parse_args(argv)
+
+    by_label = {t: (w, h) for (t, w, h) in RESOLUTIONS}
+    labels = args.resolutions or [t for (t, _, _) in RESOLUTIONS]
+    unknown = [t for t in labels if t not in by_label]
+    if unknown:
+        p.error(f'unknown resolutions: {unknown}')
+    preview = by_label.get(args.preview) or by_label[DEFAULT_RES_LABEL]
+
+    report = {
+        'ts': time.time(),
+        'type': 'capture_benchmark',
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'resolutions')},
+        'results': [],
+    }
+    for t in labels:
+        w, h = by_label[t]
+        print(f'[bench] {t} ...', file=sys.stderr, flush=True)
+        report['results'].append(run_resolution(t, w, h, args, preview))
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
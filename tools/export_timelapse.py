@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Export a photo folder as a timelapse video.
+
+Streams the catalogued photos in capture order through decode -> resize ->
+cv2.VideoWriter (services.timelapse.export_timelapse); memory stays bounded
+by --prefetch frames regardless of project length.
+
+With --segments WORK_DIR each closed day is encoded once into its own
+segment (services.timelapse.SegmentedTimelapse) and the full video is a
+container-level concat of the segments, so nightly rebuilds only encode the
+days whose photos changed.
+
+Usage (from the repo root):
+  python tools/export_timelapse.py D:\\fotos obra.mp4
+  python tools/export_timelapse.py D:\\fotos semana.mp4 --from 2025-09-01 --to 2025-09-07 \\
+      --days lunes martes miércoles jueves viernes --hours 08:00 18:00 --fps 30
+  python tools/export_timelapse.py D:\\fotos obra.mp4 --segments D:\\obra_video --deflicker
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.timelapse import DIAS_SEMANA, SegmentedTimelapse, export_timelapse, select_frames
+
+
+def _day_start(s):
+    return datetime.strptime(s, '%Y-%m-%d').timestamp()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('photo_dir')
+    p.add_argument('out', help='output video (.mp4 / .avi)')
+    p.add_argument('--from', dest='date_from', help='first day, YYYY-MM-DD')
+    p.add_argument('--to', dest='date_to', help='last day (inclusive), YYYY-MM-DD')
+    p.add_argument('--days', nargs='*', choices=DIAS_SEMANA, help='weekdays to include')
+    p.add_argument('--hours', nargs=2, metavar=('START', 'END'), help='time window, HH:MM HH:MM')
+    p.add_argument('--fps', type=float)
+    p.add_argument('--size', nargs=2, type=int, metavar=('W', 'H'))
+    p.add_argument('--fourcc')
+    p.add_argument('--workers', type=int)
+    p.add_argument('--prefetch', type=int)
+    p.add_argument('--segments', metavar='WORK_DIR', help='keep per-day segments here and concat them')
+    p.add_argument('--deflicker', action=argparse.BooleanOptionalAction, default=None,
+                   help='normalise brightness between frames (default: TIMELAPSE_DEFLICKER)')
+    args = p.parse_args(argv)
+
+    since = _day_start(args.date_from) if args.date_from else None
+    until = None
+    if args.date_to:
+        until = (datetime.strptime(args.date_to, '%Y-%m-%d') + timedelta(days=1)).timestamp()
+    hs, he = args.hours or (None, None)
+    if args.segments:
+        if since or until:
+            p.error('--from/--to are not supported with --segments')
+        t0 = time.perf_counter()
+        st = SegmentedTimelapse(args.photo_dir, args.segments, fps=args.fps,
+                                size=tuple(args.size) if args.size else None, fourcc=args.fourcc,
+                                days_selected=args.days, hour_start=hs, hour_end=he,
+                                deflicker=args.deflicker)
+        res = st.build(args.out, on_progress=lambda day, done, total: print(
+            f'[export] {day} {done}/{total}', file=sys.stderr, flush=True))
+        res['seconds'] = round(time.perf_counter() - t0, 2)
+        print(json.dumps(res, indent=2))
+        return 0 if res['path'] else 1
+
+    paths = select_frames(args.photo_dir, since, until, args.days, hs, he)
+    if not paths:
+        print('no photos match', file=sys.stderr)
+        return 1
+
+    def _progress(done, total):
+        print(f'[export] {done}/{total}', file=sys.stderr, flush=True)
+
+    t0 = time.perf_counter()
+    res = export_timelapse(paths, args.out, fps=args.fps, size=tuple(args.size) if args.size else None,
+                           fourcc=args.fourcc, workers=args.workers, prefetch=args.prefetch,
+                           on_progress=_progress, deflicker=args.deflicker)
+    res['seconds'] = round(time.perf_counter() - t0, 2)
+    print(json.dumps(res, indent=2))
+    return 0 if res['path'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+One-shot migration of a flat photo folder to the daily layout.
+
+Moves every photo directly under PHOTO_DIR into PHOTO_DIR/YYYY/MM/DD/ (day
+taken from the YYYYmmdd_HHMMSS file name, or the mtime) and updates the
+photo catalog. Moves are renames on the same volume and never overwrite an
+existing file, so the tool can be interrupted and run again. Sync manifest
+entries are renamed to the new relative paths, so photos already on the
+Drive are not uploaded a second time, and their Drive copies are moved to
+the same YYYY/MM/DD folders. If a Drive is not mounted, its copies are
+moved by the app on its next sync pass.
+
+The app does the same in the background at startup when
+config.settings.PHOTO_LAYOUT is "daily"; this script is for doing it ahead
+of time (e.g. on a copy of the pendrive) or with the app closed.
+
+Usage (from the repo root):
+  python tools/migrate_photo_layout.py D:\\fotos
+  python tools/migrate_photo_layout.py /media/pendrive/fotos --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infra.photo_catalog import get_catalog, is_photo_name, taken_ts_from_name
+from infra.photo_layout import migrate_to_daily, shard_for
+from infra.sync_manifest import get_sync_manifest
+from services.sync import SyncEngine
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('photo_dir', help='photo folder (the one chosen in the app)')
+    p.add_argument('--dry-run', action='store_true', help='only report how many photos per day would move')
+    p.add_argument('--no-catalog', action='store_true', help='do not update the photo catalog')
+    p.add_argument('--no-manifest', action='store_true', help='do not update the sync manifest nor move Drive copies')
+    args = p.parse_args(argv)
+
+    root = os.path.abspath(args.photo_dir)
+    if not os.path.isdir(root):
+        p.error(f'not a folder: {root}')
+
+    if args.dry_run:
+        per_day = {}
+        for name in os.listdir(root):
+            if not is_photo_name(name):
+                continue
+            ts = taken_ts_from_name(name) or os.path.getmtime(os.path.join(root, name))
+            day = shard_for(ts).replace(os.sep, '/')
+            per_day[day] = per_day.get(day, 0) + 1
+        print(json.dumps({'root': root, 'photos': sum(per_day.values()),
+                          'days': dict(sorted(per_day.items()))}, indent=2))
+        return 0
+
+    cat = None if args.no_catalog else get_catalog()
+    engine = None if args.no_manifest else SyncEngine(get_sync_manifest())
+    count = {'n': 0}
+
+    def _progress(old, new):
+        if cat is not None:
+            cat.move(old, new)
+        if engine is not None:
+            engine.notify_moved(old, new)
+        count['n'] += 1
+        if count['n'] % 500 == 0:
+            print(f'[migrate] {count["n"]} moved ...', file=sys.stderr, flush=True)
+
+    res = migrate_to_daily(root, on_moved=_progress)
+    print(json.dumps({'root': root, **res}, indent=2))
+    return 0 if not res['failed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,11 +4,16 @@ from PIL import Image, ImageTk, ImageOps
 from config.settings import BG_COLOR, IMG_MIN_W, IMG_MIN_H, RESIZE_DEBOUNCE_MS
 
 class ImagePanel(tk.Frame):
-    """Canvas que muestra una imagen redimensionada sin alterar el layout."""
-    def __init__(self, parent, bg=BG_COLOR, min_size=(IMG_MIN_W, IMG_MIN_H)):
+    """Canvas que muestra una imagen redimensionada sin alterar el layout.
+
+    on_resize(w, h) se llama (con debounce) cuando cambia el tamaño útil, para
+    que el productor de frames entregue imágenes ya escaladas al panel.
+    """
+    def __init__(self, parent, bg=BG_COLOR, min_size=(IMG_MIN_W, IMG_MIN_H), on_resize=None):
         super().__init__(parent, bg=bg)
         self.bg = bg
         self.min_w, self.min_h = min_size
+        self.on_resize = on_resize
         self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, borderwidth=0)
         self.canvas.pack(fill="both", expand=True)
         self.update_idletasks()
@@ -16,31 +21,65 @@ class ImagePanel(tk.Frame):
 
         self._last_pil = None
         self._tk_img = None
+        self._tk_key = None      # (size, mode) del PhotoImage actual
+        self._img_id = None      # item de imagen del canvas (se reutiliza)
         self._resize_job = None
+        # Contadores: actualizaciones in-place (paste) vs PhotoImage nuevos
+        self.pastes = 0
+        self.rebuilds = 0
         self.bind("<Configure>", self._on_resize)
 
     def set_image(self, pil_img: Image.Image):
         self._last_pil = pil_img
         self._render()
 
+    def display_size(self):
+        """Tamaño disponible para la imagen (w, h) en píxeles."""
+        return (max(self.canvas.winfo_width(), self.min_w),
+                max(self.canvas.winfo_height(), self.min_h))
+
     def _on_resize(self, _evt=None):
         if self._resize_job:
             self.after_cancel(self._resize_job)
-        self._resize_job = self.after(RESIZE_DEBOUNCE_MS, self._render)
+        self._resize_job = self.after(RESIZE_DEBOUNCE_MS, self._resized)
+
+    def _resized(self):
+        self._resize_job = None
+        if self.on_resize is not None:
+            try:
+                self.on_resize(*self.display_size())
+            except Exception:
+                pass
+        self._render()
 
     def _render(self):
         if self._last_pil is None:
             ph = Image.new("RGB", (self.min_w, self.min_h), (40, 40, 40))
             self._draw(ph); return
 
-        cw = max(self.canvas.winfo_width(), self.min_w)
-        ch = max(self.canvas.winfo_height(), self.min_h)
-        shown = ImageOps.contain(self._last_pil, (cw, ch))
+        cw, ch = self.display_size()
+        iw, ih = self._last_pil.size
+        # Si ya viene escalada al panel (producto display), solo dibujar
+        if iw <= cw and ih <= ch and (iw >= cw - 1 or ih >= ch - 1):
+            shown = self._last_pil
+        else:
+            shown = ImageOps.contain(self._last_pil, (cw, ch))
         self._draw(shown)
 
     def _draw(self, pil_img):
-        self._tk_img = ImageTk.PhotoImage(pil_img)
-        self.canvas.delete("all")
+        key = (pil_img.size, pil_img.mode)
+        if self._tk_img is not None and self._img_id is not None and key == self._tk_key:
+            # Mismo tamaño/modo: actualizar los píxeles del PhotoImage existente
+            self._tk_img.paste(pil_img)
+            self.pastes += 1
+        else:
+            self._tk_img = ImageTk.PhotoImage(pil_img)
+            self._tk_key = key
+            self.rebuilds += 1
+            if self._img_id is None:
+                self._img_id = self.canvas.create_image(0, 0, image=self._tk_img, anchor="center")
+            else:
+                self.canvas.itemconfig(self._img_id, image=self._tk_img)
         cw = self.canvas.winfo_width()
         ch = self.canvas.winfo_height()
-        self.canvas.create_image(cw // 2, ch // 2, image=self._tk_img, anchor="center")
+        self.canvas.coords(self._img_id, cw // 2, ch // 2)
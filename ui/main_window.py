@@ -4,6 +4,7 @@ import sys
 import subprocess
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import messagebox, filedialog as fd
@@ -29,6 +30,12 @@ from ui.config_window import ConfigWindow
 # Drivers reales
 from video_capture import camera_manager
 from camera import take_photo
+from infra.photo_writer import add_commit_listener, is_temp_name
+from infra.photo_catalog import get_catalog
+from infra.photo_layout import iter_shards, layout_mode, migrate_to_daily, root_of
+from infra.thumb_cache import get_thumb_cache, thumb_size
+from infra.thumb_pool import ThumbLoader
+from services.sync import SyncWorker, get_sync_engine
 
 
 # =========================
@@ -369,6 +376,13 @@ class AppState:
         # Carpetas
         self.photo_dir = self.cfg.data.get("photo_dir") or ""
         self.drive_dir = self.cfg.data.get("drive_dir") or ""
+        # Última foto confirmada (renombrada a su nombre final) por el escritor
+        self.last_committed_photo = None
+        # Hilo de sincronización al Drive (services.sync.SyncWorker)
+        self.sync_worker = None
+        # Tamaño del panel principal (lo actualiza el hilo de Tk; los hilos de captura
+        # lo usan para pedir la vista previa de la foto ya escalada)
+        self.panel_size = None
 
         # UI refs
         self.image_panel: ImagePanel | None = None
@@ -392,6 +406,13 @@ class AppState:
 
         # stream tick
         self._tick_job = None
+        # Frame del live mostrado (vista RGB ya escalada al panel, fijada mientras
+        # el panel la usa) y su secuencia para saltar frames repetidos
+        self.stream_view = None
+        self.stream_frame_seq = 0
+        # Ticks del live que dibujaron un frame nuevo vs. saltados (sin frame nuevo)
+        self.stream_ticks_rendered = 0
+        self.stream_ticks_skipped = 0
         # Telemetría / watchdog
         self.last_frame_ts = 0
         self.frame_counter = 0
@@ -476,7 +497,16 @@ def build_main_window(root: tk.Tk):
     min_w = max(320, int(sw * 0.25), IMG_MIN_W)  # al menos 320 o 25% del ancho o lo que diga settings
     min_h = max(220, int(sh * 0.25), IMG_MIN_H)  # al menos 220 o 25% del alto o lo que diga settings
 
-    state.image_panel = ImagePanel(viewer, bg=BG_COLOR, min_size=(min_w, min_h))
+    def _on_panel_resize(w, h):
+        state.panel_size = (w, h)
+        # El live recibe frames ya escalados al nuevo tamaño del panel
+        if state.streaming:
+            try:
+                camera_manager.set_display_size(w, h)
+            except Exception:
+                pass
+
+    state.image_panel = ImagePanel(viewer, bg=BG_COLOR, min_size=(min_w, min_h), on_resize=_on_panel_resize)
     state.image_panel.pack(fill="both", expand=True)
 
     # ============================================================
@@ -909,10 +939,20 @@ def build_main_window(root: tk.Tk):
 
     # --- Inicialización y cierre ---
     _ensure_initial_dirs(state)
+    add_commit_listener(lambda path, info: _on_photo_committed(state, path, info))
+    _start_catalog_reconcile(state)
+    try:
+        get_thumb_cache()  # suscribe la generación anticipada de miniaturas
+    except Exception:
+        pass
+    try:
+        get_sync_engine()  # suscribe la sincronización incremental a los commits
+    except Exception:
+        pass
     root.after(150, lambda: update_main_image(state))
 
     update_stream_ui(state); update_timelapse_ui(state); update_maniobra_ui(state)
-    _schedule_sync(state)
+    _start_sync_worker(state)
 
     def on_close():
         state.cfg.set(
@@ -922,6 +962,11 @@ def build_main_window(root: tk.Tk):
             video_resolution_label=state.video_resolution_label,
             cam_index=state.cam_index
         )
+        try:
+            if state.sync_worker is not None:
+                state.sync_worker.stop()
+        except Exception:
+            pass
         try:
             camera_manager.stop_stream()
             camera_manager.shutdown()
@@ -985,6 +1030,7 @@ def _cambiar_directorio_fotos(state: AppState):
     if not has_write_access(nueva):
         messagebox.showerror("Permisos", "No hay permiso de escritura en la carpeta elegida."); return
     state.photo_dir = nueva; state.cfg.set(photo_dir=nueva)
+    _start_catalog_reconcile(state)
     messagebox.showinfo("Ruta actualizada", f"Carpeta de fotos:\n{state.photo_dir}")
     update_main_image(state)
 
@@ -1164,13 +1210,68 @@ def _resume_stream_if_marked(state: AppState):
 # =========================
 # Imagen principal
 # =========================
+def _on_photo_committed(state: AppState, path: str, _info=None):
+    # Llega desde el hilo escritor: solo se guarda la ruta, la UI la lee en su hilo
+    state.last_committed_photo = path
+
+
+def _start_catalog_reconcile(state: AppState):
+    """Reconcilia el catálogo con la carpeta de fotos en segundo plano (una vez por carpeta).
+
+    Primero escanea solo la raíz y el día más reciente y refresca la última
+    foto (con el catálogo vacío ``_get_last_photo`` no tiene qué mostrar).
+    Con PHOTO_LAYOUT="daily" después migra las fotos planas a YYYY/MM/DD.
+    """
+    folder = state.photo_dir
+    def _refresh():
+        if state.photo_dir == folder and not state.streaming:
+            update_main_image(state)
+    def _run():
+        try:
+            cat = get_catalog()
+            if not cat.is_reconciled(folder) and cat.ensure_latest(folder):
+                state.root.after(0, _refresh)
+            cat.ensure_folder(folder)
+            if layout_mode() == "daily" and folder:
+                def _moved(old, new):
+                    cat.move(old, new)
+                    get_sync_engine().notify_moved(old, new)
+                res = migrate_to_daily(folder, on_moved=_moved)
+                if res["moved"] or res["failed"]:
+                    try:
+                        from infra.telemetry import log_event
+                        log_event("photo_layout_migrated", folder=folder, **res)
+                    except Exception:
+                        pass
+        except Exception as e:
+            try:
+                from infra.telemetry import log_error
+                log_error(e, {"phase": "catalog_reconcile"})
+            except Exception:
+                pass
+    threading.Thread(target=_run, daemon=True).start()
+
+
 def _get_last_photo(state: AppState):
     if not state.photo_dir or not os.path.exists(state.photo_dir):
         return None
+    last = state.last_committed_photo
+    if last and root_of(os.path.dirname(last)) == os.path.abspath(state.photo_dir) and os.path.exists(last):
+        return last
+    # Catálogo persistente: válido incluso antes de terminar la reconciliación de arranque.
+    # Si todavía está vacío para esta carpeta no se escanea acá (hilo de Tk): la
+    # reconciliación de fondo refresca la imagen cuando termina con el día más reciente
+    try:
+        return get_catalog().latest(state.photo_dir)
+    except Exception:
+        pass
+    # Sin catálogo: fotos planas de la raíz + el día más reciente (si hay carpetas por día)
+    folders = [state.photo_dir] + [d for _day, d in iter_shards(state.photo_dir, newest_first=True)][:1]
     fotos = [
-        os.path.join(state.photo_dir, f)
-        for f in os.listdir(state.photo_dir)
-        if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        os.path.join(d, f)
+        for d in folders
+        for f in os.listdir(d)
+        if f.lower().endswith((".jpg", ".jpeg", ".png")) and not is_temp_name(f)
     ]
     if not fotos:
         return None
@@ -1179,13 +1280,26 @@ def _get_last_photo(state: AppState):
 
 
 
-def update_main_image(state: AppState):
+def update_main_image(state: AppState, preview=None):
+    """Muestra la última foto.
+
+    ``preview`` es la copia RGB ya escalada que devuelve la captura
+    (result_holder["preview"]); si no hay, se decodifica el JPEG en modo
+    draft (JPEG reducido 1/2..1/8 al tamaño del panel) en vez de completo.
+    """
     if state.image_panel is None:
         return
     try:
-        last_photo = _get_last_photo(state)
-        if last_photo and os.path.exists(last_photo):
-            img = Image.open(last_photo).convert("RGB")
+        last_photo = None if preview is not None else _get_last_photo(state)
+        if preview is not None:
+            img = Image.fromarray(preview)
+        elif last_photo and os.path.exists(last_photo):
+            img = Image.open(last_photo)
+            try:
+                img.draft("RGB", state.panel_size or state.image_panel.display_size())
+            except Exception:
+                pass
+            img = img.convert("RGB")
         elif COMPANY_LOGO_PATH and os.path.exists(COMPANY_LOGO_PATH):
             # PNG con posible transparencia - aplicar sombra
             img = Image.open(COMPANY_LOGO_PATH).convert("RGBA")
@@ -1255,6 +1369,11 @@ def stream_on(state: AppState):
     except Exception:
         pass
 
+    try:
+        if state.image_panel is not None:
+            camera_manager.set_display_size(*state.image_panel.display_size())
+    except Exception:
+        pass
     camera_manager.start_stream()
     update_stream_ui(state)
     set_status(state)("Transmisión en directo")
@@ -1280,8 +1399,10 @@ def stream_off(state: AppState):
         pass
     try:
         camera_manager.stop_stream()
+        camera_manager.set_display_size(None)
     except Exception:
         pass
+    _release_stream_view(state)
     update_stream_ui(state)
     set_status(state)("Transmisión detenida")
     update_main_image(state)
@@ -1292,23 +1413,48 @@ def stream_off(state: AppState):
         pass
 
 
+def _release_stream_view(state: AppState):
+    view, state.stream_view = state.stream_view, None
+    if view is not None:
+        try:
+            view.release()
+        except Exception:
+            pass
+
+
 def _tick_stream(state: AppState):
     if not state.streaming: return
     try:
-        frame_rgb = camera_manager.get_frame_rgb()
-        if frame_rgb is not None and state.image_panel:
-            img = Image.fromarray(frame_rgb); state.image_panel.set_image(img)
+        # Frame RGB ya escalado al panel por CameraManager; None si no hay uno nuevo
+        view = camera_manager.acquire_display_frame(min_seq=state.stream_frame_seq)
+        if view is not None and state.image_panel:
+            # frombuffer comparte memoria con la vista (sin copia); la vista queda
+            # fijada hasta que llegue la siguiente, por si el panel re-renderiza
+            h, w = view.shape[:2]
+            img = Image.frombuffer("RGB", (w, h), view.array, "raw", "RGB", 0, 1)
+            _release_stream_view(state)
+            state.stream_view = view
+            state.stream_frame_seq = view.seq
+            state.image_panel.set_image(img)
+            state.stream_ticks_rendered += 1
             try:
                 state.last_frame_ts = time.time()
                 state.frame_counter += 1
                 if state.frame_counter % 120 == 0:
                     try:
                         from infra.telemetry import log_event
-                        log_event("stream_heartbeat", frames=state.frame_counter)
+                        log_event("stream_heartbeat", frames=state.frame_counter,
+                                  rendered=state.stream_ticks_rendered,
+                                  skipped=state.stream_ticks_skipped,
+                                  pastes=state.image_panel.pastes,
+                                  rebuilds=state.image_panel.rebuilds)
                     except Exception:
                         pass
             except Exception:
                 pass
+        else:
+            # Sin frame nuevo desde el último tick: no se redibuja nada
+            state.stream_ticks_skipped += 1
     except Exception as e:
         try:
             from infra.telemetry import log_error
@@ -1355,6 +1501,7 @@ def take_and_update(state: AppState):
     set_status(state)("Preparando captura...")
 
     def _work():
+        result_holder = {}
         try:
             try:
                 from infra.telemetry import log_event
@@ -1379,7 +1526,8 @@ def take_and_update(state: AppState):
                     jpeg_quality=95,
                     auto_resume_stream=True,
                     block_until_done=True,
-                    result_holder=result_holder
+                    result_holder=result_holder,
+                    preview_size=state.panel_size
                 )
             except Exception as e:
                 try:
@@ -1434,7 +1582,7 @@ def take_and_update(state: AppState):
         finally:
             def _finish():
                 set_status(state)(msg)
-                update_main_image(state)
+                update_main_image(state, result_holder.get("preview"))
                 state.is_capturing = False
                 # Procesar siguiente en cola si existe
                 if state.capture_queue:
@@ -1588,6 +1736,7 @@ def _timelapse_tick(state: AppState):
     prefer = [wh] if wh else None
 
     def _do_capture():
+        result_holder = {}
         try:
             # Marcar que hay una captura en curso para evitar solapamientos con otros ticks
             state.is_capturing = True
@@ -1604,21 +1753,44 @@ def _timelapse_tick(state: AppState):
             except Exception:
                 pass
             try:
-                ok = take_photo(
-                    dest_folder=state.photo_dir,
-                    prefer_sizes=prefer,
-                    jpeg_quality=95,
-                    auto_resume_stream=True,
-                    block_until_done=True,
-                    result_holder=result_holder
-                )
-            except Exception as e:
+                from config import settings as _cfg
+                retake_on_bad = bool(getattr(_cfg, "CAPTURE_RETAKE_ON_BAD", False))
+                retake_max = int(getattr(_cfg, "CAPTURE_RETAKE_MAX", 1))
+            except Exception:
+                retake_on_bad, retake_max = False, 0
+            # Los reintentos tienen que entrar en el tick: como mucho medio intervalo
+            retake_deadline = time.time() + (state.interval_ms / 1000.0) * 0.5
+            attempt = 0
+            while True:
                 try:
-                    from infra.telemetry import log_error
-                    log_error(e, {"phase": "take_photo_call_timelapse"})
+                    ok = take_photo(
+                        dest_folder=state.photo_dir,
+                        prefer_sizes=prefer,
+                        jpeg_quality=95,
+                        auto_resume_stream=True,
+                        block_until_done=True,
+                        result_holder=result_holder,
+                        preview_size=state.panel_size
+                    )
+                except Exception as e:
+                    try:
+                        from infra.telemetry import log_error
+                        log_error(e, {"phase": "take_photo_call_timelapse"})
+                    except Exception:
+                        pass
+                    ok = False
+                # Foto rechazada por calidad (movida, quemada, niebla): otra dentro del mismo tick
+                reject = (result_holder.get("quality") or {}).get("reject") if ok else None
+                if not (reject and retake_on_bad and attempt < retake_max
+                        and time.time() < retake_deadline and state.timelapse_running):
+                    break
+                attempt += 1
+                try:
+                    from infra.telemetry import log_event
+                    log_event("timelapse_retake", attempt=attempt, reasons=reject)
                 except Exception:
                     pass
-                ok = False
+                result_holder = {}
             eff_label = None
             try:
                 if ok and isinstance(result_holder, dict) and result_holder.get("eff_w"):
@@ -1663,7 +1835,7 @@ def _timelapse_tick(state: AppState):
         finally:
             def _finish():
                 set_status(state)(msg)
-                update_main_image(state)
+                update_main_image(state, result_holder.get("preview"))
                 set_status(state)("Timelapse: esperando próxima captura...")
                 # limpiar flag de captura y registrar timestamp para throttling
                 try:
@@ -1778,6 +1950,7 @@ def toggle_maniobra(state: AppState):
             state.maniobra_capture_in_progress = True
 
             def _cap():
+                result_holder = {}
                 try:
                     from video_capture import camera_manager as _cm
                     # Usar la resolución seleccionada por el usuario para evitar mismatches altos
@@ -1793,7 +1966,7 @@ def toggle_maniobra(state: AppState):
                     # Marcar captura en curso para coordinar con otros flujos
                     state.is_capturing = True
                     try:
-                        ok = _cm.take_photo(state.photo_dir, prefer_sizes=prefer, block_until_done=True, auto_resume_stream=True, result_holder=result_holder)
+                        ok = _cm.take_photo(state.photo_dir, prefer_sizes=prefer, block_until_done=True, auto_resume_stream=True, result_holder=result_holder, preview_size=state.panel_size)
                     except Exception as e:
                         try:
                             from infra.telemetry import log_error
@@ -1818,7 +1991,7 @@ def toggle_maniobra(state: AppState):
                 finally:
                     state.maniobra_capture_in_progress = False
                     state.is_capturing = False
-                    update_main_image(state)
+                    update_main_image(state, result_holder.get("preview"))
                     # Procesar cola si hubiera pendiente manual (priorizar manual antes de siguiente tick)
                     if state.capture_queue and not state.is_capturing:
                         nxt = state.capture_queue.pop(0)
@@ -1902,33 +2075,51 @@ def _ensure_initial_dirs(state: AppState):
 # =========================
 # Sincronización a Drive
 # =========================
-def _sync_photos(state: AppState):
+def _sync_dirs(state: AppState):
+    return state.photo_dir, state.drive_dir
+
+
+def _start_sync_worker(state: AppState):
+    """Sincronización incremental en su propio hilo (la copia no corre en el hilo de Tk)."""
     try:
-        if not (state.photo_dir and os.path.exists(state.photo_dir)):
-            set_status(state)("Carpeta de fotos inválida."); return
-        if not (state.drive_dir and os.path.exists(state.drive_dir)):
-            set_status(state)("No se encontró Google Drive para sincronizar."); return
-
-        fotos_src = sorted([f for f in os.listdir(state.photo_dir) if f.lower().endswith((".jpg",".jpeg",".png"))])
-        fotos_dst = set(os.listdir(state.drive_dir))
-        nuevas = [f for f in fotos_src if f not in fotos_dst]
-        for f in nuevas:
-            src = os.path.join(state.photo_dir, f); dst = os.path.join(state.drive_dir, f)
-            try:
-                import shutil; shutil.copy2(src, dst)
-            except Exception:
-                pass
-        if nuevas:
-            set_status(state)(f"Sincronizadas {len(nuevas)} fotos al Drive.")
-    except Exception as e:
-        set_status(state)(f"Sync error: {e}")
+        from config import settings as _cfg
+        interval_s = float(getattr(_cfg, "SYNC_INTERVAL_S", 60))
+        max_bps = float(getattr(_cfg, "SYNC_MAX_BYTES_PER_S", 0) or 0)
+    except Exception:
+        interval_s, max_bps = 60.0, 0.0
+    state.sync_worker = SyncWorker(
+        get_dirs=lambda: _sync_dirs(state),
+        # Pausar la copia mientras hay una captura en curso (disco/USB compartidos)
+        is_paused=lambda: bool(state.is_capturing or state.maniobra_capture_in_progress),
+        interval_s=interval_s, max_bytes_per_s=max_bps)
+    state.sync_worker.start()
+    _poll_sync_events(state)
+
+
+def _poll_sync_events(state: AppState):
+    w = state.sync_worker
+    if w is None:
+        return
+    try:
+        for kind, data in w.events():
+            if kind == "progress":
+                done, total, _name = data
+                set_status(state)(f"Sincronizando {done}/{total}…")
+            elif kind == "done":
+                if data["copied"]:
+                    set_status(state)(f"Sincronizadas {data['copied']} fotos al Drive.")
+            elif kind == "error":
+                name, msg = data
+                set_status(state)(f"Sync error: {name}: {msg}" if name else f"Sync error: {msg}")
+            elif kind == "skipped":
+                set_status(state)(data)
+    except Exception:
+        pass
+    state.root.after(250, lambda: _poll_sync_events(state))
 
 
-def _schedule_sync(state: AppState):
-    _sync_photos(state)
-    state.root.after(60_000, lambda: _schedule_sync(state))  # cada 60s
 def open_gallery_window(state: AppState):
-    import queue, threading, calendar
+    import threading, calendar
     from datetime import datetime, date
 
     # Solo una galería a la vez
@@ -1981,9 +2172,9 @@ def open_gallery_window(state: AppState):
     def _close_now():
         stop_flag["stop"] = True
         try:
-            t = worker.get("t")
-            if t and t.is_alive():
-                t.join(timeout=0.6)
+            if loader["l"] is not None:
+                loader["l"].close()
+                loader["l"] = None
         except Exception:
             pass
         _unbind_wheel()
@@ -2218,10 +2409,6 @@ def open_gallery_window(state: AppState):
         new_w = max(720, _resize["w"] + dx)
         new_h = max(480, _resize["h"] + dy)
         win.geometry(f"{int(new_w)}x{int(new_h)}+{win.winfo_x()}+{win.winfo_y()}")
-        try:
-            canvas.configure(scrollregion=canvas.bbox("all"))
-        except Exception:
-            pass
 
     def _stop_resize(e=None):
         _resize["drag"] = False
@@ -2236,16 +2423,27 @@ def open_gallery_window(state: AppState):
         w.bind("<Button-1>", _start_resize)
 
 
-    # ---------- Loader asíncrono seguro ----------
-    thumb_refs = []
+    # ---------- Grilla virtualizada ----------
+    # Solo existen las tarjetas que entran en pantalla: un pool fijo de
+    # widgets que se reasignan al hacer scroll. El canvas tiene el alto de
+    # todas las filas, pero cada tarjeta es un item de ventana que se mueve
+    # a la fila visible que le toca. Las miniaturas las genera un pool de
+    # workers (infra.thumb_pool) y se piden solo las de la vista y su margen.
     COLS = 4
+    CARD_PAD = 8
     BATCH_UI = 16
+    PREFETCH_SCREENS = 1   # pantallas extra pedidas arriba y abajo
+    TW, TH = thumb_size()
+    CELL_W = TW + 2 * CARD_PAD + 2
+    ROW_H = TH + 90        # alto estimado de una fila hasta medir la primera tarjeta
 
-    q = queue.Queue(maxsize=64)
-    worker = {"t": None}
+    loader = {"l": None}
     stop_flag = {"stop": False}
-    prog = {"done": 0, "total": 0}
-    grid_state = {"count": 0}
+    grid_state = {"files": [], "row_h": ROW_H, "gen": 0, "cards": [], "bound": {},
+                  "summary": "", "pump_job": None, "region": None}
+    # Miniaturas ya convertidas a PhotoImage, acotadas (LRU); el resto sale de la caché en disco
+    photo_lru = OrderedDict()
+    placeholder = tk.PhotoImage(width=TW, height=TH)
 
     def _widget_exists(w):
         try:
@@ -2264,31 +2462,200 @@ def open_gallery_window(state: AppState):
         except Exception as e:
             messagebox.showerror("Abrir", f"No se pudo abrir la imagen:\n{e}")
 
+    def _lru_cap():
+        # Vista + márgenes de prefetch, con piso para ventanas chicas
+        return max(64, (2 * PREFETCH_SCREENS + 2) * len(grid_state["cards"]))
+
+    def _lru_put(p, tkimg):
+        photo_lru[p] = tkimg
+        photo_lru.move_to_end(p)
+        while len(photo_lru) > _lru_cap():
+            old, _img = photo_lru.popitem(last=False)
+            if old in grid_state["bound"]:
+                # Sigue en pantalla: no soltar la imagen que muestra
+                photo_lru[old] = _img
+                break
+
+    def _make_card():
+        card = {"idx": None, "path": None}
+        fr = tk.Frame(canvas, bg=BG_COLOR, bd=0, highlightthickness=1, highlightbackground="#333")
+        card["img"] = tk.Label(fr, image=placeholder, bg=BG_COLOR)
+        card["img"].pack()
+        card["name"] = tk.Label(fr, text="", bg=BG_COLOR, fg=FG_COLOR, wraplength=TW)
+        card["name"].pack(fill="x", padx=6, pady=4)
+        card["btn"] = tk.Button(fr, text="Open", bg=BTN_COLOR, fg=BTN_TEXT_COLOR, bd=0,
+                                font=("Arial", 10, "bold"), padx=8, pady=4)
+        card["btn"].pack(pady=(0, 8))
+        card["frame"] = fr
+        card["item"] = canvas.create_window(0, 0, window=fr, anchor="nw", state="hidden")
+        if not grid_state["cards"]:
+            try:
+                fr.update_idletasks()
+                grid_state["row_h"] = fr.winfo_reqheight() + 2 * CARD_PAD
+            except Exception:
+                pass
+        grid_state["cards"].append(card)
+        return card
+
+    def _unbind_card(card):
+        if card["path"] is not None and grid_state["bound"].get(card["path"]) is card:
+            del grid_state["bound"][card["path"]]
+        card["idx"] = card["path"] = None
+        try:
+            canvas.itemconfigure(card["item"], state="hidden")
+        except Exception:
+            pass
+
+    def _bind_card(card, i, x, y):
+        p = grid_state["files"][i]
+        if card["path"] != p:
+            if card["path"] is not None and grid_state["bound"].get(card["path"]) is card:
+                del grid_state["bound"][card["path"]]
+            card["path"] = p
+            grid_state["bound"][p] = card
+            img = photo_lru.get(p)
+            if img is not None:
+                photo_lru.move_to_end(p)
+            card["img"].configure(image=img or placeholder)
+            card["name"].configure(text=os.path.basename(p))
+            card["btn"].configure(command=lambda p=p: _open_file(p))
+        card["idx"] = i
+        canvas.coords(card["item"], x, y)
+        canvas.itemconfigure(card["item"], state="normal")
+
+    def _visible_rows(n_rows):
+        row_h = grid_state["row_h"]
+        top = canvas.canvasy(0)
+        r0 = max(0, int(top // row_h))
+        r1 = min(n_rows - 1, int((top + max(1, canvas.winfo_height())) // row_h))
+        return r0, max(r0, r1)
+
+    def _layout(_e=None):
+        """Reubica el pool de tarjetas sobre las filas visibles y pide sus miniaturas."""
+        if stop_flag["stop"] or not _widget_exists(canvas):
+            return
+        files = grid_state["files"]
+        n = len(files)
+        if not n:
+            for card in grid_state["cards"]:
+                _unbind_card(card)
+            return
+        try:
+            n_rows = (n + COLS - 1) // COLS
+            if not grid_state["cards"]:
+                _make_card()     # mide el alto real de fila
+            row_h = grid_state["row_h"]
+            cw = max(canvas.winfo_width(), COLS * CELL_W)
+            region = (0, 0, cw, n_rows * row_h)
+            if grid_state["region"] != region:
+                # Reconfigurar siempre dispararía yscrollcommand -> _layout en bucle
+                grid_state["region"] = region
+                canvas.configure(scrollregion=region)
+            r0, r1 = _visible_rows(n_rows)
+            lo, hi = r0 * COLS, min(n, (r1 + 1) * COLS)
+            while len(grid_state["cards"]) < hi - lo:
+                _make_card()
+
+            # Las tarjetas que ya muestran un índice visible se quedan donde están
+            keep, free = {}, []
+            for card in grid_state["cards"]:
+                i = card["idx"]
+                if i is not None and lo <= i < hi and i not in keep and files[i] == card["path"]:
+                    keep[i] = card
+                else:
+                    free.append(card)
+            x0 = max(0, (cw - COLS * CELL_W) // 2)
+            for i in range(lo, hi):
+                card = keep.get(i) or free.pop()
+                r, c = divmod(i, COLS)
+                _bind_card(card, i, x0 + c * CELL_W + CARD_PAD // 2, r * row_h + CARD_PAD)
+            for card in free:
+                if card["idx"] is not None:
+                    _unbind_card(card)
+            _request_thumbs(r0, r1, n_rows)
+        except Exception:
+            pass
+
+    def _request_thumbs(r0, r1, n_rows):
+        """Pide vista primero y después el margen, por cercanía; lo demás se cancela."""
+        l = loader["l"]
+        if l is None:
+            return
+        files = grid_state["files"]
+        n = len(files)
+        margin = (r1 - r0 + 1) * PREFETCH_SCREENS
+        rows = list(range(r0, r1 + 1))
+        for k in range(1, margin + 1):
+            if r1 + k < n_rows:
+                rows.append(r1 + k)
+            if r0 - k >= 0:
+                rows.append(r0 - k)
+        l.want([files[i] for r in rows for i in range(r * COLS, min(n, (r + 1) * COLS))
+                if files[i] not in photo_lru])
+
+    def _on_yscroll(*args):
+        vbar.set(*args)
+        _layout()
+
+    canvas.configure(yscrollcommand=_on_yscroll, yscrollincrement=24)
+    canvas.bind("<Configure>", _layout)
+
+    def _pump():
+        """Pasa a la grilla las miniaturas listas (hilo de Tk)."""
+        grid_state["pump_job"] = None
+        if stop_flag["stop"] or not _widget_exists(win):
+            return
+        l = loader["l"]
+        for p, pil_thumb in (l.results(BATCH_UI) if l is not None else []):
+            try:
+                tkimg = ImageTk.PhotoImage(pil_thumb)
+            except Exception:
+                continue
+            _lru_put(p, tkimg)
+            card = grid_state["bound"].get(p)
+            if card is not None:
+                try:
+                    card["img"].configure(image=tkimg)
+                except Exception:
+                    pass
+        busy = l is not None and l.busy
+        try:
+            status_lbl.config(text="Cargando miniaturas…" if busy else grid_state["summary"])
+        except Exception:
+            pass
+        grid_state["pump_job"] = win.after(20 if busy else 150, _pump)
+
+    def _show_message(text):
+        if _widget_exists(inner):
+            tk.Label(inner, text=text, bg=BG_COLOR, fg=FG_COLOR, font=("Arial", 12)).pack(pady=20)
+            try:
+                canvas.itemconfigure(win_item, state="normal")
+                canvas.update_idletasks()
+                canvas.configure(scrollregion=canvas.bbox(win_item))
+                grid_state["region"] = None
+            except Exception:
+                pass
+
     def _clear_grid():
         if not (_widget_exists(inner) and _widget_exists(canvas)):
             return
         for w in inner.winfo_children():
             try: w.destroy()
             except Exception: pass
-        thumb_refs.clear()
-        grid_state["count"] = 0
         try:
-            canvas.update_idletasks()
-            canvas.configure(scrollregion=canvas.bbox("all"))
+            canvas.itemconfigure(win_item, state="hidden")
         except Exception:
             pass
-
-    def _on_resize_content(_e=None):
-        if not _widget_exists(canvas): return
+        grid_state.update(files=[], summary="", region=None)
+        for card in grid_state["cards"]:
+            _unbind_card(card)
+        photo_lru.clear()
         try:
-            canvas.itemconfig(win_item, width=canvas.winfo_width())
-            canvas.configure(scrollregion=canvas.bbox("all"))
+            canvas.configure(scrollregion=(0, 0, 0, 0))
+            canvas.yview_moveto(0)
         except Exception:
             pass
 
-    inner.bind("<Configure>", _on_resize_content)
-    win.bind("<Configure>", _on_resize_content)
-
     def _parse_date(s: str) -> date | None:
         s = (s or "").strip()
         if not s:
@@ -2299,152 +2666,85 @@ def open_gallery_window(state: AppState):
             messagebox.showwarning("Fecha", f"Formato inválido: {s}\nUsa YYYY-MM-DD (ej. 2025-09-07).")
             return None
 
-    def _producer(files: list[str]):
-        from PIL import Image, ImageOps
-        try:
-            for p in files:
-                if stop_flag["stop"]:
-                    break
-                try:
-                    im = Image.open(p)
-                    try: im = ImageOps.exif_transpose(im)
-                    except Exception: pass
-                    im.draft("RGB", (640, 480))
-                    im = im.convert("RGB")
-                    th = ImageOps.fit(im, (240, 180), Image.LANCZOS)
-                    q.put((p, th), timeout=1)
-                except Exception:
-                    continue
-        finally:
-            try: q.put(None, timeout=1)
-            except Exception: pass
+    def _load_async(limit: int | None):
+        # reinicio/limpieza; gen descarta resultados de cargas anteriores que lleguen tarde
+        grid_state["gen"] += 1
+        gen = grid_state["gen"]
+        if loader["l"] is not None:
+            loader["l"].want([])
+        _clear_grid()
 
-    def _drain_queue(show_n: int, total_all: int, showing_all: bool):
-        if stop_flag["stop"] or not (_widget_exists(win) and _widget_exists(inner) and _widget_exists(canvas)):
-            return
-        added = 0
-        while added < BATCH_UI:
-            try:
-                item = q.get_nowait()
-            except Exception:
-                item = "empty"
-            if item == "empty":
-                break
-            if item is None:
-                msg = (f"Listo. Mostrando {total_all} imagen(es)." if showing_all
-                       else f"Listo. Mostrando últimas {show_n} de {total_all}.")
-                status_lbl.config(text=msg)
-                return
-            p, pil_thumb = item
+        # Filtro fechas (días completos, hora local)
+        df = _parse_date(from_var.get())
+        dt = _parse_date(to_var.get())
+        since = datetime.combine(df, datetime.min.time()).timestamp() if df else None
+        until = (datetime.combine(dt, datetime.min.time()) + timedelta(days=1)).timestamp() if dt else None
+        folder = state.photo_dir
+        status_lbl.config(text="Buscando imágenes…")
+
+        def _query():
+            # Fuera del hilo de Tk: ensure_folder espera si la reconciliación/migración
+            # de arranque tiene la carpeta tomada.
+            # Consultar el catálogo (indexado por instante de captura) en vez de listar la carpeta;
+            # con carpetas por día solo se reconcilian los días del filtro
+            err, total_folder, total_all, files = None, 0, 0, []
             try:
-                tkimg = ImageTk.PhotoImage(pil_thumb)
-            except Exception:
-                continue
-
-            card = tk.Frame(inner, bg=BG_COLOR, bd=0, highlightthickness=1, highlightbackground="#333")
-            lbl = tk.Label(card, image=tkimg, bg=BG_COLOR)
-            lbl.image = tkimg
-            thumb_refs.append(tkimg)
-            lbl.pack()
-
-            fname = os.path.basename(p)
-            tk.Label(card, text=fname, bg=BG_COLOR, fg=FG_COLOR, wraplength=240
-                     ).pack(fill="x", padx=6, pady=4)
-            tk.Button(card, text="Open", command=lambda p=p: _open_file(p),
-                      bg=BTN_COLOR, fg=BTN_TEXT_COLOR, bd=0,
-                      font=("Arial", 10, "bold"), padx=8, pady=4
-                     ).pack(pady=(0, 8))
-
-            i = grid_state["count"]; r, c = divmod(i, COLS)
-            card.grid(row=r, column=c, padx=8, pady=8, sticky="n")
-            grid_state["count"] += 1
-            added += 1
-            prog["done"] += 1
-
-        # continuar drenando sin bloquear
-        if _widget_exists(win):
+                cat = get_catalog()
+                cat.ensure_folder(folder, since, until)
+                total_folder = cat.count(folder)
+                total_all = cat.count(folder, since, until) if (df or dt) else total_folder
+                if total_all:
+                    files = cat.list(folder, since, until,
+                                     limit=None if limit is None else max(1, int(limit)))
+            except Exception as e:
+                err = e
             try:
-                status_lbl.config(text=f"Cargando miniaturas… {prog['done']}/{prog['total']}")
+                state.root.after(0, lambda: _show_loaded(gen, limit, err, total_folder, total_all, files))
             except Exception:
                 pass
-            win.after(20, lambda: _drain_queue(show_n, total_all, showing_all))
 
-    def _load_async(limit: int | None):
-        # reinicio/limpieza
-        stop_flag["stop"] = True
-        t = worker.get("t")
-        if t and t.is_alive():
-            try: t.join(timeout=0.4)
-            except Exception: pass
-        stop_flag["stop"] = False
-        while not q.empty():
-            try: q.get_nowait()
-            except Exception: break
-        _clear_grid()
+        threading.Thread(target=_query, name="gallery_load", daemon=True).start()
 
-        # listar archivos
-        exts = (".jpg", ".jpeg", ".png")
+    def _show_loaded(gen, limit, err, total_folder, total_all, files):
         try:
-            files_all = [os.path.join(state.photo_dir, f)
-                         for f in os.listdir(state.photo_dir)
-                         if f.lower().endswith(exts)]
-        except Exception as e:
-            status_lbl.config(text=f"Error leyendo carpeta: {e}")
+            if gen != grid_state["gen"] or not win.winfo_exists():
+                return      # carga reemplazada por otra, o galería cerrada
+        except Exception:
             return
-
-        total_all = len(files_all)
-        if total_all == 0:
-            status_lbl.config(text="No hay imágenes en esta carpeta.")
-            if _widget_exists(inner):
-                tk.Label(inner, text="No hay imágenes en esta carpeta.", bg=BG_COLOR, fg=FG_COLOR,
-                         font=("Arial", 12)).pack(pady=20)
-                try:
-                    canvas.configure(scrollregion=canvas.bbox("all"))
-                except Exception:
-                    pass
+        if err is not None:
+            status_lbl.config(text=f"Error leyendo carpeta: {err}")
             return
 
-        files_all.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-
-        # Filtro fechas
-        df = _parse_date(from_var.get())
-        dt = _parse_date(to_var.get())
-        if df or dt:
-            _filtered = []
-            for p in files_all:
-                try:
-                    d = datetime.fromtimestamp(os.path.getmtime(p)).date()
-                except Exception:
-                    continue
-                if df and d < df:   continue
-                if dt and d > dt:   continue
-                _filtered.append(p)
-            files_all = _filtered
-            total_all = len(files_all)
+        if total_folder == 0:
+            grid_state["summary"] = "No hay imágenes en esta carpeta."
+            status_lbl.config(text=grid_state["summary"])
+            _show_message("No hay imágenes en esta carpeta.")
+            return
 
         if total_all == 0:
-            status_lbl.config(text="Sin resultados para el filtro.")
-            if _widget_exists(inner):
-                tk.Label(inner, text="Sin resultados para el filtro.", bg=BG_COLOR, fg=FG_COLOR,
-                         font=("Arial", 12)).pack(pady=20)
+            grid_state["summary"] = "Sin resultados para el filtro."
+            status_lbl.config(text=grid_state["summary"])
+            _show_message("Sin resultados para el filtro.")
             return
 
         if limit is None:
-            files = files_all
-            showing_all = True
-            show_n = len(files_all)
+            grid_state["summary"] = f"Listo. Mostrando {total_all} imagen(es)."
         else:
-            files = files_all[:max(1, int(limit))]
-            showing_all = False
-            show_n = len(files)
+            grid_state["summary"] = f"Listo. Mostrando últimas {len(files)} de {total_all}."
 
-        prog["done"] = 0
-        prog["total"] = show_n
-        status_lbl.config(text=f"Cargando miniaturas… 0/{prog['total']}")
-
-        worker["t"] = threading.Thread(target=_producer, args=(files,), daemon=True)
-        worker["t"].start()
-        win.after(10, lambda: _drain_queue(show_n, total_all, showing_all))
+        if loader["l"] is None:
+            try:
+                from config import settings as _cfg
+                use_proc = bool(getattr(_cfg, "THUMB_USE_PROCESSES", True))
+            except Exception:
+                use_proc = True
+            loader["l"] = ThumbLoader(get_thumb_cache(), thumb_size(), use_processes=use_proc)
+
+        grid_state["files"] = files
+        status_lbl.config(text="Cargando miniaturas…")
+        _layout()
+        if grid_state["pump_job"] is None:
+            grid_state["pump_job"] = win.after(10, _pump)
 
     # Interceptar cierre del sistema de ventanas
     win.protocol("WM_DELETE_WINDOW", _close_now)
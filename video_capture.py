@@ -3,11 +3,11 @@ import cv2
 import sys
 import os
 from contextlib import contextmanager
+from functools import partial
 import threading
 import time
 import queue
 import os
-from datetime import datetime
 
 # Telemetría segura (fallback a no-op si falla)
 try:
@@ -22,6 +22,12 @@ except Exception:  # pragma: no cover
     def _tele_write_failure(*a, **k):
         pass
 
+from hardware.frame_sources import opencv_source, make_source_factory
+from hardware.frame_ring import FrameRing
+from infra.photo_layout import photo_folder_for
+from infra.photo_writer import PhotoWriter, reserve_photo_path
+from infra.frame_quality import measure_frame, rate as rate_quality, thresholds as quality_thresholds
+
 # Resoluciones objetivo para captura (ajusta a tu sensor/driver)
 _PREFERRED_SIZES = [
     (4056, 3040),   # ~12MP
@@ -32,15 +38,62 @@ _PREFERRED_SIZES = [
     (1280, 720),    # 720p
 ]
 
+
+def _analyze_capture(frame, path, dest_folder):
+    """Brillo medio y calidad de una captura; corre en la etapa de escritura, no en la cámara.
+
+    Se mide sobre una copia reducida (ver infra.frame_quality: la media tiene
+    cota de error ``mean_err`` contra la del frame completo).
+    """
+    try:
+        th = quality_thresholds()
+        stats = measure_frame(frame, th["max_side"])
+    except Exception as e:
+        _tele_log_error(e, {"phase": "capture_analyze", "path": path})
+        return None
+    mean_brightness = stats["mean"]
+    # Detección de foto negra
+    if mean_brightness <= th["black_mean"]:
+        _tele_log_event("capture_black", path=path, mean_brightness=mean_brightness)
+        try:
+            _tele_write_folder_log(dest_folder, {"event": "capture_black", "path": path, "mean": mean_brightness})
+        except Exception:
+            pass
+        try:
+            _tele_write_failure({"event": "capture_black", "path": path, "mean": mean_brightness, "folder": dest_folder})
+        except Exception:
+            pass
+    q = rate_quality(stats, th) if th["enabled"] else None
+    if q and q.get("reject"):
+        _tele_log_event("capture_rejected", path=path, reasons=q["reject"], score=q.get("score"),
+                        sharpness=q.get("sharpness"), contrast=q.get("contrast"))
+        try:
+            _tele_write_folder_log(dest_folder, {"event": "capture_rejected", "path": path,
+                                                 "reasons": q["reject"], "score": q.get("score")})
+        except Exception:
+            pass
+    return {"mean_brightness": mean_brightness, "quality": q}
+
+
 class CameraManager:
     """
     Dueño único del dispositivo:
       - Hilo que procesa comandos (stream on/off, props y captura).
+      - Hilo lector dedicado que publica frames en un anillo (FrameRing);
+        los consumidores leen el último frame sin tomar el lock del dispositivo.
+      - Producto "display": copia RGB al tamaño del panel de la UI, generada
+        en el hilo lector para que el hilo de Tk solo tenga que dibujar.
       - Preview fluido; captura alta resolución y restaura preview.
       - Pausa/reanuda internamente durante timelapse/captura.
+
+    El dispositivo se obtiene de ``source_factory(index, backend)``
+    (ver hardware.frame_sources); por defecto la cámara real vía OpenCV,
+    o una fuente sintética/replay para pruebas y benchmarks sin hardware.
     """
-    def __init__(self, cam_index=0, backend="auto", preview_size=(1280, 720), fps=30, use_mjpg=True):
+    def __init__(self, cam_index=0, backend="auto", preview_size=(1280, 720), fps=30, use_mjpg=True,
+                 source_factory=None):
         self.cam_index = cam_index
+        self._source_factory = source_factory or _default_source_factory()
         # Backend preferido (Windows: probar DSHOW primero, luego MSMF)
         if backend == "dshow":
             self.backend = cv2.CAP_DSHOW
@@ -58,16 +111,36 @@ class CameraManager:
         self._stream_enabled = False
         self._lock = threading.RLock()
 
-        self._frame_lock = threading.Lock()
-        self._last_frame = None
+        # Último frame: anillo de buffers preasignados con número de secuencia
+        try:
+            from config import settings as _cfg
+            ring_slots = getattr(_cfg, "FRAME_RING_SLOTS", 4)
+        except Exception:
+            ring_slots = 4
+        self._ring = FrameRing(ring_slots)
+        # Frames RGB ya escalados al panel (None = producto desactivado)
+        self._display_size = None
+        self._display_ring = FrameRing(3)
+        self._display_scratch = None
+
+        # Codificación JPEG + escritura fuera del hilo de la cámara
+        try:
+            from config import settings as _cfg
+            writer_workers = getattr(_cfg, "PHOTO_WRITER_WORKERS", 1)
+            writer_pending = getattr(_cfg, "PHOTO_WRITER_MAX_PENDING", 4)
+            fsync_policy = getattr(_cfg, "PHOTO_FSYNC_POLICY", "batch")
+            fsync_batch = getattr(_cfg, "PHOTO_FSYNC_BATCH", 8)
+            fsync_batch_s = getattr(_cfg, "PHOTO_FSYNC_BATCH_S", 5.0)
+        except Exception:
+            writer_workers, writer_pending = 1, 4
+            fsync_policy, fsync_batch, fsync_batch_s = "batch", 8, 5.0
+        self._writer = PhotoWriter(workers=writer_workers, max_pending=writer_pending,
+                                   fsync_policy=fsync_policy, fsync_batch=fsync_batch,
+                                   fsync_batch_s=fsync_batch_s)
 
         self._cmd_q = queue.Queue()
         self._prop_pending = {}   # pid -> value (coalesce)
 
-        self._worker = threading.Thread(target=self._loop, daemon=True)
-        self._running = True
-        self._worker.start()
-
         # Métricas / contadores
         self.frames_ok = 0
         self.frames_fail = 0
@@ -80,10 +153,22 @@ class CameraManager:
         # Supervisión de reanudación
         self._post_capture_resume_deadline = 0.0
         self._last_frame_ts = 0.0  # timestamp de último frame ok
+        # Reanudación tras captura: inicio del resume y ms hasta el primer frame publicado
+        self._resume_mark_ts = 0.0
+        self.last_resume_ms = None
+        self.resumes = 0
         self._auto_reopen_in_progress = False
         # Cancel cooperativo de captura
         self._capture_cancel_requested = False
 
+        # Hilos: comandos/supervisión y lectura de frames (se inician al final,
+        # con todos los atributos ya definidos)
+        self._running = True
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._grabber = threading.Thread(target=self._grab_loop, daemon=True)
+        self._worker.start()
+        self._grabber.start()
+
     # ---------- API pública ----------
     def set_cam_index(self, index: int):
         self._cmd_q.put(("set_cam_index", int(index)))
@@ -108,10 +193,13 @@ class CameraManager:
         self._cmd_q.put(("set_preview_size", (w, h)))
 
     def take_photo(self, dest_folder: str, prefer_sizes=None, jpeg_quality=95,
-                   auto_resume_stream=True, block_until_done=True, timeout=None, result_holder=None):
+                   auto_resume_stream=True, block_until_done=True, timeout=None, result_holder=None,
+                   preview_size=None):
         """
         Captura foto; si el stream estaba activo y auto_resume_stream=True,
         reanuda automáticamente tras guardar. Ahora con timeout para evitar bloqueos.
+        Con preview_size=(w, h) (por defecto el tamaño del live, si está activo)
+        result_holder["preview"] recibe una copia RGB de ese tamaño de la foto guardada.
         """
         done = threading.Event()
         try:
@@ -124,7 +212,8 @@ class CameraManager:
             "jpeg_quality": int(jpeg_quality),
             "auto_resume": bool(auto_resume_stream),
             "done_evt": done,
-            "result_holder": result_holder
+            "result_holder": result_holder,
+            "preview_size": preview_size or self._display_size
         }))
         if block_until_done:
             # Si timeout es None -> bloquear hasta que done.set() (espera indefinida)
@@ -148,12 +237,42 @@ class CameraManager:
         """Encola cambios de propiedad; el worker los aplica con debounce."""
         self._cmd_q.put(("set_prop", (prop_id, float(value))))
 
-    def get_frame_rgb(self):
-        with self._frame_lock:
-            if self._last_frame is None:
-                return None
-            frame = self._last_frame.copy()
-        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    @property
+    def frame_seq(self) -> int:
+        """Secuencia del último frame publicado (0 = ninguno). Sirve para saltar frames repetidos."""
+        return self._ring.latest_seq
+
+    def acquire_frame(self, min_seq: int = 0):
+        """Vista BGR de solo lectura y sin copia del último frame (hardware.frame_ring.FrameView).
+
+        Devuelve None si no hay frame con secuencia > min_seq. El llamador debe
+        liberar la vista (``release()`` o ``with``) para devolver el buffer al anillo.
+        """
+        return self._ring.acquire_latest(min_seq)
+
+    def set_display_size(self, width=None, height=None):
+        """Tamaño del panel de la UI para el producto display (None/0 = desactivar).
+
+        El hilo lector entrega cada frame nuevo escalado (aspecto preservado,
+        como ImageOps.contain) y en RGB, reutilizando buffers propios.
+        """
+        try:
+            w, h = int(width or 0), int(height or 0)
+        except Exception:
+            w = h = 0
+        self._display_size = (w, h) if w > 0 and h > 0 else None
+
+    @property
+    def display_size(self):
+        return self._display_size
+
+    def acquire_display_frame(self, min_seq: int = 0):
+        """Vista RGB de solo lectura del último frame escalado al panel (FrameView).
+
+        La secuencia es propia del producto display. None si no hay uno más nuevo
+        que min_seq o si el producto está desactivado.
+        """
+        return self._display_ring.acquire_latest(min_seq)
 
     def shutdown(self):
         # Señal de apagado
@@ -169,11 +288,12 @@ class CameraManager:
         except Exception:
             pass
 
-        # Espera al worker si existe (timeout reducido)
-        t = getattr(self, "_worker", None)
-        if t and t.is_alive():
-            t.join(timeout=0.5)
-        self._worker = None
+        # Espera a los hilos si existen (timeout reducido)
+        for name in ("_worker", "_grabber"):
+            t = getattr(self, name, None)
+            if t and t.is_alive():
+                t.join(timeout=0.5)
+            setattr(self, name, None)
 
         # Libera la cámara sin carrera (setea None antes de release)
         cap = None
@@ -185,6 +305,12 @@ class CameraManager:
             except Exception:
                 pass
 
+        # Terminar de escribir las fotos ya capturadas
+        try:
+            self._writer.shutdown(wait=True)
+        except Exception:
+            pass
+
 
     # ---- Extras: diálogo del controlador y modos auto ----
     def show_driver_settings(self):
@@ -252,8 +378,9 @@ class CameraManager:
 
     # ---------- Internos ----------
     def _loop(self):
+        """Hilo de comandos: drena la cola, aplica props con debounce y supervisa
+        la reanudación post-captura. La lectura de frames vive en _grab_loop."""
         last_prop_apply = 0.0
-        heartbeat_frames_step = 300  # cada 300 frames
         while self._running:
             self._drain_commands(max_ops=10)
 
@@ -270,38 +397,7 @@ class CameraManager:
                     self._prop_pending.clear()
                 last_prop_apply = now
 
-            if self._stream_enabled:
-                with self._lock:
-                    if self._cap is None:
-                        self._open_for_preview_locked()
-                    try:
-                        ok, frame = self._cap.read()
-                    except Exception as e:
-                        print(f"[ERROR] Error leyendo frame: {e}")
-                        ok, frame = False, None
-                if ok:
-                    with self._frame_lock:
-                        self._last_frame = frame
-                    self.frames_ok += 1
-                    self.consecutive_fail_reads = 0
-                    self._last_frame_ts = time.time()
-                    if self.frames_ok % heartbeat_frames_step == 0:
-                        _tele_log_event("camera_loop_heartbeat",
-                                        frames_ok=self.frames_ok,
-                                        frames_fail=self.frames_fail,
-                                        backend=self._backend_name(),
-                                        consecutive_fail=self.consecutive_fail_reads,
-                                        last_capture_age_ms=self._last_capture_age_ms())
-                else:
-                    time.sleep(0.01)
-                    self.frames_fail += 1
-                    self.consecutive_fail_reads += 1
-                    # Log al décimo fallo consecutivo y luego cada 50
-                    if self.consecutive_fail_reads == 10 or (self.consecutive_fail_reads > 10 and self.consecutive_fail_reads % 50 == 0):
-                        _tele_log_event("frame_read_error", consecutive_fail=self.consecutive_fail_reads,
-                                        backend=self._backend_name())
-            else:
-                time.sleep(0.01)
+            time.sleep(0.01)
 
             # Verificación de reanudación post-captura: si había deadline y ya recibimos frame => éxito
             if self._post_capture_resume_deadline > 0:
@@ -330,6 +426,88 @@ class CameraManager:
                             self._auto_reopen_in_progress = False
                 # Si se logró frame tras reopen, se limpia arriba
 
+    def _grab_loop(self):
+        """Hilo lector: solo lee frames y los publica en el anillo.
+
+        Toma el lock del dispositivo únicamente durante read() y re-chequea
+        _stream_enabled ya con el lock: así, cuando _handle_capture desactiva
+        el stream y luego toma el lock, tiene garantizado que no hay lecturas
+        en curso ni futuras hasta que reanude.
+        """
+        heartbeat_frames_step = 300  # cada 300 frames
+        while self._running:
+            if not self._stream_enabled:
+                time.sleep(0.01)
+                continue
+            with self._lock:
+                if not self._stream_enabled:
+                    continue
+                if self._cap is None:
+                    self._open_for_preview_locked()
+                idx, buf = self._ring.begin_write()
+                try:
+                    ok, frame = self._cap.read(buf) if buf is not None else self._cap.read()
+                except Exception as e:
+                    print(f"[ERROR] Error leyendo frame: {e}")
+                    ok, frame = False, None
+                if ok and frame is not None:
+                    now = time.time()
+                    self._ring.commit(idx, frame, now)
+                    self._last_frame_ts = now
+                    if self._resume_mark_ts:
+                        self.last_resume_ms = (now - self._resume_mark_ts) * 1000.0
+                        self._resume_mark_ts = 0.0
+                        self.resumes += 1
+            if ok and frame is not None:
+                if self._display_size is not None:
+                    self._publish_display_frame()
+                self.frames_ok += 1
+                self.consecutive_fail_reads = 0
+                if self.frames_ok % heartbeat_frames_step == 0:
+                    _tele_log_event("camera_loop_heartbeat",
+                                    frames_ok=self.frames_ok,
+                                    frames_fail=self.frames_fail,
+                                    backend=self._backend_name(),
+                                    consecutive_fail=self.consecutive_fail_reads,
+                                    last_capture_age_ms=self._last_capture_age_ms())
+            else:
+                time.sleep(0.01)
+                self.frames_fail += 1
+                self.consecutive_fail_reads += 1
+                # Log al décimo fallo consecutivo y luego cada 50
+                if self.consecutive_fail_reads == 10 or (self.consecutive_fail_reads > 10 and self.consecutive_fail_reads % 50 == 0):
+                    _tele_log_event("frame_read_error", consecutive_fail=self.consecutive_fail_reads,
+                                    backend=self._backend_name())
+
+    def _publish_display_frame(self):
+        """Escala el último frame al panel (fuera del lock del dispositivo)."""
+        target = self._display_size
+        view = self._ring.acquire_latest()
+        if target is None or view is None:
+            return
+        try:
+            with view:
+                src_h, src_w = view.shape[:2]
+                scale = min(target[0] / float(src_w), target[1] / float(src_h))
+                dw, dh = max(1, int(round(src_w * scale))), max(1, int(round(src_h * scale)))
+                # Buffers reutilizados: RGB del slot del anillo y BGR escalado (scratch)
+                idx, rgb = self._display_ring.begin_write()
+                if rgb is not None and rgb.shape[:2] != (dh, dw):
+                    rgb = None
+                if (dw, dh) == (src_w, src_h):
+                    rgb = view.convert(cv2.COLOR_BGR2RGB, rgb)
+                else:
+                    small = self._display_scratch
+                    if small is not None and small.shape[:2] != (dh, dw):
+                        small = None
+                    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+                    small = cv2.resize(view.array, (dw, dh), dst=small, interpolation=interp)
+                    self._display_scratch = small
+                    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=rgb)
+            self._display_ring.commit(idx, rgb, view.ts)
+        except Exception as e:
+            _tele_log_error(e, {"phase": "display_frame"})
+
     def _drain_commands(self, max_ops=10):
         ops = 0
         try:
@@ -378,7 +556,7 @@ class CameraManager:
                         except Exception:
                             pass
                     # Realizar un par de lecturas de warmup para asegurar que
-                    # _last_frame tenga un frame reciente y la UI no muestre
+                    # el anillo tenga un frame reciente y la UI no muestre
                     # una imagen congelada inmediatamente después de activar el live.
                     try:
                         warm_ok = False
@@ -388,8 +566,7 @@ class CameraManager:
                             except Exception:
                                 ok, frame = False, None
                             if ok and frame is not None:
-                                with self._frame_lock:
-                                    self._last_frame = frame
+                                self._ring.publish(frame)
                                 warm_ok = True
                                 break
                         _tele_log_event("stream_warmup_reads", warm_ok=bool(warm_ok))
@@ -495,7 +672,7 @@ class CameraManager:
                 cap = None
                 try:
                     with _suppress_stderr():
-                        cap = cv2.VideoCapture(index) if be is None else cv2.VideoCapture(index, be)
+                        cap = self._source_factory(index, be)
                     if cap is not None and cap.isOpened():
                         # Recordar backend exitoso para futuros opens (evita intentos costosos)
                         if be is not None:
@@ -575,12 +752,13 @@ class CameraManager:
         auto_resume   = bool(args["auto_resume"])
         done_evt      = args.get("done_evt")
         result_holder = args.get("result_holder")
+        preview_size  = args.get("preview_size") if result_holder is not None else None
 
         was_streaming = self._stream_enabled
         # Nota: no pausamos inmediatamente el stream aquí.
         # Intentaremos una ruta rápida (fast-path) si el stream estaba
         # activo y la resolución solicitada coincide con la del preview;
-        # en ese caso guardamos directamente desde _last_frame y evitamos
+        # en ese caso guardamos directamente el último frame del anillo y evitamos
         # reconfigurar el dispositivo (ahorrando varios segundos en
         # drivers lentos).
         self.last_capture_started_ts = time.time()
@@ -604,50 +782,25 @@ class CameraManager:
                 try:
                     if (abs(first_pref[0] - self.preview_w) <= 16 and
                         abs(first_pref[1] - self.preview_h) <= 16):
-                        # tomar copia atomica del último frame
-                        with self._frame_lock:
-                            lf = self._last_frame.copy() if self._last_frame is not None else None
-                            lf_ts = getattr(self, '_last_frame_ts', 0.0)
-                        if lf is not None and (time.time() - lf_ts) <= FASTPATH_MAX_AGE_S:
-                            # Guardar directamente y emitir telemetría
+                        # vista fijada del último frame: sin copia ni lock del dispositivo
+                        lf_view = self._ring.acquire_latest()
+                        lf, lf_ts = (lf_view.array, lf_view.ts) if lf_view is not None else (None, 0.0)
+                        if lf is not None and (time.time() - lf_ts) > FASTPATH_MAX_AGE_S:
+                            lf_view.release()
+                            lf = None
+                        if lf is not None:
+                            # Encolar codificación+escritura (la vista se libera al codificar)
+                            path, save_fut = None, None
                             try:
-                                os.makedirs(dest_folder, exist_ok=True)
-                                filename = datetime.now().strftime("%Y%m%d_%H%M%S") + ".jpg"
-                                path = os.path.join(dest_folder, filename)
-                                cv2.imwrite(path, lf, [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality])
+                                path = self._new_photo_path(dest_folder)
+                                # Brillo medio / foto negra y calidad: en la etapa de escritura
+                                save_fut = self._writer.submit(lf, path, jpeg_quality, release=lf_view.release,
+                                                               preview_size=preview_size,
+                                                               analyze=partial(_analyze_capture, path=path,
+                                                                               dest_folder=dest_folder))
                                 _tele_log_event("capture_fastpath_used", used=True, path=path)
-                                _tele_log_event("capture_save_ok", path=path)
-                                # Detección de foto negra: calcular brillo medio en escala de grises
-                                try:
-                                    import numpy as _np  # numpy suele estar disponible con OpenCV
-                                    gray = cv2.cvtColor(lf, cv2.COLOR_BGR2GRAY)
-                                    mean_brightness = float(_np.mean(gray))
-                                except Exception:
-                                    try:
-                                        # Fallback sin numpy
-                                        gray = cv2.cvtColor(lf, cv2.COLOR_BGR2GRAY)
-                                        mean_brightness = float(gray.mean())
-                                    except Exception:
-                                        mean_brightness = None
-                                try:
-                                    from config import settings as _cfg
-                                    thresh = getattr(_cfg, "CAPTURE_BLACK_MEAN_THRESHOLD", 10)
-                                except Exception:
-                                    thresh = 10
-                                try:
-                                    if mean_brightness is not None and mean_brightness <= float(thresh):
-                                        _tele_log_event("capture_black", path=path, mean_brightness=mean_brightness)
-                                        try:
-                                            _tele_write_folder_log(dest_folder, {"event": "capture_black", "path": path, "mean": mean_brightness})
-                                        except Exception:
-                                            pass
-                                        try:
-                                            _tele_write_failure({"event": "capture_black", "path": path, "mean": mean_brightness, "folder": dest_folder})
-                                        except Exception:
-                                            pass
-                                except Exception:
-                                    pass
                             except Exception as e:
+                                lf_view.release()
                                 _tele_log_error(e, {"phase": "capture_fastpath_save"})
                                 _tele_log_event("capture_fastpath_used", used=False, reason=str(e))
                             # Finalizar igual que la ruta normal
@@ -658,23 +811,21 @@ class CameraManager:
                                 "was_streaming": was_streaming,
                                 "resumed_stream": False,
                                 "cancelled": False,
-                                "timeout": False
+                                "timeout": False,
+                                "write_pending": save_fut is not None
                             }
                             _tele_log_event("capture_end", **end_meta)
-                            if done_evt:
-                                try:
-                                    done_evt.set()
-                                except Exception:
-                                    pass
                             if result_holder is not None:
                                 try:
                                     result_holder["cancelled"] = False
                                     result_holder["timeout"] = False
                                     result_holder["mismatch"] = False
+                                    result_holder["fastpath"] = True
                                     result_holder["eff_w"] = int(self.preview_w)
                                     result_holder["eff_h"] = int(self.preview_h)
                                 except Exception:
                                     pass
+                            self._signal_capture_done(done_evt, result_holder, path, save_fut)
                             return
                 except Exception:
                     # Si algo falla en fast-path, seguimos con la ruta normal
@@ -700,6 +851,7 @@ class CameraManager:
 
         self._capture_cancel_requested = False
         local_start = time.time()
+        path, save_fut = None, None
 
         def _timed_out():
             return (time.time() - local_start) > CAPTURE_MAX_DURATION_S
@@ -840,40 +992,12 @@ class CameraManager:
                 print("[ERROR] Captura abortada por timeout.")
             elif ok:
                 try:
-                    os.makedirs(dest_folder, exist_ok=True)
-                    filename = datetime.now().strftime("%Y%m%d_%H%M%S") + ".jpg"
-                    path = os.path.join(dest_folder, filename)
-                    cv2.imwrite(path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality])
-                    _tele_log_event("capture_save_ok", path=path)
-                    # Detección de foto negra: calcular brillo medio en escala de grises
-                    try:
-                        import numpy as _np
-                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                        mean_brightness = float(_np.mean(gray))
-                    except Exception:
-                        try:
-                            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                            mean_brightness = float(gray.mean())
-                        except Exception:
-                            mean_brightness = None
-                    try:
-                        from config import settings as _cfg
-                        thresh = getattr(_cfg, "CAPTURE_BLACK_MEAN_THRESHOLD", 10)
-                    except Exception:
-                        thresh = 10
-                    try:
-                        if mean_brightness is not None and mean_brightness <= float(thresh):
-                            _tele_log_event("capture_black", path=path, mean_brightness=mean_brightness)
-                            try:
-                                _tele_write_folder_log(dest_folder, {"event": "capture_black", "path": path, "mean": mean_brightness})
-                            except Exception:
-                                pass
-                            try:
-                                _tele_write_failure({"event": "capture_black", "path": path, "mean": mean_brightness, "folder": dest_folder})
-                            except Exception:
-                                pass
-                    except Exception:
-                        pass
+                    path = self._new_photo_path(dest_folder)
+                    # Codificar y escribir en la etapa asíncrona (brillo medio / foto negra y
+                    # calidad incluidos); la cámara vuelve al preview ya
+                    save_fut = self._writer.submit(frame, path, jpeg_quality, preview_size=preview_size,
+                                                   analyze=partial(_analyze_capture, path=path,
+                                                                   dest_folder=dest_folder))
                 except Exception as e:
                     print(f"[ERROR] Error guardando foto: {e}")
                     _tele_log_error(e, {"phase": "capture_save"})
@@ -890,6 +1014,7 @@ class CameraManager:
             # Siempre intentar reanudar stream si correspondía
             try:
                 if auto_resume and was_streaming:
+                    resume_t0 = time.time()
                     try:
                         if self._cap is None:
                             self._open_for_preview_locked()
@@ -902,14 +1027,10 @@ class CameraManager:
                     except Exception as e:
                         print(f"[WARN] Error reanudando stream tras captura: {e}")
                         _tele_log_error(e, {"phase": "capture_resume"})
+                    self._resume_mark_ts = resume_t0
                     self._stream_enabled = True
             except Exception:
                 pass
-            if done_evt:
-                try:
-                    done_evt.set()
-                except Exception:
-                    pass
             # resultado opcional
             if result_holder is not None:
                 try:
@@ -920,6 +1041,8 @@ class CameraManager:
                     result_holder["eff_h"] = int(eff[1])
                 except Exception:
                     pass
+            # done_evt se marca cuando la foto quede escrita (o ya, si no hubo foto)
+            self._signal_capture_done(done_evt, result_holder, path, save_fut)
             self.last_capture_ended_ts = time.time()
         # Establecer deadline de verificación de reanudación si corresponde
         if was_streaming:
@@ -932,10 +1055,64 @@ class CameraManager:
             "was_streaming": was_streaming,
             "resumed_stream": bool(auto_resume and was_streaming),
             "cancelled": self._capture_cancel_requested,
-            "timeout": (self.last_capture_ended_ts - local_start) > CAPTURE_MAX_DURATION_S
+            "timeout": (self.last_capture_ended_ts - local_start) > CAPTURE_MAX_DURATION_S,
+            "write_pending": save_fut is not None and not save_fut.done()
         }
         _tele_log_event("capture_end", **end_meta)
 
+    def _new_photo_path(self, dest_folder: str) -> str:
+        ts = time.time()
+        # Con PHOTO_LAYOUT="daily" la foto va a dest_folder/YYYY/MM/DD
+        folder = photo_folder_for(dest_folder, ts)
+        os.makedirs(folder, exist_ok=True)
+        # Milisegundos + contador: nunca se pisa otra captura del mismo segundo
+        return reserve_photo_path(folder, ts)
+
+    def _signal_capture_done(self, done_evt, result_holder, path=None, save_fut=None):
+        """Cierra la captura para quien espera en take_photo.
+
+        La cámara ya volvió al preview; si hay escritura pendiente, done_evt y
+        result_holder["path"/"saved"] se completan cuando la foto está en disco.
+        """
+        def _done(fut=None):
+            info, err = None, None
+            if fut is not None:
+                try:
+                    info = dict(fut.result())
+                except Exception as e:
+                    err = e
+                if err is None:
+                    _tele_log_event("capture_save_ok", path=path,
+                                    bytes=info.get("bytes"),
+                                    queue_ms=int(info.get("queue_ms", 0)),
+                                    encode_ms=int(info.get("encode_ms", 0)),
+                                    write_ms=int(info.get("write_ms", 0)))
+                else:
+                    print(f"[ERROR] Error guardando foto: {err}")
+                    _tele_log_error(err, {"phase": "capture_save", "path": path})
+            if result_holder is not None:
+                try:
+                    saved = fut is not None and err is None
+                    result_holder["saved"] = saved
+                    result_holder["path"] = path if saved else None
+                    if info is not None:
+                        # Copia para el panel: la UI la muestra sin releer el JPEG
+                        result_holder["preview"] = info.pop("preview", None)
+                        # Para reintentar en el mismo tick si la foto salió rechazada
+                        result_holder["quality"] = info.get("quality")
+                        result_holder["write_stats"] = info
+                except Exception:
+                    pass
+            if done_evt:
+                try:
+                    done_evt.set()
+                except Exception:
+                    pass
+        if save_fut is None:
+            _done()
+        else:
+            save_fut.add_done_callback(_done)
+
     # Helpers internos
     def _backend_name(self, be=None):
         try:
@@ -957,5 +1134,15 @@ class CameraManager:
         return int((time.time() - self.last_capture_ended_ts) * 1000)
 
 
+def _default_source_factory():
+    """Fuente según settings.FRAME_SOURCE (env KATCAM_FRAME_SOURCE); cámara real si falla."""
+    try:
+        from config import settings as _cfg
+        return make_source_factory(getattr(_cfg, "FRAME_SOURCE", "opencv"))
+    except Exception as e:
+        _tele_log_error(e, {"phase": "frame_source_factory"})
+        return opencv_source
+
+
 # Singleton importable
 camera_manager = CameraManager()